@@ -0,0 +1,368 @@
+"""
+Benchmark suite of the drone charging simulation.
+
+Each benchmark case (a world scaled from the given YAML file) runs in a separate process, so the measurements
+(including the peak memory) are independent. A case runs two iterations of one simulation -- the first one uses
+the baseline of the estimates, the second one the trained neural networks. The results of all cases are saved
+to a JSON file which can be compared with the results of another build using `--compare`.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from copy import deepcopy
+from datetime import datetime
+
+from yaml import load
+try:
+    from yaml import CLoader as Loader
+except ImportError:
+    from yaml import Loader
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+DRONES = [8, 16, 32, 64, 125, 250, 500, 1000]
+BIRDS = [20, 100, 500, 1000, 5000, 10000]
+MAP_SCALES = [1, 2, 4, 8]
+BIRD_MODES = [{}, {"vectorizedBirds": True}, {"fastForwardBirds": True}]
+TRAINING_SIZES = [1000, 4000, 16000, 64000]
+BATCH_SIZES = [1, 16, 256, 4096]
+ESTIMATOR_LABELS = ["baseline", "neural_network"]
+
+
+def createCases(suite, baseConfig, steps):
+    """Creates the list of cases of the suite. Each case varies one parameter of the base config."""
+    base = {
+        "drones": baseConfig['drones'],
+        "birds": baseConfig['birds'],
+        "mapScale": 1,
+        "animation": False,
+        "vectorizedBirds": False,
+        "fastForwardBirds": False,
+        "estimators": False,
+        "steps": steps,
+    }
+
+    def variant(**changes):
+        case = dict(base)
+        case.update(changes)
+        return case
+
+    suites = {
+        "quick": [base],
+        "drones": [variant(drones=drones) for drones in DRONES],
+        "birds": [variant(birds=birds, **mode) for birds in BIRDS for mode in BIRD_MODES],
+        "map": [variant(mapScale=scale) for scale in MAP_SCALES],
+        "animation": [base, variant(animation=True)],
+        "estimators": [variant(estimators=True)],
+    }
+    if suite == "full":
+        cases = []
+        for name in ["drones", "birds", "map", "animation", "estimators"]:
+            cases.extend(case for case in suites[name] if case not in cases)
+        return cases
+    return suites[suite]
+
+
+def caseKey(case):
+    return f"drones={case['drones']}, birds={case['birds']}, mapScale={case['mapScale']}, " \
+           f"animation={case['animation']}, vectorizedBirds={case.get('vectorizedBirds', False)}, " \
+           f"fastForwardBirds={case.get('fastForwardBirds', False)}, estimators={case['estimators']}"
+
+
+def scaleConfig(baseConfig, case):
+    """Returns a copy of the world config with the number of drones, birds and the map size given by the case."""
+    config = deepcopy(baseConfig)
+    scale = case['mapScale']
+    config['drones'] = case['drones']
+    config['birds'] = case['birds']
+    config['mapWidth'] = baseConfig['mapWidth'] * scale
+    config['mapHeight'] = baseConfig['mapHeight'] * scale
+    config['chargers'] = [[coordinate * scale for coordinate in charger] for charger in baseConfig['chargers']]
+    config['fields'] = [[coordinate * scale for coordinate in field] for field in baseConfig['fields']]
+    config['maxSteps'] = case['steps']
+    return config
+
+
+def peakMemoryMB():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":  # bytes on macOS, kilobytes on Linux
+        return peak / 2 ** 20
+    return peak / 2 ** 10
+
+
+def runCase(case, baseConfig, seed, hiddenLayers):
+    """Runs one benchmark case in this process and returns the measurements."""
+    import numpy as np
+    import tensorflow as tf
+
+    from run import configureEnvironment, createEstimators
+    from world import WORLD, ENVIRONMENT
+    from utils.visualizers import Visualizer
+    from ml_deeco.simulation import run_experiment, SIMULATION_GLOBALS
+
+    random.seed(seed)
+    np.random.seed(seed)
+    tf.random.set_seed(seed)
+
+    configureEnvironment(scaleConfig(baseConfig, case))
+    folder = tempfile.mkdtemp(prefix="benchmark_")
+    estimatorArgs = argparse.Namespace(hidden_layers=hiddenLayers, accumulate_data=False, chart=False, test_split=0.2, baseline=0)
+    createEstimators(estimatorArgs, folder)
+    WORLD.initEstimators()
+    WORLD.vectorizedBirds = case.get('vectorizedBirds', False)
+    WORLD.fastForwardBirds = case.get('fastForwardBirds', False)
+
+    # keep the training data passed to the estimators, they are reused for the training and inference benchmarks
+    trainingData = {}
+    originalTrain = {}
+    for estimator in SIMULATION_GLOBALS.estimators:
+        originalTrain[estimator.name] = estimator.train
+
+        def capture(x, y, estimator=estimator):
+            trainingData[estimator.name] = (x, y)
+            return originalTrain[estimator.name](x, y)
+
+        estimator.train = capture
+
+    iterations = []
+    visualizer = None
+    timer = {}
+
+    def prepareSimulation(iteration, simulation):
+        nonlocal visualizer
+        components, ensembles = WORLD.reset()
+        if case['animation']:
+            visualizer = Visualizer(WORLD)
+            visualizer.drawFields()
+        timer['start'] = time.perf_counter()
+        return components, ensembles
+
+    def stepCallback(components, materializedEnsembles, step):
+        if case['animation']:
+            visualizer.drawComponents(step + 1)
+
+    def simulationCallback(components, ensembles, iteration, simulation):
+        seconds = time.perf_counter() - timer['start']
+        record = {
+            "estimator": ESTIMATOR_LABELS[iteration],
+            "steps": ENVIRONMENT.maxSteps,
+            "seconds": seconds,
+            "stepsPerSecond": ENVIRONMENT.maxSteps / seconds,
+        }
+        if case['animation']:
+            start = time.perf_counter()
+            visualizer.createAnimation(f"{folder}/animation.gif")
+            record["animationSaveSeconds"] = time.perf_counter() - start
+        iterations.append(record)
+        timer['end'] = time.perf_counter()
+
+    def iterationCallback(iteration):
+        # everything between the end of the last simulation and this callback is the training
+        iterations[-1]["trainingSeconds"] = time.perf_counter() - timer['end']
+
+    run_experiment(len(ESTIMATOR_LABELS), 1, ENVIRONMENT.maxSteps, prepareSimulation,
+                   iterationCallback=iterationCallback, simulationCallback=simulationCallback, stepCallback=stepCallback)
+
+    result = {
+        "case": case,
+        "iterations": iterations,
+        "peakMemoryMB": peakMemoryMB(),
+    }
+
+    if case['estimators']:
+        result["estimators"] = benchmarkEstimators(SIMULATION_GLOBALS.estimators, trainingData, originalTrain, seed)
+
+    shutil.rmtree(folder, ignore_errors=True)
+    return result
+
+
+def benchmarkEstimators(estimators, trainingData, originalTrain, seed):
+    """
+    Measures the training time against the dataset size and the inference latency against the batch size,
+    also of the model evaluated with NumPy (see `utils/numpy_inference.py`).
+    """
+    import numpy as np
+    from utils.numpy_inference import NumpyModel
+
+    rng = np.random.default_rng(seed)
+    results = {}
+    for estimator in estimators:
+        if estimator.name not in trainingData:
+            continue
+        x, y = trainingData[estimator.name]
+        x, y = np.asarray(x), np.asarray(y)
+
+        training = []
+        for size in TRAINING_SIZES:
+            indices = rng.integers(len(x), size=size)
+            start = time.perf_counter()
+            originalTrain[estimator.name](x[indices], y[indices])
+            training.append({"samples": size, "seconds": time.perf_counter() - start})
+
+        inference = []
+        for batchSize in BATCH_SIZES:
+            batch = x[rng.integers(len(x), size=batchSize)]
+            estimator.predictBatch(batch)  # warm-up
+            repeats = max(3, 4096 // batchSize)
+            start = time.perf_counter()
+            for _ in range(repeats):
+                estimator.predictBatch(batch)
+            seconds = (time.perf_counter() - start) / repeats
+            inference.append({"batch": batchSize, "seconds": seconds, "secondsPerSample": seconds / batchSize})
+
+        numpyInference = None
+        model = getattr(estimator, "_model", None)
+        try:
+            numpyModel = NumpyModel(model) if model is not None else None
+        except ValueError:
+            numpyModel = None
+        if numpyModel is not None:
+            numpyInference = {"weightBytes": numpyModel.weightBytes, "inference": []}
+            for batchSize in BATCH_SIZES:
+                batch = x[rng.integers(len(x), size=batchSize)].astype(np.float32)
+                numpyModel.compute(batch)  # warm-up
+                repeats = max(3, 4096 // batchSize)
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    numpyModel.compute(batch)
+                seconds = (time.perf_counter() - start) / repeats
+                numpyInference["inference"].append({"batch": batchSize, "seconds": seconds, "secondsPerSample": seconds / batchSize})
+
+        repeats = 1000
+        start = time.perf_counter()
+        for i in range(repeats):
+            estimator.predict(x[i % len(x)])
+        single = (time.perf_counter() - start) / repeats
+
+        results[estimator.name] = {
+            "datasetSize": len(x),
+            "training": training,
+            "inference": inference,
+            "numpyInference": numpyInference,
+            "singlePredictionSeconds": single,
+        }
+    return results
+
+
+def runSuite(args):
+    with open(args.input, 'r') as yamlFile:
+        baseConfig = load(yamlFile, Loader=Loader)
+    if args.birds > -1:
+        baseConfig['birds'] = args.birds
+
+    results = []
+    for case in createCases(args.suite, baseConfig, args.steps):
+        print(f"Running {caseKey(case)}", flush=True)
+        command = [sys.executable, __file__, args.input, "--case", json.dumps(case),
+                   "--seed", str(args.seed), "--hidden_layers", *map(str, args.hidden_layers)]
+        process = subprocess.run(command, stdout=subprocess.PIPE, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if process.returncode != 0:
+            print(f"Case failed with exit code {process.returncode}.")
+            results.append({"case": case, "failed": True})
+            continue
+        result = json.loads(process.stdout.decode().strip().splitlines()[-1])
+        for record in result["iterations"]:
+            print(f"  {record['estimator']}: {record['stepsPerSecond']:.1f} steps/s")
+        results.append(result)
+
+    output = {
+        "created": datetime.now().isoformat(),
+        "revision": gitRevision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "input": args.input,
+        "suite": args.suite,
+        "seed": args.seed,
+        "results": results,
+    }
+    directory = os.path.dirname(args.output)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(args.output, "w") as file:
+        json.dump(output, file, indent=2)
+    print(f"Results saved to {args.output}")
+    return output
+
+
+def gitRevision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.decode().strip() or None
+    except OSError:
+        return None
+
+
+def compare(baselineFile, current, tolerance):
+    """
+    Prints the relative change of steps per second against the baseline results.
+
+    Returns
+    -------
+    bool
+        True if no case is slower than the baseline by more than `tolerance` (a fraction).
+    """
+    with open(baselineFile) as file:
+        baseline = json.load(file)
+    baselineRecords = {
+        (caseKey(result["case"]), record["estimator"]): record["stepsPerSecond"]
+        for result in baseline["results"] if not result.get("failed")
+        for record in result["iterations"]
+    }
+
+    passed = True
+    print(f"Comparison with {baselineFile} (revision {baseline.get('revision')}):")
+    for result in current["results"]:
+        if result.get("failed"):
+            continue
+        for record in result["iterations"]:
+            key = (caseKey(result["case"]), record["estimator"])
+            if key not in baselineRecords:
+                continue
+            change = record["stepsPerSecond"] / baselineRecords[key] - 1
+            regression = change < -tolerance
+            passed = passed and not regression
+            print(f"  {key[0]}, {key[1]}: {change:+.1%}{'  REGRESSION' if regression else ''}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the simulation on worlds scaled from the YAML file.')
+    parser.add_argument('input', type=str, help='YAML address of the base world.')
+    parser.add_argument('--suite', type=str, choices=["quick", "drones", "birds", "map", "animation", "estimators", "full"],
+                        default="quick", help='The set of cases to be run.')
+    parser.add_argument('--steps', type=int, default=100, help='Number of steps of each simulation.')
+    parser.add_argument('-o', '--output', type=str, default="results/benchmarks/benchmark.json", help='The output JSON file.')
+    parser.add_argument('--compare', type=str, default=None, help='JSON file with results of another build to compare with.')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed relative slowdown when comparing.')
+    parser.add_argument('--hidden_layers', nargs="+", type=int, default=[256, 256], help='Number of neurons in hidden layers.')
+    parser.add_argument('--seed', type=int, help='Random seed.', required=False, default=42)
+    parser.add_argument('-x', '--birds', type=int, help='number of birds, if no set, it loads from yaml file.', required=False, default=-1)
+    parser.add_argument('--case', type=str, default=None, help=argparse.SUPPRESS)  # used internally to run one case
+    args = parser.parse_args()
+
+    if args.case is not None:
+        with open(args.input, 'r') as yamlFile:
+            baseConfig = load(yamlFile, Loader=Loader)
+        result = runCase(json.loads(args.case), baseConfig, args.seed, args.hidden_layers)
+        print(json.dumps(result))
+        return
+
+    results = runSuite(args)
+    if args.compare and not compare(args.compare, results, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
+import math
 import random
 from enum import Enum
-from world import ENVIRONMENT, WORLD
-from ml_deeco.simulation import MovingComponent2D
+from world import ENVIRONMENT, currentContext
+from ml_deeco.simulation import MovingComponent2D, Point2D
 
 class BirdState(Enum):
     """
@@ -52,6 +53,7 @@ class Bird(MovingComponent2D):
         location : Point2D
             the point which is given by the World.
         """
+        self.world = currentContext().world
         self.state = BirdState.IDLE
         self.target = None
         self.field = None
@@ -62,7 +64,7 @@ class Bird(MovingComponent2D):
 
         Moves the bird to the new undamaged field. If such place does not exist, the bird goes IDLE.
         """
-        self.field = random.choice(WORLD.fields)
+        self.field = random.choice(self.world.fields)
         newTarget = self.field.randomUndamagedCrop()
         if newTarget is None:
             self.field = None
@@ -77,7 +79,7 @@ class Bird(MovingComponent2D):
         Flee from the drones and fly away to an empty place.
         """
         self.field = None
-        self.target = random.choice(WORLD.emptyPoints)
+        self.target = random.choice(self.world.emptyPoints)
         self.state = BirdState.FLEEING
 
     def moveWithinSameField(self):
@@ -95,6 +97,40 @@ class Bird(MovingComponent2D):
                 self.target = newTarget
                 self.state = BirdState.MOVING_TO_FIELD
 
+    # region next-event scheduling (see `EventScheduler`)
+
+    def stepsToNextEvent(self) -> int:
+        """
+        Number of the following steps in which the bird only flies straight to its target (the next event is the arrival).
+
+        Returns
+        -------
+        int
+            The number of steps, 0 if the bird has to be actuated in the next step.
+        """
+        if self.state not in (BirdState.MOVING_TO_FIELD, BirdState.FLEEING) or self.location == self.target:
+            return 0
+        # the bird moves by its speed in each step and lands on the target once it is closer than the speed
+        moves = self.location.distance(self.target) / self.speed
+        if abs(moves - round(moves)) < 1e-6:
+            return 0  # the step of the landing depends on the rounding of the moves, the bird is actuated normally
+        return math.floor(moves) + 1
+
+    def fastForward(self, steps: int):
+        """
+        Advances the bird by the given number of steps of its flight (at most `stepsToNextEvent`), the bird lands
+        on the target in the last step.
+        """
+        distance = self.location.distance(self.target)
+        if steps * self.speed > distance:
+            self.location = self.target
+        elif steps > 0:
+            ratio = steps * self.speed / distance
+            self.location = Point2D(self.location.x + (self.target.x - self.location.x) * ratio,
+                                    self.location.y + (self.target.y - self.location.y) * ratio)
+
+    # endregion
+
     def actuate(self):
         """
         it perform the actions of the bird in one time-step.
@@ -132,7 +168,7 @@ class Bird(MovingComponent2D):
             else:
                 self.move(self.target)
         if self.state == BirdState.OBSERVING or self.state == BirdState.EATING:
-            if WORLD.isProtectedByDrone(self.location):
+            if self.world.isProtectedByDrone(self.location):
                 self.moveToNoField()
                 self.state = BirdState.FLEEING
             else:
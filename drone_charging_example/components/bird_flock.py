@@ -0,0 +1,232 @@
+import random
+from typing import List
+
+import numpy as np
+
+from world import ENVIRONMENT, currentContext
+from components.bird import Bird, BirdState
+from components.drone_state import DroneState
+from components.field import Field
+from ml_deeco.simulation import Component, Point2D
+
+IDLE = BirdState.IDLE.value
+MOVING_TO_FIELD = BirdState.MOVING_TO_FIELD.value
+OBSERVING = BirdState.OBSERVING.value
+EATING = BirdState.EATING.value
+FLEEING = BirdState.FLEEING.value
+
+NO_FIELD = -1
+
+# columns of the random numbers drawn for each bird in a step
+IDLE_DECISION, EATING_DECISION, FIELD_CHOICE, NEW_FIELD_CROP_CHOICE, SAME_FIELD_CROP_CHOICE, EMPTY_POINT_CHOICE = range(6)
+RANDOM_COLUMNS = 6
+
+
+class BirdFlock(Component):
+    """
+    All the birds of the world advanced at once with NumPy.
+
+    The flock follows the same state machine as `Bird.actuate` (see there), but each transition is applied to all birds
+    in the state at once using masks. All the random numbers needed in a step are drawn in a single call of the generator.
+    The damage of the crops is accumulated in per-field grids and the fields are updated only for the hit crops.
+
+    The results are statistically equivalent to simulating the `Bird` components, but not identical:
+    the birds use their own random generator and the decisions of all birds in a step see the crops damaged in the previous phase
+    (rather than by the previous bird).
+
+    Attributes
+    ----------
+    x, y : np.ndarray
+        The locations of the birds.
+    targetX, targetY : np.ndarray
+        The targets of the birds.
+    state : np.ndarray
+        The `BirdState` values of the birds.
+    field : np.ndarray
+        Index of the target field of each bird (-1 if none).
+    damage : list
+        Grid (np.ndarray of crop width x height) with the number of times each crop was eaten, per field.
+    """
+
+    def __init__(self, count: int, fields: List[Field], emptyPoints: List[Point2D]):
+        """
+        Creates the flock of birds at random locations.
+
+        Parameters
+        ----------
+        count : int
+            Number of birds.
+        fields : list
+            The fields of the world.
+        emptyPoints : list
+            The points which are not on the fields (the birds flee there).
+        """
+        super().__init__()
+        self.world = currentContext().world
+        self.count = count
+        self.speed = ENVIRONMENT.birdSpeed
+        self.rng = np.random.default_rng(random.getrandbits(64))
+
+        self.x = self.rng.integers(0, ENVIRONMENT.mapWidth, count).astype(np.float64)
+        self.y = self.rng.integers(0, ENVIRONMENT.mapHeight, count).astype(np.float64)
+        self.targetX = self.x.copy()
+        self.targetY = self.y.copy()
+        self.state = np.full(count, IDLE, dtype=np.int8)
+        self.field = np.full(count, NO_FIELD, dtype=np.int32)
+
+        self.fields = fields
+        self.fieldOrigins = np.array([[field.topLeft.x, field.topLeft.y] for field in fields], dtype=np.int64).reshape(-1, 2)
+        self.damage = [np.zeros((field.bottomRight.x - field.topLeft.x, field.bottomRight.y - field.topLeft.y), dtype=np.int8)
+                       for field in fields]
+        self.undamaged = [np.flatnonzero(grid < Field.DAMAGE_DEPTH) for grid in self.damage]
+
+        self.emptyX = np.array([point.x for point in emptyPoints], dtype=np.float64)
+        self.emptyY = np.array([point.y for point in emptyPoints], dtype=np.float64)
+
+    # region transitions
+
+    def moveToNewField(self, birds, fieldChoice, cropChoice):
+        """Each of the `birds` (indices) targets a random undamaged crop of a random field, or goes IDLE if there is none."""
+        self.field[birds] = (fieldChoice * len(self.fields)).astype(np.int32)
+        self.moveWithinSameField(birds, cropChoice)
+
+    def moveWithinSameField(self, birds, cropChoice):
+        """Each of the `birds` (indices) targets a random undamaged crop of its field, or goes IDLE if there is none."""
+        fields = self.field[birds]
+        for fieldIndex in np.unique(fields):
+            inField = fields == fieldIndex
+            selected = birds[inField]
+            undamaged = self.undamaged[fieldIndex]
+            if len(undamaged) == 0:
+                self.field[selected] = NO_FIELD
+                self.state[selected] = IDLE
+                continue
+            crops = undamaged[(cropChoice[inField] * len(undamaged)).astype(np.int64)]
+            height = self.damage[fieldIndex].shape[1]
+            self.targetX[selected] = self.fieldOrigins[fieldIndex, 0] + crops // height
+            self.targetY[selected] = self.fieldOrigins[fieldIndex, 1] + crops % height
+            self.state[selected] = MOVING_TO_FIELD
+
+    def moveToNoField(self, birds, pointChoice):
+        """The `birds` (indices) flee to random empty points."""
+        points = (pointChoice * len(self.emptyX)).astype(np.int64)
+        self.field[birds] = NO_FIELD
+        self.targetX[birds] = self.emptyX[points]
+        self.targetY[birds] = self.emptyY[points]
+        self.state[birds] = FLEEING
+
+    def move(self, birds):
+        """Moves the `birds` (indices) towards their targets by `speed` (the same rule as `MovingComponent2D.move`)."""
+        dx = self.targetX[birds] - self.x[birds]
+        dy = self.targetY[birds] - self.y[birds]
+        distance = np.sqrt(dx * dx + dy * dy)
+        reached = distance < self.speed
+        ratio = np.divide(self.speed, distance, out=np.zeros_like(distance), where=~reached)
+        self.x[birds] = np.where(reached, self.targetX[birds], self.x[birds] + dx * ratio)
+        self.y[birds] = np.where(reached, self.targetY[birds], self.y[birds] + dy * ratio)
+
+    def atTarget(self, birds):
+        return (self.x[birds] == self.targetX[birds]) & (self.y[birds] == self.targetY[birds])
+
+    def protectedByDrone(self, birds):
+        """Whether the `birds` (indices) are within the radius of a protecting drone (see `Drone.isProtecting`)."""
+        drones = [drone for drone in self.world.drones if drone.state in (DroneState.PROTECTING, DroneState.MOVING_TO_FIELD)]
+        if len(drones) == 0 or len(birds) == 0:
+            return np.zeros(len(birds), dtype=bool)
+        droneX = np.array([drone.location.x for drone in drones], dtype=np.float64)
+        droneY = np.array([drone.location.y for drone in drones], dtype=np.float64)
+        radius = np.array([drone.droneRadius for drone in drones], dtype=np.float64)
+        dx = self.x[birds, np.newaxis] - droneX
+        dy = self.y[birds, np.newaxis] - droneY
+        return np.any(np.sqrt(dx * dx + dy * dy) <= radius, axis=1)
+
+    def eat(self, birds):
+        """The `birds` (indices) eat the crops at their locations (see `Field.locationDamaged`)."""
+        fields = self.field[birds]
+        for fieldIndex in np.unique(fields):
+            selected = birds[fields == fieldIndex]
+            grid = self.damage[fieldIndex]
+            cropX = self.x[selected].astype(np.int64) - self.fieldOrigins[fieldIndex, 0]
+            cropY = self.y[selected].astype(np.int64) - self.fieldOrigins[fieldIndex, 1]
+            hits = np.zeros(grid.shape, dtype=np.int32)
+            np.add.at(hits, (cropX, cropY), 1)
+
+            before = grid.astype(np.int32)
+            after = np.minimum(before + hits, Field.DAMAGE_DEPTH)
+            changed = (hits > 0) & (before < Field.DAMAGE_DEPTH)
+            grid[changed] = after[changed]
+
+            field = self.fields[fieldIndex]
+            originX, originY = self.fieldOrigins[fieldIndex]
+            newlyDamaged = False
+            for i, j in zip(*np.nonzero(changed)):
+                crop = (int(originX + i), int(originY + j))
+                if after[i, j] == Field.DAMAGE_DEPTH:
+                    field.markDamaged(crop)
+                    newlyDamaged = True
+                else:
+                    field.crops[crop] = int(after[i, j])
+            if newlyDamaged:
+                self.undamaged[fieldIndex] = np.flatnonzero(grid < Field.DAMAGE_DEPTH)
+
+    # endregion
+
+    def actuate(self):
+        """Performs one time step of all birds, the phases follow the order of the states in `Bird.actuate`."""
+        choices = self.rng.random((self.count, RANDOM_COLUMNS))
+
+        # IDLE
+        birds = np.flatnonzero(self.state == IDLE)
+        decision = choices[birds, IDLE_DECISION]
+        leaving = decision > Bird.StayProbability
+        attacking = leaving & (decision - Bird.StayProbability < Bird.AttackProbability)
+        attackers = birds[attacking]
+        self.moveToNewField(attackers, choices[attackers, FIELD_CHOICE], choices[attackers, NEW_FIELD_CROP_CHOICE])
+        fleeing = birds[leaving & ~attacking]
+        self.moveToNoField(fleeing, choices[fleeing, EMPTY_POINT_CHOICE])
+
+        # MOVING_TO_FIELD
+        birds = np.flatnonzero(self.state == MOVING_TO_FIELD)
+        arrived = self.atTarget(birds)
+        self.state[birds[arrived]] = OBSERVING
+        self.move(birds[~arrived])
+
+        # FLEEING
+        birds = np.flatnonzero(self.state == FLEEING)
+        arrived = self.atTarget(birds)
+        self.state[birds[arrived]] = IDLE
+        self.move(birds[~arrived])
+
+        # OBSERVING or EATING
+        birds = np.flatnonzero((self.state == OBSERVING) | (self.state == EATING))
+        protected = self.protectedByDrone(birds)
+        scared = birds[protected]
+        self.moveToNoField(scared, choices[scared, EMPTY_POINT_CHOICE])
+        self.state[birds[~protected]] = EATING
+
+        # EATING
+        birds = np.flatnonzero(self.state == EATING)
+        self.eat(birds)
+        decision = choices[birds, EATING_DECISION]
+        leaving = (decision > Bird.StayProbability) & (decision - Bird.StayProbability >= Bird.AttackProbability)
+        staying = birds[~leaving]
+        self.moveWithinSameField(staying, choices[staying, SAME_FIELD_CROP_CHOICE])
+        fleeing = birds[leaving]
+        self.moveToNoField(fleeing, choices[fleeing, EMPTY_POINT_CHOICE])
+
+    def locations(self) -> List[Point2D]:
+        """The locations of all birds (for the visualization)."""
+        return [Point2D(x, y) for x, y in zip(self.x.tolist(), self.y.tolist())]
+
+    def countInState(self, state: BirdState) -> int:
+        return int(np.count_nonzero(self.state == state.value))
+
+    def __repr__(self):
+        """
+
+        Returns
+        -------
+        str
+            Represent the flock in one line (the number of birds in each state).
+        """
+        return f"{self.id}: " + ", ".join(f"{state.name}={self.countInState(state)}" for state in BirdState)
@@ -1,7 +1,8 @@
 import random
-from typing import List, TYPE_CHECKING
+from bisect import bisect_left
+from typing import List, TYPE_CHECKING, Tuple
 
-from world import ENVIRONMENT, WORLD
+from world import ENVIRONMENT, currentContext
 from components.drone_state import DroneState
 from ml_deeco.simulation import StationaryComponent2D, Point2D
 
@@ -9,10 +10,30 @@ if TYPE_CHECKING:
     from components.drone import Drone
 
 
+class DroneQueue:
+    """
+    A queue of drones of the charger (a list). Membership queries are answered from a set which is rebuilt only after the queue changes.
+    Assigning a new list to the queue (as the ensembles do every step) or calling `Charger.queueChanged` invalidates the set.
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.attribute = f"_{name}"
+
+    def __get__(self, charger, owner=None):
+        if charger is None:
+            return self
+        return getattr(charger, self.attribute)
+
+    def __set__(self, charger, drones):
+        setattr(charger, self.attribute, drones)
+        charger.queueChanged(self.name)
+
+
 class Charger(StationaryComponent2D):
     """
     The charger class represents the charger stations providing energy for drones in the simulation.
-    The charging rate and capacity is defined in the WORLD and ENVIRONMENT objects shared with all components.
+    The charging rate and capacity is defined in the WORLD and ENVIRONMENT objects of the context the charger was created in.
 
     Attributes
     ----------
@@ -28,7 +49,13 @@ class Charger(StationaryComponent2D):
         The list of accepted drones that are moving toward the charger.
     chargingDrones : list
         The list of drones that are being charged.
+    chargingOrder : list
+        The drones being charged ordered by their battery (descending).
     """
+    potentialDrones = DroneQueue()
+    waitingDrones = DroneQueue()
+    acceptedDrones = DroneQueue()
+    chargingDrones = DroneQueue()
 
     def __init__(self, location):
         """
@@ -40,12 +67,19 @@ class Charger(StationaryComponent2D):
             The location of the charger (constant).
         """
         super().__init__(location)
+        context = currentContext()
+        self.world = context.world
+        self.environment = context.environment
         self.chargingRate = ENVIRONMENT.chargingRate
         self.acceptedCapacity = ENVIRONMENT.chargerCapacity
+        self._queueSets = {}
+        self._queueFeatures = {}
+        self._queueFeaturesBatteryChanges = None
         self.potentialDrones: List[Drone] = []  # these belong to this charger and are not waiting or being charged
         self.waitingDrones: List[Drone] = []  # drones in need of being charged, waiting for acceptance
         self.acceptedDrones: List[Drone] = []  # drones accepted for charging, they move to the charger
         self.chargingDrones: List[Drone] = []  # drones currently being charged
+        self.chargingOrder: List[Drone] = []  # drones currently being charged, the highest battery first
 
     def startCharging(self, drone: 'Drone'):
         """
@@ -53,6 +87,13 @@ class Charger(StationaryComponent2D):
         """
         self.acceptedDrones.remove(drone)
         self.chargingDrones.append(drone)
+        self.queueChanged("acceptedDrones")
+        self.queueChanged("chargingDrones")
+        # all charging drones gain the same energy every step, so the order is kept by inserting the new drone to its place
+        position = 0
+        while position < len(self.chargingOrder) and self.chargingOrder[position].battery >= drone.battery:
+            position += 1
+        self.chargingOrder.insert(position, drone)
         drone.state = DroneState.CHARGING
 
     def doneCharging(self, drone: 'Drone'):
@@ -63,6 +104,57 @@ class Charger(StationaryComponent2D):
         drone.targetCharger = None
         drone.state = DroneState.IDLE
         self.chargingDrones.remove(drone)
+        self.chargingOrder.remove(drone)
+        self.queueChanged("chargingDrones")
+
+    def queueChanged(self, queue: str):
+        """Invalidates the membership set (and the features) of the queue, call this after the queue list is modified in place."""
+        self._queueSets.pop(queue, None)
+        self._queueFeatures.pop(queue, None)
+
+    def _inQueue(self, queue: str, drone: 'Drone') -> bool:
+        members = self._queueSets.get(queue)
+        if members is None:
+            members = self._queueSets[queue] = set(getattr(self, queue))
+        return drone in members
+
+    def isPotential(self, drone: 'Drone') -> bool:
+        """Whether the drone is in the `potentialDrones` queue."""
+        return self._inQueue("potentialDrones", drone)
+
+    def isWaiting(self, drone: 'Drone') -> bool:
+        """Whether the drone is in the `waitingDrones` queue."""
+        return self._inQueue("waitingDrones", drone)
+
+    def isAccepted(self, drone: 'Drone') -> bool:
+        """Whether the drone is in the `acceptedDrones` queue."""
+        return self._inQueue("acceptedDrones", drone)
+
+    def isCharging(self, drone: 'Drone') -> bool:
+        """Whether the drone is in the `chargingDrones` queue."""
+        return self._inQueue("chargingDrones", drone)
+
+    def queueFeatures(self, queue: str) -> Tuple[List[float], float]:
+        """
+        The features of the drones in the queue used by the waiting time estimate: the sorted batteries and the total missing battery.
+        They are computed once and reused until the queue or a battery of any drone changes.
+        """
+        if self._queueFeaturesBatteryChanges != self.world.batteryChanges:
+            self._queueFeatures.clear()
+            self._queueFeaturesBatteryChanges = self.world.batteryChanges
+        features = self._queueFeatures.get(queue)
+        if features is None:
+            drones = getattr(self, queue)
+            features = self._queueFeatures[queue] = (sorted([drone.battery for drone in drones]), sum([1 - drone.battery for drone in drones]))
+        return features
+
+    def countWithLowerBattery(self, queue: str, battery: float) -> int:
+        """Number of drones in the queue with lower battery than `battery`."""
+        return bisect_left(self.queueFeatures(queue)[0], battery)
+
+    def missingBattery(self, queue: str) -> float:
+        """Total battery missing to the drones in the queue."""
+        return self.queueFeatures(queue)[1]
 
     def timeToDoneCharging(self, alreadyAccepted=0):
         """
@@ -78,9 +170,8 @@ class Charger(StationaryComponent2D):
         float
             Time steps until a free charging slot.
         """
-        batteries = sorted(map(lambda d: d.battery, self.chargingDrones), reverse=True)
-        if len(batteries) > alreadyAccepted:
-            nthMaxBattery = batteries[alreadyAccepted]
+        if len(self.chargingOrder) > alreadyAccepted:
+            nthMaxBattery = self.chargingOrder[alreadyAccepted].battery
         else:
             nthMaxBattery = 1
         return (1 - nthMaxBattery) / self.chargingRate
@@ -104,7 +195,7 @@ class Charger(StationaryComponent2D):
         Point2D
             The point to be set as the target of drone.
         """
-        if drone in self.chargingDrones or drone in self.acceptedDrones:
+        if self.isCharging(drone) or self.isAccepted(drone):
             return self.location
         else:
             return self.randomNearLocation()
@@ -113,11 +204,11 @@ class Charger(StationaryComponent2D):
         # Charging rate depends on the number of drones currently being charged.
         # For example if ENVIRONMENT.totalAvailableChargingEnergy = 0.12, and the charging rate is 0.04, then it means 3 drones could simultaneously change at one or different chargers.
         # But for instance with 0.12, if there are 4 drones, they will get 0.03 charge rate.
-        totalChargingDrones = sum([len(charger.chargingDrones) for charger in WORLD.chargers])
+        totalChargingDrones = sum([len(charger.chargingDrones) for charger in self.world.chargers])
         if totalChargingDrones > 0:
-            currentChargingRate = min(totalChargingDrones * ENVIRONMENT.chargingRate,
-                                      ENVIRONMENT.totalAvailableChargingEnergy) / totalChargingDrones
-            ENVIRONMENT.currentChargingRate = currentChargingRate
+            currentChargingRate = min(totalChargingDrones * self.environment.chargingRate,
+                                      self.environment.totalAvailableChargingEnergy) / totalChargingDrones
+            self.environment.currentChargingRate = currentChargingRate
         else:
             currentChargingRate = 0
 
@@ -126,6 +217,8 @@ class Charger(StationaryComponent2D):
             drone.battery += currentChargingRate
             if drone.battery >= 1:
                 self.doneCharging(drone)
+        # the order only changes if a drone missed its charge in the loop above (when the previous one was removed), sorting an ordered list is linear
+        self.chargingOrder.sort(key=lambda d: -d.battery)
 
         # move drones from accepted to charging
         freeChargingPlaces = self.acceptedCapacity - len(self.chargingDrones)
@@ -2,7 +2,7 @@ import random
 from typing import Optional, TYPE_CHECKING
 from components.drone_state import DroneState
 from ml_deeco.estimators import ValueEstimate, NumericFeature, CategoricalFeature, NoEstimator
-from world import ENVIRONMENT, WORLD
+from world import ENVIRONMENT, WORLD, currentContext
 from ml_deeco.simulation import MovingComponent2D, SIMULATION_GLOBALS
 
 if TYPE_CHECKING:
@@ -13,7 +13,7 @@ class Drone(MovingComponent2D):
     """
     The drones protect the fields from birds by moving to the field and scaring the flocks of birds away.
 
-    In programming perspective, drone components have access to shared `WORLD` and they can find the position to protect.
+    In programming perspective, drone components have access to the `WORLD` they were created in and they can find the position to protect.
     In a real-life scenario, it is assumed that additional sensors will perform the detection of birds, and it can be read from them.
 
     Attributes
@@ -52,19 +52,30 @@ class Drone(MovingComponent2D):
         location : Point2D
             Starting point for the drone.
         """
+        self.world = currentContext().world
         self.droneRadius = ENVIRONMENT.droneRadius
         self.droneMovingEnergyConsumption = ENVIRONMENT.droneMovingEnergyConsumption
         self.droneProtectingEnergyConsumption = ENVIRONMENT.droneProtectingEnergyConsumption
-        self.battery = 1 - (ENVIRONMENT.droneBatteryRandomize * random.random())
+        self._battery = 1 - (ENVIRONMENT.droneBatteryRandomize * random.random())
         self._state = DroneState.IDLE
         self.target = None
         self.targetField = None
         self.targetCharger: Optional[Charger] = None
         self.closestCharger: Optional[Charger] = None
+        self._closestChargerCache = (None, None)  # (location, charger)
         self.alert = 0.1
         self.lastChargingTime = -1
         super().__init__(location, ENVIRONMENT.droneSpeed)
 
+    @property
+    def battery(self) -> float:
+        return self._battery
+
+    @battery.setter
+    def battery(self, value: float):
+        self._battery = value
+        self.world.batteryChanges += 1  # invalidates the features of the charger queues (see `Charger.queueFeatures`)
+
     @property
     def state(self) -> DroneState:
         return self._state
@@ -151,7 +162,13 @@ class Drone(MovingComponent2D):
         charger
             The closest charger to the drone.
         """
-        return min(WORLD.chargers, key=lambda charger: self.location.distance(charger.location))
+        # the chargers do not move, so the result only changes when the drone moves
+        location = (self.location.x, self.location.y)
+        cachedLocation, charger = self._closestChargerCache
+        if cachedLocation != location:
+            charger = self.world.chargers[self.world.scenario.closestChargerIndex(self.location, self.world.chargers)]
+            self._closestChargerCache = (location, charger)
+        return charger
 
     def timeToFlyToCharger(self, charger=None):
         """
@@ -0,0 +1,64 @@
+from typing import List
+
+from ml_deeco.simulation import Component
+
+
+class EventScheduler(Component):
+    """
+    Actuates its components only in the steps in which their behavior can change.
+
+    After each actuation, a component declares the number of the following steps in which its actuation is deterministic
+    and only changes the component itself (`stepsToNextEvent`), e.g. a bird flying straight to its target.
+    The component is not actuated in these steps; when its next event comes, it is advanced over the skipped steps
+    at once (`fastForward`) and actuated normally. The components are actuated in their original order,
+    so the results (including the random numbers drawn by the components) are the same as without the scheduler.
+
+    The skipped steps are applied lazily, call `synchronize` before reading the state of the components
+    (e.g. the locations for the visualization).
+
+    Attributes
+    ----------
+    components : list
+        The scheduled components (with the methods `actuate`, `stepsToNextEvent` and `fastForward`).
+    step : int
+        Number of the steps done.
+    actuations, skippedActuations : int
+        Number of the actuations of the components done and skipped.
+    """
+
+    def __init__(self, components: List):
+        super().__init__()
+        self.components = components
+        self.step = 0
+        self.asleep = [False] * len(components)
+        self.wakeSteps = [0] * len(components)  # the step in which the sleeping component is actuated again
+        self.advancedTo = [0] * len(components)  # the last step applied to the sleeping component
+        self.actuations = 0
+        self.skippedActuations = 0
+
+    def actuate(self):
+        step = self.step
+        for i, component in enumerate(self.components):
+            if self.asleep[i]:
+                if self.wakeSteps[i] > step:
+                    self.skippedActuations += 1
+                    continue
+                component.fastForward(step - 1 - self.advancedTo[i])
+                self.asleep[i] = False
+
+            component.actuate()
+            self.actuations += 1
+
+            steps = component.stepsToNextEvent()
+            if steps > 0:
+                self.asleep[i] = True
+                self.wakeSteps[i] = step + steps + 1
+                self.advancedTo[i] = step
+        self.step += 1
+
+    def synchronize(self):
+        """Applies the skipped steps to the sleeping components (they still sleep until their next event)."""
+        for i, component in enumerate(self.components):
+            if self.asleep[i] and self.advancedTo[i] < self.step - 1:
+                component.fastForward(self.step - 1 - self.advancedTo[i])
+                self.advancedTo[i] = self.step - 1
@@ -1,10 +1,31 @@
 import math
 import random
+from bisect import bisect_left
 from world import ENVIRONMENT
 from components.drone_state import DroneState
 from ml_deeco.simulation import Point2D
 
 
+class FieldLayout:
+    """
+    The places and crops of a field rectangle. They only depend on the config, so the layout is computed once and shared by the fields of all simulations.
+
+    Attributes
+    ----------
+    places : tuple
+        (x, y) of the places (centers of areas protected by one drone).
+    crops : tuple
+        (x, y) of all crops of the field, sorted (this is also the order in which they are stored in `Field.crops`).
+    """
+    __slots__ = ("places", "crops")
+
+    def __init__(self, pointLists, droneRadius):
+        x1, y1, x2, y2 = pointLists[:4]
+        step = round(droneRadius)
+        self.places = tuple((i, j) for i in range(x1 + droneRadius, x2, step) for j in range(y1 + droneRadius, y2, step))
+        self.crops = tuple((i, j) for i in range(x1, x2) for j in range(y1, y2))
+
+
 class Field:
     """
 
@@ -30,8 +51,12 @@ class Field:
         Map of current protecting drones to the assigned place.
     memory : dict (drone -> place)
         Map of all-time protecting drones to the assigned place.
+    droneDistances : dict (drone -> (location, distance))
+        Cache of `closestDistanceToDrone`, valid while the drone stays at the location.
     crops : dict (crops -> int)
         Map of crops with corresponding damage value.
+    undamaged : list
+        Sorted list of the undamaged crops (keys of `crops`), for choosing a random one.
     damaged : list
         List of all damaged crops.
     damage : int
@@ -50,7 +75,10 @@ class Field:
     topLeft: Point2D
     bottomRight: Point2D
 
-    def __init__(self, pointLists):
+    __slots__ = ("droneRadius", "id", "topLeft", "bottomRight", "places", "protectingDrones", "memory", "droneDistances",
+                 "crops", "undamaged", "damaged", "damage", "allCrops")
+
+    def __init__(self, pointLists, layout=None):
         """
 
         Initiate a field of places and crops. Each filed has N places, with M crops.
@@ -63,24 +91,24 @@ class Field:
         ----------
         pointLists : List
             [x1,y1,x2,y2] to create a rectangle.
+        layout : FieldLayout, optional
+            Precomputed places and crops of the rectangle, computed if not given.
         """
         Field.Count = Field.Count + 1
         self.droneRadius = ENVIRONMENT.droneRadius
         self.id = f"FIELD_{Field.Count}"
         self.topLeft = Point2D(pointLists[0], pointLists[1])
         self.bottomRight = Point2D(pointLists[2], pointLists[3])
-        self.places = []
         self.protectingDrones = {}
         self.memory = {}
-        self.crops = {}  # for birds
+        self.droneDistances = {}  # drone -> (location, distance), cache for closestDistanceToDrone
         self.damaged = []  # for visualization
         self.damage = 0
-        for i in range(self.topLeft.x + self.droneRadius, self.bottomRight.x, round(self.droneRadius )):
-            for j in range(self.topLeft.y + self.droneRadius, self.bottomRight.y, round(self.droneRadius)):
-                self.places.append(Point2D(i, j))
-        for i in range(self.topLeft.x, self.bottomRight.x):
-            for j in range(self.topLeft.y, self.bottomRight.y):
-                self.crops[(i, j)] = 0
+        if layout is None:
+            layout = FieldLayout(pointLists, self.droneRadius)
+        self.places = [Point2D(i, j) for i, j in layout.places]
+        self.crops = dict.fromkeys(layout.crops, 0)  # for birds
+        self.undamaged = list(layout.crops)
         self.allCrops = len(self.crops)
 
     def locationPoints(self):
@@ -133,12 +161,18 @@ class Field:
         int
             minimum distance to the drone.
         """
+        location = (drone.location.x, drone.location.y)
+        cached = self.droneDistances.get(drone)
+        if cached is not None and cached[0] == location:
+            return cached[1]
         distances = []
         for place in self.places:
             dx = place.x - drone.location.x
             dy = place.y - drone.location.y
             distances.append(math.sqrt(dx * dx + dy * dy))
-        return min(distances)
+        distance = min(distances)
+        self.droneDistances[drone] = (location, distance)
+        return distance
 
     def assignPlace(self, drone):
         """
@@ -216,9 +250,22 @@ class Field:
         if p in self.crops:
             self.crops[p] = self.crops[p] + 1
             if self.crops[p] == Field.DAMAGE_DEPTH:
-                del self.crops[p]
-                self.damaged.append(Point2D(location.x, location.y))
-                self.damage = self.damage + 1
+                self.markDamaged(p)
+
+    def markDamaged(self, crop):
+        """
+
+        Removes the crop from the undamaged crops and counts it as damaged.
+
+        Parameters
+        ----------
+        crop : tuple
+            (x, y) of an undamaged crop.
+        """
+        del self.crops[crop]
+        del self.undamaged[bisect_left(self.undamaged, crop)]
+        self.damaged.append(Point2D(crop[0], crop[1]))
+        self.damage = self.damage + 1
 
     def randomUndamagedCrop(self):
         """
@@ -230,9 +277,9 @@ class Field:
         Point2D
             A random point which is not yet fully damaged.
         """
-        if len(self.crops) == 0:
+        if len(self.undamaged) == 0:
             return None
-        safe = random.choice([p for p in self.crops])
+        safe = random.choice(self.undamaged)
         return Point2D(safe[0], safe[1])
  
     def __str__(self):
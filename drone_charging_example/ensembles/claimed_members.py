@@ -0,0 +1,36 @@
+from typing import Dict, Set, Type
+
+from ml_deeco.simulation import Ensemble, SIMULATION_GLOBALS
+
+
+class ClaimedMembers:
+    """
+    Index of the components claimed by the ensembles materialized in the current time step.
+
+    The ensembles register their members (usually in `actuate`, which is called right after the ensemble is materialized),
+    so the selection of the other ensembles can ask whether a component is already a member of an ensemble of a given type
+    in O(1) instead of iterating over all the materialized ensembles. The index is cleared automatically when the time step changes.
+    """
+
+    def __init__(self):
+        self._step = None
+        self._claims: Dict[Type[Ensemble], Set] = {}
+
+    def _currentClaims(self):
+        step = SIMULATION_GLOBALS.currentTimeStep
+        if step != self._step:
+            self._claims.clear()
+            self._step = step
+        return self._claims
+
+    def claim(self, ensemble: Ensemble, component):
+        """Registers the component as a member of the ensemble (it is also registered for the base ensemble types)."""
+        claims = self._currentClaims()
+        for ensembleType in type(ensemble).__mro__:
+            if issubclass(ensembleType, Ensemble) and ensembleType is not Ensemble:
+                claims.setdefault(ensembleType, set()).add(component)
+
+    def isClaimed(self, ensembleType: Type[Ensemble], component) -> bool:
+        """Whether the component is a member of an ensemble of the given type materialized in this time step."""
+        members = self._currentClaims().get(ensembleType)
+        return members is not None and component in members
@@ -4,10 +4,10 @@ from typing import List, TYPE_CHECKING
 from world import ENVIRONMENT, WORLD
 from components.drone_state import DroneState
 from components.drone import Drone
+from utils.tracing import PRE_ASSIGNMENT, ASSIGNMENT, ACCEPTED_ASSIGNMENT
 
 from ml_deeco.estimators import NumericFeature, CategoricalFeature
 from ml_deeco.simulation import Ensemble, someOf
-from ml_deeco.utils import verbosePrint
 
 if TYPE_CHECKING:
     from components.charger import Charger
@@ -41,6 +41,7 @@ class DroneChargingPreAssignment(Ensemble):
         """
         super().__init__()
         self.charger = charger
+        self.tracer = WORLD.tracer if WORLD.tracer.records(PRE_ASSIGNMENT) else None
 
     def priority(self):
         """Arbitrarily set to 4 to be the highest among charging-related ensembles."""
@@ -57,7 +58,8 @@ class DroneChargingPreAssignment(Ensemble):
 
     def actuate(self):
         """Save the selected drones to the `potentialDrones` and update their ˙closestCharger˙."""
-        verbosePrint(f"DroneChargingPreassignment: assigned {len(self.drones)} to {self.charger.id}", 4)
+        if self.tracer is not None:
+            self.tracer.record(PRE_ASSIGNMENT, None, self.charger.id, len(self.drones))
 
         self.charger.potentialDrones = self.drones
         for drone in self.drones:
@@ -85,6 +87,7 @@ class DroneChargingAssignment(Ensemble):
         """
         super().__init__()
         self.charger = charger
+        self.tracer = WORLD.tracer if WORLD.tracer.records(ASSIGNMENT) else None
 
     def priority(self):
         """Arbitrarily set to 3 to be materialized second among the charging-related ensembles."""
@@ -108,7 +111,7 @@ class DroneChargingAssignment(Ensemble):
         2. We compute an estimated waiting time for a charger slot.
         3. Based on the waiting time estimate and time needed to reach the charger, the drone decides whether it needs charging.
         """
-        if drone not in self.charger.potentialDrones:
+        if not self.charger.isPotential(drone):
             return False
 
         waitingTimeEstimate = self.drones.estimate(drone)
@@ -159,7 +162,7 @@ class DroneChargingAssignment(Ensemble):
 
     @drones.estimate.input(NumericFeature(0, ENVIRONMENT.chargerCapacity))
     def accepted_drones_missing_battery(self, drone):
-        return sum([1 - drone.battery for drone in self.charger.acceptedDrones])
+        return self.charger.missingBattery("acceptedDrones")
 
     @drones.estimate.input(NumericFeature(0, ENVIRONMENT.chargerCapacity))
     def charging_drones_count(self, drone):
@@ -167,11 +170,11 @@ class DroneChargingAssignment(Ensemble):
 
     @drones.estimate.input(NumericFeature(0, ENVIRONMENT.chargerCapacity))
     def charging_drones_missing_battery(self, drone):
-        return sum([1 - drone.battery for drone in self.charger.chargingDrones])
+        return self.charger.missingBattery("chargingDrones")
 
     @drones.estimate.input(NumericFeature(0, ENVIRONMENT.droneCount))
     def potential_drones_with_lower_battery(self, drone):
-        return len([d for d in self.charger.potentialDrones if d.battery < drone.battery])
+        return self.charger.countWithLowerBattery("potentialDrones", drone.battery)
 
     @drones.estimate.input(NumericFeature(0, ENVIRONMENT.chargerCapacity))
     def waiting_drones_count(self, drone):
@@ -179,7 +182,7 @@ class DroneChargingAssignment(Ensemble):
 
     @drones.estimate.input(NumericFeature(0, ENVIRONMENT.droneCount))
     def waiting_drones_with_lower_battery(self, drone):
-        return len([d for d in self.charger.waitingDrones if d.battery < drone.battery])
+        return self.charger.countWithLowerBattery("waitingDrones", drone.battery)
 
     # endregion
 
@@ -187,16 +190,17 @@ class DroneChargingAssignment(Ensemble):
     @drones.estimate.conditionsValid
     def is_preassigned(self, drone):
         """We only collect data for the ML if the drone is pre-assigned to the charger."""
-        return drone in self.charger.potentialDrones
+        return self.charger.isPotential(drone)
 
     @drones.estimate.condition
     def is_accepted(self, drone):
         """Condition for the estimate of waiting time. The waiting ends when the drone is accepted for charging."""
-        return drone in self.charger.acceptedDrones
+        return self.charger.isAccepted(drone)
 
     def actuate(self):
         """Save the selected drones to the `waitingDrones` list of the charger."""
-        verbosePrint(f"DroneChargingAssignment: assigned {len(self.drones)} to {self.charger.id}", 4)
+        if self.tracer is not None:
+            self.tracer.record(ASSIGNMENT, None, self.charger.id, len(self.drones))
 
         self.charger.waitingDrones = self.drones
 
@@ -220,6 +224,7 @@ class AcceptedDronesAssignment(Ensemble):
         """
         super().__init__()
         self.charger = charger
+        self.tracer = WORLD.tracer if WORLD.tracer.records(ACCEPTED_ASSIGNMENT) else None
 
     def priority(self):
         """Arbitrarily set to 2 to be materialized last among the charging-related ensembles (but before the field protection ensembles)."""
@@ -241,20 +246,21 @@ class AcceptedDronesAssignment(Ensemble):
         a) Drones which were accepted earlier are selected again (until they reach the charger)
         b) Among the drones in need of charging (`waitingDrones`), we consider those, for which there would be a free charging slot when they reached the charger if they started flying towards it now.
         """
-        return drone in self.charger.acceptedDrones or \
-            drone in self.charger.waitingDrones and \
+        return self.charger.isAccepted(drone) or \
+            self.charger.isWaiting(drone) and \
             self.charger.timeToDoneCharging(len(self.drones)) <= drone.timeToFlyToCharger()
 
     @drones.utility
     def drones(self, drone: 'Drone'):
         """Orders the drones by the time needed to finish charging them (time to reach the charger + time to charge the battery). The drones accepted before have higher utility than all the new drones."""
-        if drone in self.charger.acceptedDrones:
+        if self.charger.isAccepted(drone):
             return 1  # keep the accepted drones from previous time steps
         return -drone.timeToDoneCharging()
 
     def actuate(self):
         """Saves the selected drones to the `acceptedDrones` list and updates their `targetCharger`."""
-        verbosePrint(f"AcceptedDronesAssignment: assigned {len(self.drones)} to {self.charger.id}", 4)
+        if self.tracer is not None:
+            self.tracer.record(ACCEPTED_ASSIGNMENT, None, self.charger.id, len(self.drones))
 
         self.charger.acceptedDrones = self.drones
         for drone in self.drones:
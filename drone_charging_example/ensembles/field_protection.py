@@ -2,8 +2,8 @@ from typing import TYPE_CHECKING, List
 from world import WORLD
 from components.drone_state import DroneState
 from components.drone import Drone
+from utils.tracing import FIELD_PROTECTION
 from ml_deeco.simulation import Ensemble, oneOf
-from ml_deeco.utils import verbosePrint
 if TYPE_CHECKING:
     from components.field import Field
 
@@ -26,6 +26,7 @@ class FieldProtection(Ensemble):
         """
         super().__init__()
         self.field = field
+        self.tracer = WORLD.tracer if WORLD.tracer.records(FIELD_PROTECTION) else None
 
     # dynamic role
     drone: Drone = oneOf(Drone)
@@ -47,7 +48,7 @@ class FieldProtection(Ensemble):
     @drone.select
     def drone(self, drone: 'Drone', otherEnsembles):
         """Select only idle drones not selected by the otehr ensembles."""
-        if drone in (ens.drone for ens in otherEnsembles if isinstance(ens, FieldProtection)):
+        if WORLD.claimedMembers.isClaimed(FieldProtection, drone):
             return False
         return drone.state == DroneState.IDLE
 
@@ -61,7 +62,9 @@ class FieldProtection(Ensemble):
         Assign the selected drone to the field by setting its targetField property.
         """
         self.drone.targetField = self.field
-        verbosePrint(f"Protecting Ensemble: assigning {self.drone.id} to {self.field.id}", 4)
+        WORLD.claimedMembers.claim(self, self.drone)
+        if self.tracer is not None:
+            self.tracer.record(FIELD_PROTECTION, self.drone.id, self.field.id)
 
 
 def getEnsembles() -> List[Ensemble]:
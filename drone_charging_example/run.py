@@ -10,19 +10,32 @@ except ImportError:
     from yaml import Loader, Dumper
 import os
 import argparse
+import json
+import multiprocessing
 import random
 import numpy as np
 import math
+from concurrent.futures import ProcessPoolExecutor
 
 os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")  # Report only TF errors by default
 os.environ["CUDA_VISIBLE_DEVICES"] = "-1"  # Disable GPU in TF. The models are small, so it is actually faster to use the CPU.
 import tensorflow as tf
 
-from world import WORLD, ENVIRONMENT  # This import should be first
+from world import WORLD, ENVIRONMENT, currentContext  # This import should be first
 from components.drone_state import DroneState
 from utils.visualizers import Visualizer
 from utils import plots
+from utils.artifacts import ArtifactWriter
 from utils.average_log import AverageLog
+from utils.charger_log import ChargerLogFile, queueLengths
+from utils.evaluation import DeferredEvaluation
+from utils.profiler import Profiler, STEP_CALLBACK
+from utils.live_metrics import LiveMetrics, MetricsServer
+from utils.lockstep import LockstepSimulations
+from utils.memo import PredictionCache, SCOPES
+from utils.tracing import SAVING_ANIMATION, SAVING_CHARGER_PLOT
+from utils.training import TrainingController, POLICIES
+from utils.workqueue import Coordinator
 
 from ml_deeco.estimators import ConstantEstimator, NeuralNetworkEstimator
 from ml_deeco.simulation import run_experiment, SIMULATION_GLOBALS
@@ -46,12 +59,54 @@ def run(args):
     yamlObject = loadConfig(args)
 
     folder, yamlFileName = prepareFoldersForResults(args)
+    with open(f"{folder}/{yamlFileName}_args.json", "w") as argsFile:
+        json.dump(vars(args), argsFile, indent=2)  # e.g. the seed for the results index (utils/results.py)
 
     averageLog, totalLog = createLogs()
     visualizer: Optional[Visualizer] = None
 
     createEstimators(args, folder)
     WORLD.initEstimators()
+    configureWorld(args)
+
+    # the models are saved by the writer (also when the training controller defers the saving)
+    artifactWriter = ArtifactWriter(args.async_artifacts)
+    artifactWriter.instrumentEstimators(SIMULATION_GLOBALS.estimators)
+
+    trainingController: Optional[TrainingController] = None
+    if args.pipelined_training or args.compact_data is not None or args.early_stopping is not None or \
+            args.training_budget is not None or args.training_schedule or args.numpy_inference:
+        trainingController = TrainingController(SIMULATION_GLOBALS.estimators, args.pipelined_training, args.compact_data,
+                                                 args.early_stopping, args.training_budget, args.training_schedule,
+                                                 args.numpy_inference, args.test_split)
+
+    predictionCache: Optional[PredictionCache] = None
+    if args.prediction_cache:
+        predictionCache = PredictionCache(SIMULATION_GLOBALS.estimators, args.prediction_cache, args.prediction_cache_decimals)
+
+    deferredEvaluation: Optional[DeferredEvaluation] = None
+    if args.deferred_evaluation:
+        deferredEvaluation = DeferredEvaluation(SIMULATION_GLOBALS.estimators, f"{folder}/{yamlFileName}_evaluation.npz", artifactWriter)
+
+    liveMetrics: Optional[LiveMetrics] = None
+    metricsServer: Optional[MetricsServer] = None
+    if args.metrics:
+        liveMetrics = LiveMetrics(SIMULATION_GLOBALS.estimators, trainingController=trainingController)
+        metricsServer = MetricsServer(liveMetrics, args.metrics)
+        metricsServer.start()
+
+    chargerLogFile = ChargerLogFile(f"{folder}/{yamlFileName}_chargers.npz")
+
+    # the charger plots are rendered in other processes while the simulations continue
+    plotPool: Optional[ProcessPoolExecutor] = None
+    plotFutures = []
+    if args.chart:
+        plotPool = ProcessPoolExecutor(args.plot_processes, mp_context=multiprocessing.get_context("spawn"))
+
+    profiler: Optional[Profiler] = None
+    if args.profile:
+        profiler = Profiler()
+        profiler.instrumentEstimators(SIMULATION_GLOBALS.estimators)
 
     def prepareSimulation(iteration, s):
         """Prepares the _Simulation_ (formerly known as _Run_)."""
@@ -60,42 +115,66 @@ def run(args):
             nonlocal visualizer
             visualizer = Visualizer(WORLD)
             visualizer.drawFields()
+        if profiler:
+            profiler.instrumentSimulation(components, ensembles)
+        if trainingController:
+            trainingController.simulationBoundary()
+        if liveMetrics:
+            liveMetrics.simulationStarted(iteration, s, currentContext().world)
         return components, ensembles
 
     def stepCallback(components, materializedEnsembles, step):
         """Collect statistics after one _Step_ of the _Simulation_."""
+        logChargers()
+        if args.animation:
+            drawComponents(step)
+        if profiler:
+            profiler.stepDone()
+        if liveMetrics:
+            liveMetrics.stepDone()
+
+    def logChargers():
         for chargerIndex in range(len(WORLD.chargers)):
-            charger = WORLD.chargers[chargerIndex]
-            accepted = set(charger.acceptedDrones)
-            waiting = set(charger.waitingDrones)
-            potential = set(charger.potentialDrones)
-            WORLD.chargerLogs[chargerIndex].register([
-                len(charger.chargingDrones),
-                len(accepted),
-                len(waiting - accepted),
-                len(potential - waiting - accepted),
-            ])
+            WORLD.chargerLogs[chargerIndex].register(queueLengths(WORLD.chargers[chargerIndex]))
 
-        if args.animation:
-            visualizer.drawComponents(step + 1)
+    def drawComponents(step):
+        visualizer.drawComponents(step + 1)
+
+    if profiler:
+        logChargers = profiler.wrapFunction(logChargers, STEP_CALLBACK, "charger logs")
+        drawComponents = profiler.wrapFunction(drawComponents, STEP_CALLBACK, "visualization")
 
     def simulationCallback(components, ensembles, t, i):
         """Collect statistics after each _Simulation_ is done."""
         totalLog.register(collectStatistics(t, i))
-        WORLD.chargerLog.export(f"{folder}/charger_logs/{yamlFileName}_{t + 1}_{i + 1}.csv")
+        # the logs, the tracer and the visualizer are replaced by the next simulation, so they are not copied
+        artifactWriter.submit([chargerLogFile.filename], chargerLogFile.append, t + 1, i + 1, WORLD.chargerLogs)
+        tracer = WORLD.tracer
 
         if args.animation:
-            verbosePrint(f"Saving animation...", 3)
-            visualizer.createAnimation(f"{folder}/animations/{yamlFileName}_{t + 1}_{i + 1}.gif")
-            verbosePrint(f"Animation saved.", 3)
+            animationFile = f"{folder}/animations/{yamlFileName}_{t + 1}_{i + 1}.gif"
+            if tracer.records(SAVING_ANIMATION):
+                tracer.record(SAVING_ANIMATION, None, animationFile)
+            artifactWriter.saveAnimation(visualizer, animationFile)
 
         if args.chart:
-            verbosePrint(f"Saving charger plot...", 3)
-            plots.createChargerPlot(
+            chargerPlotFile = f"{folder}\\charger_logs\\{yamlFileName}_{str(t + 1)}_{str(i + 1)}"
+            if tracer.records(SAVING_CHARGER_PLOT):
+                tracer.record(SAVING_CHARGER_PLOT, None, chargerPlotFile)
+            plotFutures.append(plotPool.submit(
+                plots.createChargerPlot,
                 WORLD.chargerLogs,
-                f"{folder}\\charger_logs\\{yamlFileName}_{str(t + 1)}_{str(i + 1)}",
-                f"World: {yamlFileName}\n Run: {i + 1} in training {t + 1}\nCharger Queues")
-            verbosePrint(f"Charger plot saved.", 3)
+                chargerPlotFile,
+                f"World: {yamlFileName}\n Run: {i + 1} in training {t + 1}\nCharger Queues"))
+
+        # saved after the events of the simulation callback are recorded
+        if args.trace:
+            artifactWriter.saveTrace(tracer, f"{folder}/traces/{yamlFileName}_{t + 1}_{i + 1}.npz")
+
+        if profiler:
+            print(profiler.table(f"Profile of run {i + 1} in iteration {t + 1}:"))
+            profiler.export(f"{folder}/profile/{yamlFileName}_{t + 1}_{i + 1}.json", iteration=t + 1, simulation=i + 1)
+            profiler.reset()
 
     def iterationCallback(t):
         """Aggregate statistics from all _Simulations_ in one _Iteration_."""
@@ -105,12 +184,66 @@ def run(args):
 
         for estimator in SIMULATION_GLOBALS.estimators:
             estimator.saveModel(t + 1)
-
-    run_experiment(args.iterations, args.simulations, ENVIRONMENT.maxSteps, prepareSimulation,
-                   iterationCallback=iterationCallback, simulationCallback=simulationCallback, stepCallback=stepCallback)
-
-    totalLog.export(f"{folder}\\{yamlFileName}.csv")
-    averageLog.export(f"{folder}\\{yamlFileName}_average.csv")
+        if trainingController:
+            artifactWriter.exportLog(trainingController.trainingLog, f"{folder}/training.csv")
+            if args.numpy_inference:
+                artifactWriter.exportLog(trainingController.inferenceLog, f"{folder}/numpy_inference.csv")
+
+        if deferredEvaluation:
+            artifactWriter.exportLog(deferredEvaluation.metricsLog, f"{folder}/evaluation.csv")
+
+        if profiler:
+            print(profiler.table(f"Profile of training {t + 1}:"))
+            profiler.export(f"{folder}/profile/{yamlFileName}_{t + 1}_training.json", iteration=t + 1)
+            profiler.reset()
+
+        artifactWriter.checkpoint()
+
+    if args.work_queue:
+        # the simulations are run by the workers, the estimators are trained here
+        coordinator = Coordinator(args.work_queue, args, yamlObject, SIMULATION_GLOBALS.estimators, args.accumulate_data, args.job_timeout)
+        coordinator.startLocalWorkers(args.local_workers)
+        coordinator.run(args.iterations, args.simulations, lambda statistics, t, i: totalLog.register(statistics), iterationCallback)
+    elif args.lockstep > 1:
+        lockstep = LockstepSimulations(SIMULATION_GLOBALS.estimators)
+
+        def prepareLockstepBatch(t, batch):
+            """Runs a batch of the _Simulations_ in lockstep, the framework then runs an empty simulation."""
+            first = batch * args.lockstep
+            lockstep.run(min(args.lockstep, args.simulations - first), ENVIRONMENT.maxSteps,
+                         lambda r: prepareSimulation(t, first + r), stepCallback,
+                         lambda components, ensembles, r: simulationCallback(components, ensembles, t, first + r))
+            return [], []
+
+        # the framework still collects the data and trains the estimators at the end of each iteration
+        run_experiment(args.iterations, math.ceil(args.simulations / args.lockstep), 0, prepareLockstepBatch,
+                       iterationCallback=iterationCallback)
+        verbosePrint(f"Lockstep: {lockstep.batchedPredictions} predictions in {lockstep.batches} batches.", 1)
+    else:
+        run_experiment(args.iterations, args.simulations, ENVIRONMENT.maxSteps, prepareSimulation,
+                       iterationCallback=iterationCallback, simulationCallback=simulationCallback, stepCallback=stepCallback)
+
+    if trainingController:
+        trainingController.finish()
+        artifactWriter.exportLog(trainingController.trainingLog, f"{folder}/training.csv")
+        if args.numpy_inference:
+            artifactWriter.exportLog(trainingController.inferenceLog, f"{folder}/numpy_inference.csv")
+
+    if predictionCache:
+        for name, hits, misses, hitRate in predictionCache.stats():
+            verbosePrint(f"{name}: {hits} predictions taken from the cache, {misses} evaluated (hit rate {hitRate:.1%}).", 1)
+
+    if args.scenario_cache:
+        WORLD.scenario.save(args.scenario_cache)  # store also the lazily computed tables
+
+    if plotPool:
+        for future in plotFutures:
+            future.result()
+        plotPool.shutdown()
+        verbosePrint(f"Charger plots saved.", 3)
+
+    artifactWriter.exportLog(totalLog, f"{folder}\\{yamlFileName}.csv")
+    artifactWriter.exportLog(averageLog, f"{folder}\\{yamlFileName}_average.csv")
 
     plots.createLogPlot(
         totalLog.records,
@@ -119,6 +252,12 @@ def run(args):
         f"World: {yamlFileName}",
         (args.simulations, args.iterations)
     )
+
+    artifactWriter.close()
+    if metricsServer:
+        metricsServer.stop()
+    if args.async_artifacts is not None:
+        verbosePrint(f"Artifacts: {artifactWriter.writes} written in the background, waited for the writer {artifactWriter.waitingSeconds:.2f} s.", 1)
     return averageLog
 
 
@@ -131,6 +270,13 @@ def loadConfig(args):
     if args.birds > -1:
         yamlObject['birds'] = args.birds
     # yamlObject['maxSteps']=int(args.timesteps)
+    configureEnvironment(yamlObject)
+
+    return yamlObject
+
+
+def configureEnvironment(yamlObject):
+    """Computes the derived constants (charger capacity, available charging energy) and loads the config to the `ENVIRONMENT`."""
     yamlObject['chargerCapacity'] = findChargerCapacity(yamlObject)
     yamlObject['totalAvailableChargingEnergy'] = min(
         yamlObject['chargerCapacity'] * len(yamlObject['chargers']) * yamlObject['chargingRate'],
@@ -138,7 +284,14 @@ def loadConfig(args):
 
     ENVIRONMENT.loadConfig(yamlObject)
 
-    return yamlObject
+
+def configureWorld(args):
+    """Sets the options of the simulated world from the arguments."""
+    WORLD.scenarioCacheFolder = args.scenario_cache
+    WORLD.vectorizedBirds = args.vectorized_birds
+    WORLD.fastForwardBirds = args.fast_forward_birds
+    WORLD.traceLevel = max(4 if args.trace else 0, args.verbose if args.verbose >= 3 else 0)
+    WORLD.traceEcho = args.verbose
 
 
 def findChargerCapacity(yamlObject):
@@ -183,8 +336,12 @@ def prepareFoldersForResults(args):
 
     if not os.path.exists(f"{folder}\\animations"):
         os.makedirs(f"{folder}\\animations")
-    if not os.path.exists(f"{folder}\\charger_logs"):
+    if args.chart and not os.path.exists(f"{folder}\\charger_logs"):
         os.makedirs(f"{folder}\\charger_logs")
+    if args.profile and not os.path.exists(f"{folder}/profile"):
+        os.makedirs(f"{folder}/profile")
+    if args.trace and not os.path.exists(f"{folder}/traces"):
+        os.makedirs(f"{folder}/traces")
     return folder, yamlFileName
 
 
@@ -256,6 +413,51 @@ def main():
     parser.add_argument('--threads', type=int, help='Number of CPU threads TF can use.', required=False, default=4)
     # parser.add_argument('-l', '--load', type=str, help='Load the model from a file.', required=False, default="")  # TODO: split for waiting time and battery
 
+    parser.add_argument('--profile', action='store_true', default=False,
+                        help='Measures the time spent in the phases of the simulation and saves it to the "profile" folder.')
+
+    parser.add_argument('--trace', action='store_true', default=False,
+                        help='Records the decisions of the ensembles in each step and saves them to the "traces" folder (decode with utils/tracing.py).')
+
+    parser.add_argument('--scenario_cache', type=str, required=False, default=None,
+                        help='Folder for caching the compiled world scenarios across processes.')
+
+    parser.add_argument('--vectorized_birds', action='store_true', default=False,
+                        help='Simulates all birds at once with NumPy (statistically equivalent, faster for many birds).')
+    parser.add_argument('--fast_forward_birds', action='store_true', default=False,
+                        help='Skips the steps in which the birds only fly straight to their targets (same results, faster for many birds).')
+    parser.add_argument('--lockstep', type=int, required=False, default=1,
+                        help='Number of simulations run in lockstep, sharing the estimator predictions in batches.')
+    parser.add_argument('--pipelined_training', type=str, choices=POLICIES, required=False, default=None,
+                        help='Trains the estimators in the background during the next iteration, which uses the previous model until the new one is ready ("previous") or waits for it ("wait").')
+    parser.add_argument('--compact_data', action='store', default=None, const=4, nargs="?", type=int,
+                        help='Merges the training samples with the same features (rounded to the given number of decimals, 4 by default) into weighted samples.')
+    parser.add_argument('--early_stopping', type=int, required=False, default=None,
+                        help='Stops the training when the validation loss does not improve for the given number of epochs.')
+    parser.add_argument('--training_budget', type=float, required=False, default=None,
+                        help='Maximal time (in seconds) of the training of all estimators in one iteration.')
+    parser.add_argument('--training_schedule', action='store_true', default=False,
+                        help='Halves the learning rate when the loss stops improving and grows the batch size with the size of the dataset.')
+    parser.add_argument('--numpy_inference', action='store_true', default=False,
+                        help='Evaluates the trained models with NumPy (float32) instead of Keras for the predictions.')
+    parser.add_argument('--prediction_cache', type=str, choices=SCOPES, required=False, default=None,
+                        help='Memoizes the predictions of the estimators within a step ("step") or across the steps ("lru").')
+    parser.add_argument('--prediction_cache_decimals', type=int, required=False, default=None,
+                        help='Rounds the inputs of the estimators to the given number of decimals before the cache lookup (exact match by default).')
+    parser.add_argument('--plot_processes', type=int, required=False, default=2,
+                        help='Number of processes rendering the charger plots (with -c).')
+    parser.add_argument('--work_queue', type=str, required=False, default=None,
+                        help='Shared directory of the work queue, the simulations are run by the workers (py -m utils.workqueue <DIR>).')
+    parser.add_argument('--local_workers', type=int, required=False, default=0,
+                        help='Number of workers started on this machine (with --work_queue).')
+    parser.add_argument('--job_timeout', type=float, required=False, default=600,
+                        help='Seconds after which a job of an unresponsive worker is returned to the queue (with --work_queue).')
+    parser.add_argument('--deferred_evaluation', action='store_true', default=False,
+                        help='Stores the predictions of the evaluations of the estimators (requires -c) for the reports created later by utils/evaluation.py.')
+    parser.add_argument('--async_artifacts', action='store', default=None, const=64, nargs="?", type=int,
+                        help='Writes the models, logs, traces and animations in a background thread with a queue of the given size (64 by default).')
+    parser.add_argument('--metrics', type=str, required=False, default=None,
+                        help='Publishes the live metrics over HTTP on the given port of localhost or on the given Unix socket (/metrics and /metrics.json).')
     parser.add_argument('-x', '--birds', type=int, help='number of birds, if no set, it loads from yaml file.', required=False, default=-1)
     args = parser.parse_args()
 
@@ -265,6 +467,16 @@ def main():
         raise argparse.ArgumentTypeError(f"Number of iterations must be positive: {args.iterations}")
     if args.simulations <= 0:
         raise argparse.ArgumentTypeError(f"Number of simulations must be positive: {args.simulations}")
+    if args.lockstep <= 0:
+        raise argparse.ArgumentTypeError(f"Number of simulations in lockstep must be positive: {args.lockstep}")
+    if args.lockstep > 1 and args.animation:
+        raise argparse.ArgumentTypeError("The animation cannot be saved for simulations in lockstep.")
+    if args.work_queue and (args.lockstep > 1 or args.animation or args.chart or args.trace or args.pipelined_training):
+        raise argparse.ArgumentTypeError("The work queue does not support lockstep, animations, charts, traces and pipelined training.")
+    if args.pipelined_training and args.chart:
+        raise argparse.ArgumentTypeError("The charts cannot be saved with the pipelined training (matplotlib is not thread-safe).")
+    if args.deferred_evaluation and not args.chart:
+        raise argparse.ArgumentTypeError("The deferred evaluation needs the evaluations of the estimators (-c).")
 
     run(args)
 
@@ -0,0 +1,76 @@
+import argparse
+import os
+import random
+import sys
+
+import pytest
+
+# the modules of the example are imported as in `run.py` (e.g. `utils.training`)
+EXAMPLE_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, EXAMPLE_FOLDER)
+
+EXPERIMENT = os.path.join(EXAMPLE_FOLDER, "experiments", "12drones.yaml")
+
+
+@pytest.fixture(scope="session")
+def experiment(tmp_path_factory):
+    """
+    The 12 drones experiment loaded to the default context and the estimators initialized (as by `run.py`).
+    The bounds of the features are given by this config, so it is loaded once for all tests.
+    """
+    from yaml import safe_load
+
+    import run
+    from world import WORLD
+
+    with open(EXPERIMENT) as file:
+        config = safe_load(file)
+    run.configureEnvironment(config)
+    arguments = argparse.Namespace(accumulate_data=False, chart=False, test_split=0.2, hidden_layers=[16], baseline=0)
+    run.createEstimators(arguments, str(tmp_path_factory.mktemp("estimators")))
+    WORLD.initEstimators()
+    return config
+
+
+def worldSummary(world):
+    """The state of the simulated world, compared by the tests of the optimizations with the original computation."""
+    world.birdLocations()  # synchronizes the fast-forwarded birds
+    return {
+        "drones": [(drone.state, round(drone.battery, 9), drone.location.x, drone.location.y) for drone in world.drones],
+        "birds": [(location.x, location.y) for location in world.birdLocations()],
+        "damage": [field.damage for field in world.fields],
+        "chargers": [tuple(len(getattr(charger, queue)) for queue in ("potentialDrones", "waitingDrones", "acceptedDrones", "chargingDrones"))
+                     for charger in world.chargers],
+    }
+
+
+@pytest.fixture
+def simulate(experiment):
+    """
+    Returns a function running one simulation in a new context forked from the default one and returning the summary
+    of the world after each step. `prepare(components, ensembles)` is called after the world is reset and the `options`
+    are set to the world before.
+    """
+    from ml_deeco.simulation import run_simulation
+    from world import DEFAULT_CONTEXT
+
+    def simulate(seed=42, steps=100, config=None, prepare=None, stepCallback=None, **options):
+        context = DEFAULT_CONTEXT.fork(config)
+        for option, value in options.items():
+            setattr(context.world, option, value)
+        summaries = []
+
+        def callback(components, materializedEnsembles, step):
+            if stepCallback:
+                stepCallback(components, materializedEnsembles, step)
+            summaries.append(worldSummary(context.world))
+
+        random.seed(seed)
+        with context.active():
+            components, ensembles = context.world.reset()
+            if prepare:
+                prepare(components, ensembles)
+            run_simulation(components, ensembles, steps, callback)
+        return summaries
+
+    return simulate
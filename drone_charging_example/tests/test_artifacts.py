@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+from utils.artifacts import ArtifactWriter
+
+
+def writeText(filename, text):
+    with open(filename, "w") as file:
+        file.write(text)
+
+
+def writeFolder(folder, files):
+    os.makedirs(folder, exist_ok=True)
+    for name, text in files.items():
+        writeText(os.path.join(folder, name), text)
+
+
+def skipWrite(filename):
+    pass  # e.g. an animation without frames
+
+
+def failWrite(filename):
+    writeText(filename, "partial")
+    raise OSError("disk full")
+
+
+def writeArtifacts(writer, folder):
+    for i in range(5):
+        writer.submit([str(folder / f"log_{i}.csv")], writeText, str(folder / f"log_{i}.csv"), f"record {i}\n")
+    writer.submit([str(folder / "model")], writeFolder, str(folder / "model"), {"weights.bin": "weights", "config.json": "{}"})
+    written = []
+
+    def writeListed(name):
+        written.append(name)
+        writeText(name, "listed by the write")
+
+    writer.submit(written, writeListed, str(folder / "listed.txt"))
+    writer.submit([str(folder / "skipped.gif")], skipWrite, str(folder / "skipped.gif"))
+    writer.checkpoint()
+
+
+def folderContents(folder):
+    contents = {}
+    for root, _, files in os.walk(folder):
+        for name in files:
+            with open(os.path.join(root, name)) as file:
+                contents[os.path.relpath(os.path.join(root, name), folder)] = file.read()
+    return contents
+
+
+@pytest.fixture
+def synced(monkeypatch):
+    """The (device, inode) of the files and directories synced to the disk."""
+    identities = []
+    originalFsync = os.fsync
+
+    def fsync(descriptor):
+        status = os.fstat(descriptor)
+        identities.append((status.st_dev, status.st_ino))
+        originalFsync(descriptor)
+
+    monkeypatch.setattr(os, "fsync", fsync)
+    return identities
+
+
+def identity(path):
+    status = os.stat(path)
+    return status.st_dev, status.st_ino
+
+
+@pytest.mark.parametrize("capacity", [None, 1, 64])
+def test_written_artifacts_are_synced(tmp_path, synced, capacity):
+    # the files written by the callers (as without the writer)
+    expected = tmp_path / "expected"
+    expected.mkdir()
+    writeArtifacts(ArtifactWriter(), expected)
+    synced.clear()
+
+    folder = tmp_path / "written"
+    folder.mkdir()
+    writer = ArtifactWriter(capacity)
+    writeArtifacts(writer, folder)
+    writer.close()
+
+    assert folderContents(folder) == folderContents(expected)
+    assert not (folder / "skipped.gif").exists()  # not created by the sync
+    paths = [folder / f"log_{i}.csv" for i in range(5)] + [folder / "listed.txt"]
+    if os.name != "nt":
+        paths.append(folder / "model")
+    assert sorted(synced) == sorted(identity(path) for path in paths)
+
+
+def test_failed_writes_are_not_synced(tmp_path, synced):
+    writer = ArtifactWriter(4)
+    writer.submit([str(tmp_path / "log.csv")], writeText, str(tmp_path / "log.csv"), "record\n")
+    writer.submit([str(tmp_path / "trace.npz")], failWrite, str(tmp_path / "trace.npz"))
+    with pytest.raises(OSError, match="disk full"):
+        writer.close()
+    writer.close()
+    assert synced == [identity(tmp_path / "log.csv")]
@@ -0,0 +1,45 @@
+import json
+
+from yaml import safe_load
+
+import benchmark
+from conftest import EXPERIMENT
+
+
+def baseConfig():
+    with open(EXPERIMENT) as file:
+        return safe_load(file)
+
+
+def test_full_suite_contains_each_case_once():
+    cases = benchmark.createCases("full", baseConfig(), 100)
+    keys = [benchmark.caseKey(case) for case in cases]
+
+    assert len(keys) == len(set(keys))
+    for suite in ["drones", "birds", "map", "animation", "estimators"]:
+        assert all(benchmark.caseKey(case) in keys for case in benchmark.createCases(suite, baseConfig(), 100))
+
+
+def test_scaled_config_keeps_layout():
+    config = baseConfig()
+    case = dict(benchmark.createCases("quick", config, 100)[0], drones=32, birds=500, mapScale=2)
+    scaled = benchmark.scaleConfig(config, case)
+
+    assert (scaled['drones'], scaled['birds'], scaled['maxSteps']) == (32, 500, 100)
+    assert (scaled['mapWidth'], scaled['mapHeight']) == (config['mapWidth'] * 2, config['mapHeight'] * 2)
+    assert scaled['chargers'] == [[coordinate * 2 for coordinate in charger] for charger in config['chargers']]
+    assert scaled['fields'] == [[coordinate * 2 for coordinate in field] for field in config['fields']]
+    assert config == baseConfig()  # the base config is not changed
+
+
+def test_comparison_detects_regressions(tmp_path):
+    case = benchmark.createCases("quick", baseConfig(), 100)[0]
+
+    def results(stepsPerSecond):
+        return {"revision": "test", "results": [{"case": case, "iterations": [{"estimator": "baseline", "stepsPerSecond": stepsPerSecond}]}]}
+
+    baselineFile = tmp_path / "baseline.json"
+    baselineFile.write_text(json.dumps(results(100.0)))
+
+    assert benchmark.compare(str(baselineFile), results(95.0), tolerance=0.1)
+    assert not benchmark.compare(str(baselineFile), results(85.0), tolerance=0.1)
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from ml_deeco.simulation import Point2D
+
+
+def test_flock_damage_matches_fields(simulate):
+    from components.field import Field
+    from world import WORLD
+
+    eaten = []
+
+    def check(components, materializedEnsembles, step):
+        flock = WORLD.birdFlock
+        birds = np.arange(flock.count)
+        # the original protection check of the birds (`World.isProtectedByDrone`)
+        assert flock.protectedByDrone(birds).tolist() == [WORLD.isProtectedByDrone(location) for location in flock.locations()]
+        for field, grid, undamaged in zip(WORLD.fields, flock.damage, flock.undamaged):
+            originX, originY = field.topLeft.x, field.topLeft.y
+            height = grid.shape[1]
+            assert field.damage == np.count_nonzero(grid == Field.DAMAGE_DEPTH)
+            assert field.crops == {(originX + i, originY + j): int(grid[i, j])
+                                   for i, j in zip(*np.nonzero(grid < Field.DAMAGE_DEPTH))}
+            assert field.undamaged == [(originX + crop // height, originY + crop % height) for crop in undamaged.tolist()]
+        eaten.append(sum(int(grid.sum()) for grid in flock.damage))
+
+    simulate(seed=19, steps=200, stepCallback=check, vectorizedBirds=True)
+
+    assert eaten[-1] > 0
+
+
+def test_flock_moves_like_birds(experiment):
+    from components.bird import Bird
+    from components.bird_flock import BirdFlock
+    from world import DEFAULT_CONTEXT
+
+    context = DEFAULT_CONTEXT.fork()
+    with context.active():
+        context.world.reset()
+        starts = [Point2D(3, 4), Point2D(50, 7), Point2D(20, 20)]
+        targets = [Point2D(40, 31), Point2D(50, 8), Point2D(20, 20)]
+        birds = [Bird(start) for start in starts]
+        flock = BirdFlock(len(starts), context.world.fields, context.world.emptyPoints)
+        flock.x[:] = [start.x for start in starts]
+        flock.y[:] = [start.y for start in starts]
+        flock.targetX[:] = [target.x for target in targets]
+        flock.targetY[:] = [target.y for target in targets]
+
+        for _ in range(100):
+            for bird, target in zip(birds, targets):
+                if bird.location != target:
+                    bird.move(target)
+            moving = np.flatnonzero(~flock.atTarget(np.arange(flock.count)))
+            flock.move(moving)
+            for bird, location in zip(birds, flock.locations()):
+                assert (location.x, location.y) == pytest.approx((bird.location.x, bird.location.y))
+
+        assert flock.atTarget(np.arange(flock.count)).all()
+
+
+def test_flock_damage_is_close_to_birds(simulate):
+    def meanDamage(**options):
+        return np.mean([sum(simulate(seed=seed, steps=300, **options)[-1]["damage"]) for seed in range(4)])
+
+    birds, flock = meanDamage(), meanDamage(vectorizedBirds=True)
+
+    assert birds > 0
+    assert abs(flock - birds) <= 0.25 * birds
@@ -0,0 +1,60 @@
+import csv
+
+import numpy as np
+
+from utils.charger_log import QUEUES, ChargerLogFile, decodeRuns, encodeRuns, load, queueLengths, toCsv
+
+
+def originalQueueLengths(charger):
+    """The queue lengths as logged by the original `logChargers` of `run.py`."""
+    accepted = set(charger.acceptedDrones)
+    waiting = set(charger.waitingDrones)
+    potential = set(charger.potentialDrones)
+    return [len(charger.chargingDrones), len(accepted), len(waiting - accepted), len(potential - waiting - accepted)]
+
+
+def test_runs_round_trip():
+    rng = np.random.default_rng(0)
+    counts = np.cumsum(rng.random((300, 8)) < 0.05, axis=0).astype(np.int16)  # slowly changing columns
+    counts[:, 3] = 7  # a constant column
+
+    starts, values, offsets = encodeRuns(counts)
+    assert len(values) < counts.size / 10
+    assert offsets[4] - offsets[3] == 1
+    assert np.array_equal(decodeRuns(starts, values, offsets, len(counts)), counts)
+
+    empty = np.zeros((0, 8), dtype=np.int16)
+    assert decodeRuns(*encodeRuns(empty), 0).shape == (0, 8)
+
+
+def test_logged_simulations_are_restored(simulate, tmp_path):
+    from world import WORLD
+
+    logFile = ChargerLogFile(str(tmp_path / "chargers.npz"))
+    original = {}
+
+    for simulation, seed in enumerate([37, 41], start=1):
+        rows = original[(1, simulation)] = []
+        logs = []
+
+        def logChargers(components, materializedEnsembles, step):
+            for charger, log in zip(WORLD.chargers, WORLD.chargerLogs):
+                log.register(queueLengths(charger))
+            rows.append([originalQueueLengths(charger) for charger in WORLD.chargers])
+            logs[:] = WORLD.chargerLogs
+
+        simulate(seed=seed, steps=150, stepCallback=logChargers)
+        logFile.append(1, simulation, logs)
+
+    restored = load(logFile.filename)
+    assert restored.keys() == original.keys()
+    for key, rows in original.items():
+        assert np.array_equal(restored[key], np.array(rows))
+    assert max(np.array(rows).max() for rows in original.values()) > 0
+
+    toCsv(logFile.filename, str(tmp_path / "chargers.csv"))
+    with open(tmp_path / "chargers.csv", newline="") as file:
+        table = list(csv.reader(file))
+    assert table[0] == ["iteration", "simulation", "step", "charger"] + QUEUES
+    assert [int(value) for value in table[1][4:]] == original[(1, 1)][0][0]
+    assert len(table) == 1 + sum(len(rows) * len(rows[0]) for rows in original.values())
@@ -0,0 +1,22 @@
+def timeToDoneCharging(charger, alreadyAccepted):
+    """The original computation of `Charger.timeToDoneCharging` (sorting the batteries on every call)."""
+    batteries = sorted(map(lambda d: d.battery, charger.chargingDrones), reverse=True)
+    nthMaxBattery = batteries[alreadyAccepted] if len(batteries) > alreadyAccepted else 1
+    return (1 - nthMaxBattery) / charger.chargingRate
+
+
+def test_charging_order_matches_sorted_batteries(simulate):
+    charged = []
+
+    def check(components, materializedEnsembles, step):
+        from world import WORLD
+
+        for charger in WORLD.chargers:
+            assert sorted(map(id, charger.chargingOrder)) == sorted(map(id, charger.chargingDrones))
+            for alreadyAccepted in range(charger.acceptedCapacity + 2):
+                assert charger.timeToDoneCharging(alreadyAccepted) == timeToDoneCharging(charger, alreadyAccepted)
+            charged.append(len(charger.chargingDrones))
+
+    simulate(seed=11, steps=300, stepCallback=check)
+
+    assert max(charged) > 0
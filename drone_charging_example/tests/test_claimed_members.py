@@ -0,0 +1,43 @@
+from ml_deeco.simulation import Ensemble, SIMULATION_GLOBALS
+
+from ensembles.claimed_members import ClaimedMembers
+
+
+def test_claims_match_materialized_ensembles(simulate):
+    from ensembles.field_protection import FieldProtection
+    from world import WORLD
+
+    protected = []
+
+    def check(components, materializedEnsembles, step):
+        # the original selection: the drones of the materialized field protection ensembles
+        members = [ensemble.drone for ensemble in materializedEnsembles if isinstance(ensemble, FieldProtection)]
+        assert len(members) == len(set(members))
+        for drone in WORLD.drones:
+            assert WORLD.claimedMembers.isClaimed(FieldProtection, drone) == (drone in members)
+        protected.append(len(members))
+
+    simulate(seed=7, steps=150, stepCallback=check)
+
+    assert sum(protected) > 0
+
+
+def test_claims_are_cleared_in_next_step():
+    class Base(Ensemble):
+        pass
+
+    class Derived(Base):
+        pass
+
+    claimed = ClaimedMembers()
+    originalStep = SIMULATION_GLOBALS.currentTimeStep
+    try:
+        SIMULATION_GLOBALS.currentTimeStep = 1
+        claimed.claim(Derived(), "drone")
+        assert claimed.isClaimed(Derived, "drone") and claimed.isClaimed(Base, "drone")
+        assert not claimed.isClaimed(Derived, "other")
+
+        SIMULATION_GLOBALS.currentTimeStep = 2
+        assert not claimed.isClaimed(Derived, "drone")
+    finally:
+        SIMULATION_GLOBALS.currentTimeStep = originalStep
@@ -0,0 +1,39 @@
+import copy
+
+import pytest
+
+
+def changedConfig(config, constant):
+    config = copy.deepcopy(config)
+    if constant == "chargerCount":
+        config["chargers"].append(list(config["chargers"][0]))
+    elif constant == "droneCount":
+        config["drones"] += 1
+    else:
+        config[constant] = config.get(constant, 1) + 10
+    return config
+
+
+@pytest.mark.parametrize("constant", ["mapWidth", "mapHeight", "chargerCapacity", "chargerCount", "droneCount"])
+def test_fork_rejects_changed_feature_bounds(experiment, constant):
+    from world import DEFAULT_CONTEXT, SimulationContext
+
+    assert constant in SimulationContext.FEATURE_CONSTANTS
+    environment = dict(vars(DEFAULT_CONTEXT.environment))
+    with pytest.raises(ValueError, match=constant):
+        DEFAULT_CONTEXT.fork(changedConfig(experiment, constant))
+    assert vars(DEFAULT_CONTEXT.environment) == environment
+
+
+def test_forked_config_is_simulated(experiment, simulate):
+    from world import DEFAULT_CONTEXT
+
+    # the same config as the default context gives the same simulation
+    assert simulate(seed=5, steps=150, config=copy.deepcopy(experiment)) == simulate(seed=5, steps=150)
+
+    config = copy.deepcopy(experiment)
+    config["birds"] = experiment["birds"] // 2
+    birdCount = DEFAULT_CONTEXT.environment.birdCount
+    context = DEFAULT_CONTEXT.fork(config)
+    assert context.environment.birdCount == config["birds"] and DEFAULT_CONTEXT.environment.birdCount == birdCount
+    assert len(simulate(seed=5, steps=1, config=config)[0]["birds"]) == config["birds"]
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from utils.dataset import compactDataset, quantize
+
+
+def dataset(rows=500, seed=0):
+    """Features with many duplicates (as the collected data of the estimators) and noisy targets."""
+    rng = np.random.default_rng(seed)
+    x = rng.integers(0, 4, (rows, 3)) / 4 + rng.normal(0, 1e-6, (rows, 3))
+    y = x @ np.array([[1.0], [-2.0], [0.5]]) + rng.normal(0, 0.1, (rows, 1))
+    return x, y
+
+
+def test_compacted_samples_match_grouped_rows():
+    x, y = dataset()
+    compacted = compactDataset(x, y, 4)
+
+    # the original rows grouped by the rounded features
+    groups = {}
+    for row, target in zip(np.round(x, 4) + 0.0, y):
+        groups.setdefault(tuple(row), []).append(target)
+    assert len(compacted.x) == len(groups) < len(x)
+    for row, mean, weight, variance in zip(compacted.x, compacted.y, compacted.weights, compacted.variance):
+        targets = np.array(groups[tuple(row)])
+        assert mean == pytest.approx(targets.mean(axis=0))
+        assert variance == pytest.approx(targets.var(axis=0), abs=1e-12)
+        assert weight == pytest.approx(len(targets) / (len(x) / len(groups)))
+    assert compacted.compressionRatio == len(x) / len(groups)
+
+
+def test_weighted_loss_differs_by_constant():
+    x, y = dataset()
+    compacted = compactDataset(x, y, 4)
+    rng = np.random.default_rng(1)
+
+    for _ in range(3):
+        w = rng.normal(size=(3, 1))
+
+        def predict(features):
+            return quantize(features, 4) @ w
+
+        original = np.mean((predict(x) - y) ** 2)
+        weighted = np.mean(compacted.weights[:, np.newaxis] * (predict(compacted.x) - compacted.y) ** 2)
+        constant = np.sum(compacted.weights[:, np.newaxis] * compacted.variance) / len(compacted.x)
+        assert weighted + constant == pytest.approx(original)
+
+
+def test_weights_of_split_rows():
+    x, y = dataset()
+    compacted = compactDataset(x, y, 4)
+    order = np.random.default_rng(2).permutation(len(compacted.x))[:20]
+
+    assert np.array_equal(compacted.weightsFor(compacted.x[order]), compacted.weights[order])
+    assert compacted.weightsFor(compacted.x[order] + 0.3) is None
+    assert compacted.weightsFor(compacted.x[order, :2]) is None
@@ -0,0 +1,50 @@
+import math
+
+QUEUES = ["potentialDrones", "waitingDrones", "acceptedDrones", "chargingDrones"]
+
+
+def closestDistance(field, drone):
+    """The original computation of `Field.closestDistanceToDrone`."""
+    return min(math.sqrt((place.x - drone.location.x) ** 2 + (place.y - drone.location.y) ** 2) for place in field.places)
+
+
+def test_cached_inputs_match_original_computation(simulate):
+    checks = []
+
+    def check(components, materializedEnsembles, step):
+        from world import WORLD
+
+        for charger in WORLD.chargers:
+            for drone in WORLD.drones:
+                assert [charger.isPotential(drone), charger.isWaiting(drone), charger.isAccepted(drone), charger.isCharging(drone)] == \
+                       [drone in getattr(charger, queue) for queue in QUEUES]
+        for drone in WORLD.drones:
+            closest = min(WORLD.chargers, key=lambda charger: drone.location.distance(charger.location))
+            assert drone.location.distance(drone.findClosestCharger().location) == drone.location.distance(closest.location)
+            for field in WORLD.fields:
+                assert field.closestDistanceToDrone(drone) == closestDistance(field, drone)
+        checks.append(step)
+
+    simulate(seed=5, steps=150, stepCallback=check)
+
+    assert len(checks) == 150
+
+
+def test_queue_membership_follows_changes(experiment):
+    from ml_deeco.simulation import Point2D
+    from components.charger import Charger
+    from components.drone import Drone
+    from world import DEFAULT_CONTEXT
+
+    with DEFAULT_CONTEXT.fork().active():
+        charger = Charger(Point2D(10, 10))
+        drones = [Drone(Point2D(0, 0)) for _ in range(3)]
+        charger.waitingDrones = drones[:2]
+        assert charger.isWaiting(drones[0]) and not charger.isWaiting(drones[2])
+
+        charger.waitingDrones.append(drones[2])
+        charger.queueChanged("waitingDrones")
+        assert charger.isWaiting(drones[2])
+
+        charger.waitingDrones = []
+        assert not any(charger.isWaiting(drone) for drone in drones)
@@ -0,0 +1,33 @@
+import numpy as np
+
+from utils.evaluation import DeferredEvaluation
+from utils.live_metrics import LiveMetrics
+from utils.memo import LRU, PredictionCache
+
+
+class SumEstimator:
+    name = "Battery"
+
+    def predictBatch(self, x):
+        return np.asarray(x, dtype=np.float32).sum(axis=1, keepdims=True)
+
+    def predict(self, x):
+        return self.predictBatch([x])[0]
+
+    def train(self, x, y):
+        pass
+
+
+def test_evaluation_uses_outputs_of_model(tmp_path):
+    estimator = SumEstimator()
+    evaluation = DeferredEvaluation([estimator], str(tmp_path / "evaluation.npz"))
+    # both rows are rounded to the same cache key, the cached prediction of the first one would be returned for the second one
+    PredictionCache([estimator], LRU, decimals=0)
+    metrics = LiveMetrics([estimator])
+
+    x = np.array([[0.1, 0.2], [0.3, 0.4]], dtype=np.float32)
+    estimator.evaluate(x, x.sum(axis=1, keepdims=True), "Test")
+
+    record = dict(zip(evaluation.metricsLog.header, evaluation.metricsLog.records[0]))
+    assert record["mse"] < 1e-12
+    assert metrics.estimators["battery"].calls == 0
@@ -0,0 +1,61 @@
+import pytest
+
+
+def test_fast_forwarded_birds_match_actuated_birds(simulate):
+    from world import WORLD
+
+    skipped = []
+    original = simulate(seed=43, steps=300)
+
+    fastForwarded = simulate(seed=43, steps=300, fastForwardBirds=True,
+                             stepCallback=lambda *args: skipped.append(WORLD.birdScheduler.skippedActuations))
+
+    assert len(fastForwarded) == len(original)
+    for step, (expected, actual) in enumerate(zip(original, fastForwarded)):
+        assert [coordinate for location in actual["birds"] for coordinate in location] == \
+               pytest.approx([coordinate for location in expected["birds"] for coordinate in location]), step
+        assert {key: value for key, value in actual.items() if key != "birds"} == \
+               {key: value for key, value in expected.items() if key != "birds"}, step
+    assert skipped[-1] > 0
+
+
+class Walker:
+    """Moves by one in each step, changes the direction every `period` steps (its only event)."""
+
+    def __init__(self, period):
+        self.period = period
+        self.position = 0
+        self.direction = 1
+        self.steps = 0
+
+    def actuate(self):
+        if self.steps % self.period == 0:
+            self.direction = -self.direction
+        self.position += self.direction
+        self.steps += 1
+
+    def stepsToNextEvent(self):
+        return self.period - 1 - (self.steps - 1) % self.period
+
+    def fastForward(self, steps):
+        self.position += self.direction * steps
+        self.steps += steps
+
+
+def test_scheduled_components_match_actuated_components():
+    from components.event_scheduler import EventScheduler
+
+    periods = [1, 2, 5, 7]
+    plain = [Walker(period) for period in periods]
+    scheduled = [Walker(period) for period in periods]
+    scheduler = EventScheduler(scheduled)
+
+    for step in range(50):
+        for walker in plain:
+            walker.actuate()
+        scheduler.actuate()
+        scheduler.synchronize()
+        assert [(walker.position, walker.steps) for walker in scheduled] == [(walker.position, walker.steps) for walker in plain], step
+
+    assert scheduler.actuations + scheduler.skippedActuations == 50 * len(periods)
+    assert scheduler.skippedActuations > 0
@@ -0,0 +1,42 @@
+import random
+
+
+def test_undamaged_crops_follow_crops(simulate):
+    damaged = []
+
+    def check(components, materializedEnsembles, step):
+        from world import WORLD
+
+        for field in WORLD.fields:
+            # the original `randomUndamagedCrop` chose from the list of the keys of `crops`
+            assert field.undamaged == [p for p in field.crops]
+            assert field.damage == len(field.damaged) == field.allCrops - len(field.crops)
+        damaged.append(sum(field.damage for field in WORLD.fields))
+
+    simulate(seed=17, steps=200, stepCallback=check)
+
+    assert damaged[-1] > 0
+
+
+def test_random_crop_matches_original_choice(experiment):
+    from ml_deeco.simulation import Point2D
+    from components.field import Field
+    from world import DEFAULT_CONTEXT
+
+    with DEFAULT_CONTEXT.fork().active():
+        field = Field([0, 0, 6, 4])
+        for _ in range(Field.DAMAGE_DEPTH):
+            field.locationDamaged(Point2D(2, 1))
+            field.locationDamaged(Point2D(5, 3))
+        field.locationDamaged(Point2D(0, 0))
+        assert field.damage == 2 and field.crops[(0, 0)] == 1
+
+        random.seed(1)
+        chosen = [field.randomUndamagedCrop() for _ in range(20)]
+        random.seed(1)
+        original = [random.choice([p for p in field.crops]) for _ in range(20)]
+        assert [(point.x, point.y) for point in chosen] == original
+
+        for crop in list(field.crops):
+            field.markDamaged(crop)
+        assert field.randomUndamagedCrop() is None
@@ -0,0 +1,97 @@
+import json
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from utils.live_metrics import LiveMetrics, MetricsServer
+from utils.training import TrainingController
+
+
+def test_requests_do_not_change_rate():
+    metrics = LiveMetrics([], rateWindow=0.05)
+    for _ in range(10):
+        metrics.stepDone()
+    time.sleep(0.05)
+    metrics.stepDone()
+    rate = metrics.stepsPerSecond
+
+    first, second = metrics.snapshot(), metrics.snapshot()
+
+    assert rate > 0
+    assert first["steps_total"] == second["steps_total"] == 11
+    assert first["steps_per_second"] == second["steps_per_second"] == rate
+
+
+def test_pipelined_training_is_tracked():
+    release = threading.Event()
+
+    class SlowEstimator:
+        name = "Battery"
+
+        def train(self, x, y):
+            release.wait(5)
+            time.sleep(0.05)
+
+        def saveModel(self, *args, **kwargs):
+            pass
+
+        def predict(self, x):
+            return x
+
+        def predictBatch(self, x):
+            return x
+
+    estimator = SlowEstimator()
+    controller = TrainingController([estimator], "previous")
+    metrics = LiveMetrics([estimator], trainingController=controller)
+
+    estimator.train(np.zeros((4, 3)), np.zeros((4, 1)))
+    running = metrics.snapshot()["estimators"]["battery"]
+    release.set()
+    controller.finish()
+    finished = metrics.snapshot()["estimators"]["battery"]
+
+    assert (running["training"], running["trainings_total"]) == (1, 0)
+    assert (finished["training"], finished["trainings_total"]) == (0, 1)
+    assert finished["last_training_seconds"] >= 0.05
+
+    release.clear()
+    estimator.train(np.zeros((4, 3)), np.zeros((4, 1)))
+    assert metrics.snapshot()["estimators"]["battery"]["trainings_total"] == 1
+    release.set()
+    controller.finish()
+    assert metrics.snapshot()["estimators"]["battery"]["trainings_total"] == 2
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets are not supported")
+def test_only_stale_sockets_are_replaced(tmp_path):
+    metrics = LiveMetrics([])
+    metrics.stepDone()
+
+    regular = tmp_path / "metrics.txt"
+    regular.write_text("not a socket")
+    with pytest.raises(FileExistsError):
+        MetricsServer(metrics, str(regular))
+    assert regular.read_text() == "not a socket"
+
+    address = str(tmp_path / "metrics.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(address)  # left by a crashed run
+    stale.close()
+
+    server = MetricsServer(metrics, address)
+    server.start()
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(address)
+    client.sendall(b"GET /metrics.json HTTP/1.0\r\n\r\n")
+    response = b""
+    while chunk := client.recv(65536):
+        response += chunk
+    client.close()
+    server.stop()
+
+    assert json.loads(response.split(b"\r\n\r\n", 1)[1])["steps_total"] == metrics.snapshot()["steps_total"] == 1
+    assert not (tmp_path / "metrics.sock").exists()
@@ -0,0 +1,77 @@
+import random
+
+import numpy as np
+from ml_deeco.simulation import SIMULATION_GLOBALS
+
+from conftest import worldSummary
+from utils.lockstep import LockstepSimulations
+
+
+class DoublingEstimator:
+    """An estimator predicting twice its inputs, counting the single and the batched predictions."""
+
+    def __init__(self):
+        self.predictions = 0
+        self.batches = 0
+
+    def predict(self, x):
+        self.predictions += 1
+        return np.asarray(x) * 2
+
+    def predictBatch(self, x):
+        self.batches += 1
+        return np.asarray(x) * 2
+
+
+def predictingCallback(estimator, steps):
+    """A step callback asking the estimator for a random number of predictions (consuming the random stream of the simulation)."""
+
+    def callback(components, materializedEnsembles, step):
+        assert SIMULATION_GLOBALS.currentTimeStep == step
+        for _ in range(random.randrange(3)):
+            value = random.random()
+            assert estimator.predict([value]) == [value * 2]
+        steps.append(step)
+
+    return callback
+
+
+def test_lockstep_matches_sequential_runs(simulate):
+    from world import DEFAULT_CONTEXT, currentContext
+
+    count, steps = 3, 40
+    estimator = DoublingEstimator()
+    lockstep = LockstepSimulations([estimator])
+
+    random.seed(23)
+    seeds = [random.getrandbits(64) for _ in range(count)]
+    sequential = [simulate(seed=seed, steps=steps, stepCallback=predictingCallback(estimator, [])) for seed in seeds]
+    assert estimator.predictions > 0 and estimator.batches == 0
+
+    worlds = []
+    summaries = {}
+    lockstepSteps = []
+
+    def prepareReplica(index):
+        world = currentContext().world
+        worlds.append(world)
+        summaries[id(world)] = []
+        return world.reset()
+
+    stepCallback = predictingCallback(estimator, lockstepSteps)
+
+    def callback(components, materializedEnsembles, step):
+        stepCallback(components, materializedEnsembles, step)
+        world = currentContext().world
+        summaries[id(world)].append(worldSummary(world))
+
+    timeStep = SIMULATION_GLOBALS.currentTimeStep
+    random.seed(23)
+    with DEFAULT_CONTEXT.fork().active():
+        lockstep.run(count, steps, prepareReplica, callback)
+
+    assert [summaries[id(world)] for world in worlds] == sequential
+    # the replicas proceed to the next step together
+    assert lockstepSteps == sorted(lockstepSteps) and len(lockstepSteps) == count * steps
+    assert lockstep.batches > 0 and lockstep.batchedPredictions > lockstep.batches
+    assert SIMULATION_GLOBALS.currentTimeStep == timeStep
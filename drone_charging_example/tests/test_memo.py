@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from ml_deeco.simulation import SIMULATION_GLOBALS
+
+from utils.memo import LRU, SCOPES, STEP, PredictionCache
+
+
+class Model:
+    def __init__(self, scale):
+        self.scale = scale
+
+
+class LinearEstimator:
+    """An estimator whose training changes its model in place, counting the evaluated rows."""
+
+    name = "Battery"
+
+    def __init__(self):
+        self._model = Model(1.0)
+        self.rows = 0
+
+    def predict(self, x):
+        self.rows += 1
+        return np.array([np.sum(x) * self._model.scale, np.max(x)])
+
+    def predictBatch(self, x):
+        self.rows += len(x)
+        x = np.asarray(x)
+        return np.stack([x.sum(axis=1) * self._model.scale, x.max(axis=1)], axis=1)
+
+    def train(self, x, y):
+        self._model.scale += 1
+
+
+def uncachedPrediction(estimator, x):
+    """The original prediction (without the cache) of the current model."""
+    return np.array([np.sum(x) * estimator._model.scale, np.max(x)])
+
+
+@pytest.fixture
+def timeStep():
+    original = SIMULATION_GLOBALS.currentTimeStep
+    yield
+    SIMULATION_GLOBALS.currentTimeStep = original
+
+
+@pytest.mark.parametrize("scope, capacity", [(STEP, 2 ** 16), (LRU, 2 ** 16), (LRU, 5)])
+def test_cached_predictions_match_uncached(timeStep, scope, capacity):
+    rng = np.random.default_rng(0)
+    inputs = rng.integers(0, 3, (12, 4)).astype(float)  # few distinct rows, repeated
+    estimator = LinearEstimator()
+    cache = PredictionCache([estimator], scope, capacity=capacity)
+
+    for step in range(30):
+        SIMULATION_GLOBALS.currentTimeStep = step
+        if step % 10 == 9:
+            estimator.train(None, None)
+        if step == 20:
+            estimator._model = Model(-1.0)  # a new model (e.g. swapped in by the background training)
+        for _ in range(5):
+            x = inputs[rng.integers(len(inputs))]
+            assert np.array_equal(estimator.predict(x), uncachedPrediction(estimator, x))
+        batch = inputs[rng.integers(len(inputs), size=8)]
+        expected = np.array([uncachedPrediction(estimator, row) for row in batch])
+        assert np.array_equal(estimator.predictBatch(batch), expected)
+
+    (name, hits, misses, _), = cache.stats()
+    assert hits + misses == 30 * (5 + 8)
+    assert misses == estimator.rows < 30 * (5 + 8)
+    assert len(cache.caches[name].predictions) <= capacity
+
+
+def test_rounded_inputs_share_predictions(timeStep):
+    estimator = LinearEstimator()
+    PredictionCache([estimator], STEP, decimals=2)
+    SIMULATION_GLOBALS.currentTimeStep = 0
+    x = np.array([0.1, 0.2, 0.3])
+
+    first = estimator.predict(x)
+    assert np.array_equal(estimator.predict(x + 1e-4), first)
+    assert np.abs(estimator.predict(x + 1e-4) - uncachedPrediction(estimator, x + 1e-4)).max() < 1e-2
+    assert not np.array_equal(estimator.predict(x + 0.1), first)
+    assert estimator.rows == 2
+
+
+def test_unknown_scope():
+    assert LRU in SCOPES
+    with pytest.raises(ValueError):
+        PredictionCache([], "forever")
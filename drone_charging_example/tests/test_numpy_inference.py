@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from utils.numpy_inference import NumpyModel
+
+
+def test_outputs_match_keras_model():
+    model = tf.keras.Sequential([
+        tf.keras.Input((5,)),
+        tf.keras.layers.Dense(16, activation="relu"),
+        tf.keras.layers.Dropout(0.2),
+        tf.keras.layers.Dense(8),
+        tf.keras.layers.Activation("tanh"),
+        tf.keras.layers.Dense(3, activation="softmax"),
+    ])
+    x = np.random.default_rng(0).normal(size=(64, 5)).astype(np.float32)
+    numpyModel = NumpyModel(model)
+
+    expected = model(x, training=False).numpy()
+    assert numpyModel(x).numpy() == pytest.approx(expected, abs=1e-6)
+    assert numpyModel.predict(x[:1]) == pytest.approx(expected[:1], abs=1e-6)
+    assert numpyModel.weightBytes == sum(weights.nbytes for weights in model.get_weights())
+    assert numpyModel.layers is not model.layers and numpyModel.input_shape == model.input_shape  # delegated to the Keras model
+
+
+def test_unsupported_layers_are_rejected():
+    model = tf.keras.Sequential([tf.keras.Input((4, 4, 1)), tf.keras.layers.Conv2D(2, 3), tf.keras.layers.Flatten(), tf.keras.layers.Dense(1)])
+    with pytest.raises(ValueError):
+        NumpyModel(model)
@@ -0,0 +1,30 @@
+from utils.profiler import COMPONENT_ACTUATE, STEP, Profiler
+
+
+def test_profiled_simulation_gives_same_results(simulate):
+    profiler = Profiler()
+    original = simulate(seed=3, steps=50)
+
+    profiled = simulate(seed=3, steps=50, prepare=profiler.instrumentSimulation, stepCallback=lambda *args: profiler.stepDone())
+
+    assert profiled == original
+    assert profiler.records[(STEP, "total")][1] == 50
+    assert profiler.records[(COMPONENT_ACTUATE, "Drone")][1] == 50 * len(original[-1]["drones"])
+
+
+def test_wrapped_method_is_measured():
+    profiler = Profiler()
+
+    class Component:
+        def actuate(self, value):
+            return value * 2
+
+    component = Component()
+    profiler.wrap(component, "actuate", COMPONENT_ACTUATE, "Component")
+    profiler.wrap(component, "missing", COMPONENT_ACTUATE, "Component")
+
+    assert component.actuate(2) == 4
+    assert component.actuate(3) == 6
+    assert profiler.records[(COMPONENT_ACTUATE, "Component")][1] == 2
+    assert not hasattr(component, "missing")
+    assert [row[:2] for row in profiler.rows()] == [(COMPONENT_ACTUATE, "Component")]
@@ -0,0 +1,34 @@
+QUEUES = ["potentialDrones", "waitingDrones", "acceptedDrones", "chargingDrones"]
+
+
+def checkFeatures(world):
+    """Compares the cached queue features of the chargers with the original computations of the estimate inputs."""
+    for charger in world.chargers:
+        for queue in QUEUES:
+            drones = getattr(charger, queue)
+            assert charger.missingBattery(queue) == sum([1 - drone.battery for drone in drones])
+            for drone in world.drones:
+                assert charger.countWithLowerBattery(queue, drone.battery) == len([d for d in drones if d.battery < drone.battery])
+
+
+def test_queue_features_match_original_computation(simulate):
+    from world import WORLD
+
+    checks = []
+
+    def prepare(components, ensembles):
+        # also checked between the ensembles (the queues are replaced by the ensembles actuated before)
+        for ensemble in ensembles:
+            def actuate(original=ensemble.actuate):
+                checkFeatures(WORLD)
+                checks.append("ensemble")
+                original()
+            ensemble.actuate = actuate
+
+    def check(components, materializedEnsembles, step):
+        checkFeatures(WORLD)
+        checks.append("step")
+
+    simulate(seed=31, steps=200, prepare=prepare, stepCallback=check)
+
+    assert checks.count("step") == 200 and checks.count("ensemble") > 200
@@ -0,0 +1,99 @@
+import csv
+import json
+import os
+import statistics
+
+import numpy as np
+import pytest
+
+from utils.results import METRIC_COLUMNS, RUN_LOG_HEADER, ResultsStore, averageRecords
+
+
+def writeRunLog(filename, seed, iterations=2, runs=3, offset=0.0):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    rng = np.random.default_rng(seed)
+    with open(filename, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(RUN_LOG_HEADER)
+        for iteration in range(1, iterations + 1):
+            for run in range(1, runs + 1):
+                writer.writerow([int(rng.integers(12)), int(rng.integers(500)), rng.random(), rng.random() + offset, 3, iteration, run])
+    world = os.path.splitext(os.path.basename(filename))[0]
+    with open(os.path.join(os.path.dirname(filename), f"{world}_args.json"), "w") as file:
+        json.dump({"seed": seed}, file)
+
+
+def originalSummary(root):
+    """The statistics computed from the CSV files one by one (as without the store)."""
+    groups = {}
+    for folder, _, files in os.walk(root):
+        for name in files:
+            if not name.endswith(".csv") or name.endswith("_average.csv"):
+                continue
+            with open(os.path.join(folder, name), newline="") as file:
+                rows = list(csv.reader(file))
+            if rows[0] != RUN_LOG_HEADER:
+                continue
+            experiment = os.path.relpath(folder, root).replace(os.sep, "/")
+            for row in rows[1:]:
+                groups.setdefault((experiment, name[:-4], int(float(row[5]))), []).append([float(value) for value in row[:5]])
+    return {key: [(statistics.fmean(column), statistics.pstdev(column)) for column in zip(*rows)] for key, rows in groups.items()}
+
+
+def storeSummary(store):
+    summary = store.summary()
+    keys = zip(summary["experiment"].tolist(), summary["world"].tolist(), summary["iteration"].tolist())
+    return {key: [(summary[f"{column}_mean"][i], summary[f"{column}_std"][i]) for column in METRIC_COLUMNS]
+            for i, key in enumerate(keys)}
+
+
+def assertSameSummary(store, root):
+    expected = originalSummary(root)
+    actual = storeSummary(store)
+    assert actual.keys() == expected.keys()
+    for key in expected:
+        assert np.array(actual[key]) == pytest.approx(np.array(expected[key]), abs=1e-9)
+
+
+def test_store_matches_the_run_logs(tmp_path):
+    root = tmp_path / "results"
+    writeRunLog(str(root / "a" / "12drones.csv"), 1)
+    writeRunLog(str(root / "a" / "8drones.csv"), 2, iterations=3)
+    writeRunLog(str(root / "b" / "sweep" / "12drones.csv"), 3, runs=5)
+    (root / "a" / "12drones_average.csv").write_text("ignored\n")
+    (root / "a" / "training.csv").write_text("estimator,training\nBattery,1\n")
+
+    store = ResultsStore(str(tmp_path / "index.npz"))
+    assert store.update(root) == 4
+    assertSameSummary(store, root)
+    assert sorted(set(store.columns["seed"].tolist())) == [1, 2, 3]
+
+    # only the changed and new files are read (the rows of the deleted ones are dropped)
+    writeRunLog(str(root / "a" / "12drones.csv"), 4, offset=1.0)
+    writeRunLog(str(root / "c" / "12drones.csv"), 5)
+    os.remove(root / "a" / "8drones.csv")
+    assert store.update(root) == 2
+    assertSameSummary(store, root)
+    assert store.update(root) == 0
+
+    store.save()
+    loaded = ResultsStore(str(tmp_path / "index.npz"))
+    assert loaded.update(root) == 0
+    assertSameSummary(loaded, root)
+
+
+def test_run_records_and_averages(tmp_path):
+    root = tmp_path / "results"
+    writeRunLog(str(root / "a" / "12drones.csv"), 1, iterations=3, runs=4)
+    store = ResultsStore()
+    store.update(root)
+
+    records = store.runRecords(store.select(experiment="a", world="12drones"))
+    original = np.loadtxt(root / "a" / "12drones.csv", delimiter=",", skiprows=1)
+    assert np.array_equal(records, original)
+
+    averages = averageRecords(records)
+    for i, iteration in enumerate([1, 2, 3]):
+        rows = original[original[:, 5] == iteration]
+        assert averages[i, :5] == pytest.approx(rows[:, :5].mean(axis=0))
+        assert averages[i, 5] == iteration
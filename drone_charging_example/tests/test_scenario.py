@@ -0,0 +1,73 @@
+import random
+
+from conftest import worldSummary
+
+
+def originalField(points, droneRadius):
+    """The places and crops as computed by the original `Field` constructor."""
+    topLeftX, topLeftY, bottomRightX, bottomRightY = points[:4]
+    places = []
+    for i in range(topLeftX + droneRadius, bottomRightX, round(droneRadius)):
+        for j in range(topLeftY + droneRadius, bottomRightY, round(droneRadius)):
+            places.append((i, j))
+    crops = {}
+    for i in range(topLeftX, bottomRightX):
+        for j in range(topLeftY, bottomRightY):
+            crops[(i, j)] = 0
+    return places, crops
+
+
+def test_compiled_scenario_matches_original_world(experiment, tmp_path):
+    from ml_deeco.simulation import Point2D
+    from world import DEFAULT_CONTEXT, Scenario
+
+    context = DEFAULT_CONTEXT.fork()
+    context.world.scenarioCacheFolder = str(tmp_path)
+    with context.active():
+        world = context.world
+        world.reset()
+        environment = context.environment
+
+        for field, points in zip(world.fields, environment.fieldPositions):
+            places, crops = originalField(points, environment.droneRadius)
+            assert [(place.x, place.y) for place in field.places] == places
+            assert field.crops == crops
+            assert sorted(field.undamaged) == sorted(crops)
+            assert field.allCrops == len(crops)
+        assert world.totalPlaces == sum([len(f.places) for f in world.fields])
+        assert world.sortedFields == sorted(world.fields, key=lambda field: -len(field.places))
+
+        for _ in range(200):
+            location = Point2D(random.randrange(environment.mapWidth), random.randrange(environment.mapHeight))
+            closest = min(world.chargers, key=lambda charger: location.distance(charger.location))
+            charger = world.chargers[world.scenario.closestChargerIndex(location, world.chargers)]
+            assert location.distance(charger.location) == location.distance(closest.location)
+
+        # the scenario saved to the cache folder is the same as the compiled one
+        del Scenario._compiled[environment.configHash]
+        loaded = Scenario.get(environment, str(tmp_path))
+        assert loaded is not world.scenario
+        assert [layout.places for layout in loaded.fieldLayouts] == [layout.places for layout in world.scenario.fieldLayouts]
+        assert [layout.crops for layout in loaded.fieldLayouts] == [layout.crops for layout in world.scenario.fieldLayouts]
+        assert loaded.sortedFieldIndices == world.scenario.sortedFieldIndices
+
+
+def test_reset_from_shared_scenario_is_repeatable(simulate):
+    assert simulate(seed=13, steps=30) == simulate(seed=13, steps=30)
+
+
+def test_reset_worlds_do_not_share_state(experiment):
+    from world import DEFAULT_CONTEXT
+
+    first, second = DEFAULT_CONTEXT.fork(), DEFAULT_CONTEXT.fork()
+    with first.active():
+        first.world.reset()
+    with second.active():
+        second.world.reset()
+
+    assert first.world.scenario is second.world.scenario
+    crop = next(iter(first.world.fields[0].crops))
+    with first.active():
+        first.world.fields[0].markDamaged(crop)
+    assert crop in second.world.fields[0].crops
+    assert worldSummary(second.world)["damage"] == [0] * len(second.world.fields)
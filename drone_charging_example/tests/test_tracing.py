@@ -0,0 +1,56 @@
+import io
+
+from utils.tracing import ASSIGNMENT, FIELD_PROTECTION, PRE_ASSIGNMENT, SAVING_ANIMATION, Tracer, decodeEvents, load, toText
+
+
+def test_events_round_trip(tmp_path):
+    tracer = Tracer(4, capacity=3)
+    tracer.record(PRE_ASSIGNMENT, None, "CHARGER_1", 2)
+    tracer.record(FIELD_PROTECTION, "DRONE_1", "FIELD_1")
+    tracer.record(ASSIGNMENT, None, "CHARGER_1", 1)
+    tracer.record(FIELD_PROTECTION, "DRONE_2", "FIELD_1")
+    filename = str(tmp_path / "trace.npz")
+    tracer.save(filename)
+
+    events, names, dropped = load(filename)
+    decoded = [event[1:] for event in decodeEvents(events, names)]
+    assert dropped == 1
+    assert decoded == [("field_protection", "DRONE_1", "FIELD_1", 0), ("assignment", "", "CHARGER_1", 1),
+                       ("field_protection", "DRONE_2", "FIELD_1", 0)]
+    output = io.StringIO()
+    toText(filename, output)
+    assert "Protecting Ensemble: assigning DRONE_2 to FIELD_1" in output.getvalue()
+
+
+def test_event_levels():
+    assert not Tracer(0).records(PRE_ASSIGNMENT)
+    assert Tracer(3).records(SAVING_ANIMATION) and not Tracer(3).records(PRE_ASSIGNMENT)
+    assert Tracer(4).records(PRE_ASSIGNMENT)
+
+
+def test_ensembles_trace_the_original_messages(simulate, capsys):
+    from world import WORLD
+
+    traced = []
+
+    def check(components, materializedEnsembles, step):
+        # the events of the step, in the order the ensembles were actuated (as the original messages were printed)
+        events = WORLD.tracer.events()
+        stepEvents = [event for event in decodeEvents(events[events["step"] == events["step"][-1]], WORLD.tracer.names)]
+        expected = []
+        for ensemble in materializedEnsembles:
+            if hasattr(ensemble, "charger"):
+                expected.append((type(ensemble).__name__, ensemble.charger.id, len(ensemble.drones)))
+            else:
+                expected.append(("FieldProtection", ensemble.drone.id, ensemble.field.id))
+        actual = [(event, subject or target, value if not subject else target) for _, event, subject, target, value in stepEvents]
+        names = {"pre_assignment": "DroneChargingPreAssignment", "assignment": "DroneChargingAssignment",
+                 "accepted_assignment": "AcceptedDronesAssignment", "field_protection": "FieldProtection"}
+        assert [(names[event], first, second) for event, first, second in actual] == expected
+        traced.append(len(stepEvents))
+
+    simulate(seed=29, steps=50, stepCallback=check, traceLevel=4, traceEcho=4)
+
+    assert min(traced) > 0
+    assert "Protecting Ensemble: assigning" in capsys.readouterr().out
+    assert simulate(seed=29, steps=50) == simulate(seed=29, steps=50, traceLevel=4)
@@ -0,0 +1,145 @@
+import time
+
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from utils.numpy_inference import NumpyModel
+from utils.training import POLICIES, TrainingController
+
+
+class FittingEstimator:
+    """Estimator whose training fits its Keras model in place (as the `NeuralNetworkEstimator`)."""
+
+    def __init__(self, name="Battery"):
+        self.name = name
+        self._model = tf.keras.Sequential([tf.keras.Input((3,)), tf.keras.layers.Dense(1)])
+        self._model.compile(optimizer=tf.keras.optimizers.SGD(0.1), loss="mse")
+
+    def train(self, x, y):
+        self._model.fit(x, y, epochs=5, verbose=0)
+
+    def saveModel(self, *args, **kwargs):
+        pass
+
+    def predictBatch(self, x):
+        return self._model(np.asarray(x, dtype=np.float32)).numpy()
+
+
+@pytest.mark.parametrize("policy", POLICIES)
+def test_background_training_swaps_in_trained_model(policy):
+    rng = np.random.default_rng(0)
+    x = rng.random((256, 3), dtype=np.float32)
+    y = x @ np.array([[1.0], [-2.0], [3.0]], dtype=np.float32)
+    estimator = FittingEstimator()
+    originalModel = estimator._model
+    originalWeights = [w.copy() for w in originalModel.get_weights()]
+    controller = TrainingController([estimator], policy)
+
+    estimator.train(x, y)
+    controller.finish()
+
+    assert estimator._model is not originalModel
+    assert any(not np.allclose(before, after) for before, after in zip(originalWeights, estimator._model.get_weights()))
+    # the weights of the model used during the training stay unchanged
+    assert all(np.array_equal(before, after) for before, after in zip(originalWeights, originalModel.get_weights()))
+    assert np.mean((estimator.predictBatch(x) - y) ** 2) < np.mean((originalModel(x).numpy() - y) ** 2)
+
+
+def test_background_training_bypasses_instance_wrappers():
+    x = np.zeros((32, 3), dtype=np.float32)
+    y = np.zeros((32, 1), dtype=np.float32)
+    wrapped, evaluated = [], []
+
+    class EvaluatingEstimator(FittingEstimator):
+        def train(self, x, y):
+            self._model.fit(x, y, epochs=1, verbose=0)
+            self.predictBatch(x)
+            self.evaluate(x, y, "Train")
+
+        def evaluate(self, x, y, label):
+            pass
+
+    def evaluation(estimator):
+        def evaluate(x, y, label):
+            evaluated.append((estimator, estimator._model))
+        evaluate.rebind = evaluation
+        return evaluate
+
+    estimator = EvaluatingEstimator()
+    controller = TrainingController([estimator], "wait")
+    estimator.predictBatch = lambda batch: wrapped.append(batch)  # e.g. the cache of the predictions of the estimator
+    estimator.evaluate = evaluation(estimator)
+
+    estimator.train(x, y)
+    trainer = controller.trainings[estimator].trainer
+    controller.finish()
+
+    assert wrapped == []
+    assert evaluated == [(trainer, trainer._model)]
+    assert estimator._model is trainer._model
+    # the wrappers of the estimator are kept
+    assert estimator.evaluate.__closure__ is not None and "predictBatch" in vars(estimator)
+
+
+def test_time_budget_is_shared_by_the_iteration():
+    x = np.random.default_rng(0).random((64, 3), dtype=np.float32)
+    y = x.sum(axis=1, keepdims=True)
+
+    class LongEstimator(FittingEstimator):
+        def train(self, x, y):
+            self._model.fit(x, y, epochs=100000, batch_size=8, verbose=0)
+
+    estimators = [LongEstimator("Battery"), LongEstimator("Waiting Time")]
+    controller = TrainingController(estimators, timeBudget=0.5)
+
+    for iteration in range(2):
+        start = time.perf_counter()
+        for estimator in estimators:
+            estimator.train(x, y)
+        assert time.perf_counter() - start < 1.5
+
+    records = [dict(zip(controller.trainingLog.header, record)) for record in controller.trainingLog.records]
+    assert [record["stopped"] for record in records] == ["time_budget"] * 4
+    # the second estimator of the iteration starts after the deadline, the next iteration has a new deadline
+    assert [record["epochs"] == 1 for record in records] == [False, True, False, True]
+
+
+def test_early_stopping_monitors_held_out_data():
+    rng = np.random.default_rng(0)
+    x = rng.random((200, 3), dtype=np.float32)
+    y = x.sum(axis=1, keepdims=True)
+    histories = []
+
+    class RecordingEstimator(FittingEstimator):
+        def train(self, x, y):
+            histories.append(self._model.fit(x, y, epochs=3, verbose=0))
+
+    estimator = RecordingEstimator()
+    TrainingController([estimator], earlyStoppingPatience=2, validationSplit=0.25)
+    estimator.train(x, y)
+
+    assert "val_loss" in histories[0].history
+
+
+def test_early_stopping_without_validation_data_fails():
+    estimator = FittingEstimator()
+    TrainingController([estimator], earlyStoppingPatience=2)
+    with pytest.raises(ValueError):
+        estimator.train(np.zeros((10, 3), dtype=np.float32), np.zeros((10, 1), dtype=np.float32))
+
+
+@pytest.mark.parametrize("earlyStopping, evaluationData", [(None, "training"), (2, "validation")])
+def test_numpy_inference_report_labels_evaluation_data(earlyStopping, evaluationData):
+    rng = np.random.default_rng(0)
+    x = rng.random((200, 3), dtype=np.float32)
+    y = x.sum(axis=1, keepdims=True)
+    estimator = FittingEstimator()
+    controller = TrainingController([estimator], earlyStoppingPatience=earlyStopping, numpyInference=True, validationSplit=0.25)
+    estimator.train(x, y)
+
+    record = dict(zip(controller.inferenceLog.header, controller.inferenceLog.records[0]))
+    assert record["evaluation_data"] == evaluationData
+    assert record["samples"] == (50 if evaluationData == "validation" else 200)
+    assert record["max_error_to_keras"] < 1e-5
+    assert isinstance(estimator._model, NumpyModel)
@@ -0,0 +1,42 @@
+import csv
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from utils.workqueue import MODELS, SHARDS, jobName, jobSeed
+
+PROJECT = Path(__file__).resolve().parent.parent
+
+
+def test_local_workers_match_sequential_simulations(simulate, tmp_path):
+    from components.drone_state import DroneState
+    from world import ENVIRONMENT
+
+    iterations, simulations, seed = 2, 2, 42
+    (tmp_path / "results\\output").mkdir()  # run.py joins the results folder with backslashes
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join([str(PROJECT)] + sys.path))
+    subprocess.run([sys.executable, str(PROJECT / "run.py"), str(PROJECT / "experiments" / "12drones.yaml"),
+                    "-i", str(iterations), "-s", str(simulations), "--seed", str(seed),
+                    "--work_queue", str(tmp_path / "queue"), "--local_workers", "2"],
+                   cwd=tmp_path, env=environment, check=True, timeout=600)
+
+    queue = tmp_path / "queue"
+    for iteration in range(iterations):
+        for simulation in range(simulations):
+            assert (queue / SHARDS / f"{jobName(iteration, simulation)}.npz").exists()
+    # the models trained by the coordinator are loaded by the workers for the next iteration
+    assert sorted(path.name for path in (queue / MODELS).iterdir()) == \
+           sorted(f"{slug}_{version}.h5" for slug in ("battery", "waiting_time") for version in range(1, iterations + 1))
+
+    with open(tmp_path / "results\\output\\12drones.csv", newline="") as file:
+        rows = [[float(value) for value in row] for row in list(csv.reader(file))[1:]]
+    assert [(row[5], row[6]) for row in rows] == [(iteration + 1, simulation + 1)
+                                                  for iteration in range(iterations) for simulation in range(simulations)]
+
+    # each job is the simulation of its seed (as run without the queue)
+    for row in rows:
+        iteration, simulation = int(row[5]) - 1, int(row[6]) - 1
+        last = simulate(seed=jobSeed(seed, iteration, simulation), steps=ENVIRONMENT.maxSteps)[-1]
+        activeDrones = len([drone for drone in last["drones"] if drone[0] != DroneState.TERMINATED])
+        assert row[:2] == [activeDrones, sum(last["damage"])]
@@ -0,0 +1,201 @@
+"""
+Asynchronous writing of the artifacts of an experiment.
+
+The models, logs, traces and animations are saved at the end of the simulations and iterations, and the simulations wait
+for the disk meanwhile. The `ArtifactWriter` runs the writes in a background thread: the callers hand it snapshots
+(copies of the log records, clones of the models, the finished traces and animations) and continue immediately.
+The queue of the writes is bounded, so a slow disk eventually slows down the simulations instead of filling the memory.
+`checkpoint` (at the end of each iteration) waits for the artifacts submitted before the previous checkpoint, so at most
+one iteration of artifacts is pending; `close` waits for all writes and syncs the written files to the disk at once.
+Without a capacity, the artifacts are written by the callers (as before).
+"""
+import copy
+import os
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+from utils.numpy_inference import NumpyModel
+from utils.training import cloneModel
+
+
+def _saveModel(snapshot, args, kwargs, written: List[str]):
+    """Saves the model of the estimator snapshot (by the `saveModel` of its class), the saved files are added to `written`."""
+    model = getattr(snapshot, "_model", None)
+    if model is not None:
+        originalSave = model.save
+
+        def save(filename, *saveArgs, **saveKwargs):
+            written.append(str(filename))
+            return originalSave(filename, *saveArgs, **saveKwargs)
+
+        model.save = save
+    type(snapshot).saveModel(snapshot, *args, **kwargs)
+
+
+def _sync(filename: str):
+    """Syncs a written file (or directory) to the disk, the paths that are not there are skipped."""
+    if os.path.isfile(filename):
+        flags = os.O_WRONLY  # a writable handle is needed on Windows (and the file is not created)
+    elif os.path.isdir(filename) and os.name != "nt":
+        flags = os.O_RDONLY  # the directories cannot be opened on Windows
+    else:
+        return
+    try:
+        descriptor = os.open(filename, flags)
+    except FileNotFoundError:
+        return  # removed meanwhile
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+class ArtifactWriter:
+    """
+    Writes the artifacts in a background thread.
+
+    Attributes
+    ----------
+    capacity : int, optional
+        Maximal number of the pending writes (the callers wait when the queue is full), None means synchronous writing.
+    writes : int
+        Number of the writes done.
+    waitingSeconds : float
+        Time the callers waited for the writer (full queue, checkpoints and flushes).
+    """
+
+    def __init__(self, capacity: Optional[int] = None):
+        self.capacity = capacity
+        self.writes = 0
+        self.waitingSeconds = 0.0
+        self.error: Optional[BaseException] = None
+        self._files: List[List[str]] = []  # the files of each finished write, synced by `close`
+        self._submitted = 0
+        self._checkpoint = 0
+        self._condition = threading.Condition()
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        if capacity is not None:
+            self._queue = queue.Queue(maxsize=max(1, capacity))
+            self._thread = threading.Thread(target=self._run, name="artifact-writer", daemon=True)
+            self._thread.start()
+
+    @property
+    def asynchronous(self):
+        return self._queue is not None
+
+    def submit(self, files: List[str], write: Callable, *args, **kwargs):
+        """
+        Writes the artifact by `write(*args, **kwargs)`.
+
+        Parameters
+        ----------
+        files : list of str
+            The files (or directories) written by the call, synced by `close` if the call succeeds. The list can be
+            filled by the call itself.
+        write : function
+            The write, it must not share mutable data with the caller (the arguments are not copied).
+        """
+        self._raiseError()
+        if not self.asynchronous:
+            write(*args, **kwargs)
+            self._files.append(files)
+            self.writes += 1
+            return
+        with self._condition:
+            self._submitted += 1
+        start = time.perf_counter()
+        self._queue.put((files, write, args, kwargs))
+        self.waitingSeconds += time.perf_counter() - start
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            files, write, args, kwargs = task
+            try:
+                write(*args, **kwargs)
+                self._files.append(files)
+            except BaseException as e:
+                if self.error is None:
+                    self.error = e
+            with self._condition:
+                self.writes += 1
+                self._condition.notify_all()
+
+    def _raiseError(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _waitFor(self, count: int):
+        if self.asynchronous:
+            start = time.perf_counter()
+            with self._condition:
+                self._condition.wait_for(lambda: self.writes >= count)
+            self.waitingSeconds += time.perf_counter() - start
+        self._raiseError()
+
+    # region artifacts
+
+    def exportLog(self, log, filename: str):
+        """Exports the log (by its `export`) from a copy of its records."""
+        snapshot = copy.copy(log)
+        snapshot.records = [list(record) for record in log.records]
+        self.submit([filename], snapshot.export, filename)
+
+    def saveAnimation(self, visualizer, filename: str):
+        """Saves the animation of the visualizer, which must not be used afterwards."""
+        self.submit([filename], visualizer.createAnimation, filename)
+
+    def saveTrace(self, tracer, filename: str):
+        """Saves the trace of a finished simulation."""
+        self.submit([filename], tracer.save, filename)
+
+    def instrumentEstimators(self, estimators):
+        """Replaces `saveModel` of the estimators, the model is cloned and the clone is saved by the writer."""
+        if not self.asynchronous:
+            return
+        for estimator in estimators:
+            self._instrument(estimator)
+
+    def _instrument(self, estimator):
+        def saveModel(*args, **kwargs):
+            snapshot = copy.copy(estimator)
+            model = getattr(estimator, "_model", None)
+            if isinstance(model, NumpyModel):
+                model = model.keras  # the Keras model is saved (as without the writer)
+            if model is not None:
+                snapshot._model = cloneModel(model)
+            written = []
+            self.submit(written, _saveModel, snapshot, args, kwargs, written)
+
+        estimator.saveModel = saveModel
+
+    # endregion
+
+    def checkpoint(self):
+        """Waits for the artifacts submitted before the previous checkpoint, the later ones are still written in the background."""
+        self._waitFor(self._checkpoint)
+        self._checkpoint = self._submitted
+
+    def flush(self):
+        """Waits for all submitted artifacts."""
+        self._waitFor(self._submitted)
+
+    def close(self):
+        """Waits for all artifacts, stops the thread and syncs the written files to the disk."""
+        try:
+            self.flush()
+        finally:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+                self._queue = None
+        for filename in dict.fromkeys(filename for files in self._files for filename in files):
+            _sync(filename)
+        self._files.clear()
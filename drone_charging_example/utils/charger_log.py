@@ -0,0 +1,149 @@
+"""
+Compressed columnar storage of the charger queue logs.
+
+The queue lengths of the chargers (charging, accepted, waiting and potential drones) are logged in every step of every
+simulation. Instead of one CSV file per simulation, the logs of all simulations of an experiment are appended to one
+NumPy archive (a zip file, readable by `np.load`). The counts change slowly, so each column (one queue of one charger)
+is run-length encoded: only the steps where the value changes are stored, with the new values.
+
+The archive contains `columns` (the names of the queues) and for each simulation the arrays `<ITERATION>_<SIMULATION>_shape`
+(steps, chargers), `_starts` (the steps where the runs start), `_values` (the values of the runs) and `_offsets`
+(the first run of each column, the columns ordered by the charger and then by the queue). The logs are decoded by `load`:
+
+    from utils.charger_log import load
+    counts = load("results/output/12drones_chargers.npz")[(1, 1)]  # array (steps, chargers, queues)
+"""
+import argparse
+import csv
+import os
+import zipfile
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+QUEUES = ["Charging Drones", "Accepted Drones", "Waiting Drones", "Potential Drones"]
+
+
+def queueLengths(charger) -> List[int]:
+    """The lengths of the queues of the charger (see `QUEUES`), a drone is counted only in its most advanced queue."""
+    accepted = set(charger.acceptedDrones)
+    waiting = set(charger.waitingDrones)
+    potential = set(charger.potentialDrones)
+    return [
+        len(charger.chargingDrones),
+        len(accepted),
+        len(waiting - accepted),
+        len(potential - waiting - accepted),
+    ]
+
+
+def encodeRuns(counts: np.ndarray):
+    """Run-length encodes the columns of the 2D array (steps, columns), returns (starts, values, offsets)."""
+    steps, columns = counts.shape
+    if steps == 0:
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=counts.dtype), np.zeros(columns + 1, dtype=np.int64)
+    changed = np.ones((steps, columns), dtype=bool)
+    changed[1:] = counts[1:] != counts[:-1]
+    column, step = np.nonzero(changed.T)  # ordered by the column, then by the step
+    offsets = np.zeros(columns + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(column, minlength=columns))
+    return step.astype(np.int32), counts[step, column], offsets
+
+
+def decodeRuns(starts: np.ndarray, values: np.ndarray, offsets: np.ndarray, steps: int) -> np.ndarray:
+    """Inverse of `encodeRuns`."""
+    columns = len(offsets) - 1
+    counts = np.zeros((steps, columns), dtype=values.dtype)
+    for column in range(columns):
+        columnStarts = starts[offsets[column]:offsets[column + 1]]
+        lengths = np.diff(np.append(columnStarts, steps))
+        counts[:, column] = np.repeat(values[offsets[column]:offsets[column + 1]], lengths)
+    return counts
+
+
+def appendArrays(filename, arrays: Dict[str, np.ndarray]):
+    """Appends the arrays to the NumPy archive (created if it does not exist) without rewriting its previous members."""
+    with zipfile.ZipFile(filename, mode="a", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, array in arrays.items():
+            with archive.open(f"{name}.npy", mode="w") as member:
+                np.lib.format.write_array(member, np.asanyarray(array), allow_pickle=False)
+
+
+class ChargerLogFile:
+    """
+    The charger logs of one experiment, appended simulation by simulation.
+
+    The file is created (replacing an older one) by the constructor, every `append` adds the members of one simulation
+    to the zip archive without rewriting the previous ones.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        if os.path.exists(filename):
+            os.remove(filename)
+        self._write({"columns": np.array(QUEUES, dtype=str)})
+
+    def append(self, iteration: int, simulation: int, logs):
+        """Appends the logs (one `Log` of the queue lengths per charger) of the simulation."""
+        steps = min((len(log.records) for log in logs), default=0)
+        counts = np.zeros((steps, len(logs) * len(QUEUES)), dtype=np.int16)
+        for charger, log in enumerate(logs):
+            counts[:, charger * len(QUEUES):(charger + 1) * len(QUEUES)] = np.asarray(log.records[:steps], dtype=np.int16).reshape(steps, len(QUEUES))
+        starts, values, offsets = encodeRuns(counts)
+        prefix = f"{iteration}_{simulation}"
+        self._write({
+            f"{prefix}_shape": np.array([steps, len(logs)], dtype=np.int64),
+            f"{prefix}_starts": starts,
+            f"{prefix}_values": values,
+            f"{prefix}_offsets": offsets,
+        })
+
+    def _write(self, arrays: Dict[str, np.ndarray]):
+        appendArrays(self.filename, arrays)
+
+
+# region loading
+
+def load(filename) -> Dict[Tuple[int, int], np.ndarray]:
+    """Loads the logs of all simulations, returns {(iteration, simulation): array (steps, chargers, queues)}."""
+    logs = {}
+    with np.load(filename) as archive:
+        queues = len(archive["columns"])
+        for name in archive.files:
+            if not name.endswith("_shape"):
+                continue
+            prefix = name[:-len("_shape")]
+            steps, chargers = archive[name].tolist()
+            counts = decodeRuns(archive[f"{prefix}_starts"], archive[f"{prefix}_values"], archive[f"{prefix}_offsets"], steps)
+            iteration, simulation = map(int, prefix.split("_"))
+            logs[(iteration, simulation)] = counts.reshape(steps, chargers, queues)
+    return logs
+
+
+def records(logs: Dict[Tuple[int, int], np.ndarray]) -> Iterator[List[int]]:
+    """Yields the rows (iteration, simulation, step, charger, queue lengths) of the logs."""
+    for (iteration, simulation), counts in sorted(logs.items()):
+        for step in range(counts.shape[0]):
+            for charger in range(counts.shape[1]):
+                yield [iteration, simulation, step + 1, charger + 1] + counts[step, charger].tolist()
+
+
+def toCsv(filename, csvFilename):
+    with open(csvFilename, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["iteration", "simulation", "step", "charger"] + QUEUES)
+        writer.writerows(records(load(filename)))
+
+# endregion
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Decodes the charger logs of an experiment to CSV.')
+    parser.add_argument('input', type=str, help='The charger logs (.npz) file.')
+    parser.add_argument('output', type=str, help='The CSV file.')
+    args = parser.parse_args()
+    toCsv(args.input, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Compaction of the training data of the estimators.
+
+The collected datasets contain many (nearly) identical feature vectors (e.g. idle drones with a full battery in consecutive
+time steps). The rows with the same features (quantized to `decimals`) are merged into one sample with the mean of their targets
+and a weight proportional to their count. For the mean squared error (and the cross-entropy), the weighted loss over
+the merged samples differs from the loss over the original rows only by a constant, so the model learns the same function.
+"""
+from typing import Dict
+
+import numpy as np
+
+
+class CompactedDataset:
+    """
+    The merged samples of a dataset.
+
+    Attributes
+    ----------
+    x : np.ndarray
+        The unique (quantized) feature vectors.
+    y : np.ndarray
+        The mean target of each feature vector.
+    weights : np.ndarray
+        The number of original rows of each feature vector, normalized to the mean of 1.
+    variance : np.ndarray
+        The variance of the targets of each feature vector.
+    originalSize : int
+        Number of rows before the compaction.
+    """
+
+    def __init__(self, x, y, weights, variance, originalSize, decimals):
+        self.x = x
+        self.y = y
+        self.weights = weights
+        self.variance = variance
+        self.originalSize = originalSize
+        self.decimals = decimals
+        self._weightsByKey: Dict[bytes, float] = {}
+
+    @property
+    def compressionRatio(self) -> float:
+        return self.originalSize / max(1, len(self.x))
+
+    def weightsFor(self, x):
+        """
+        The weights of the rows of `x` (a subset of the compacted rows in any order, e.g. after a train/test split), None if some row is not known.
+        """
+        x = np.asarray(x)
+        if x.dtype == object or x.ndim != 2 or x.shape[1] != self.x.shape[1]:
+            return None
+        if not self._weightsByKey:
+            self._weightsByKey = {row.tobytes(): weight for row, weight in zip(quantize(self.x, self.decimals), self.weights.tolist())}
+        weights = [self._weightsByKey.get(row.tobytes()) for row in quantize(x, self.decimals)]
+        if any(weight is None for weight in weights):
+            return None
+        return np.array(weights)
+
+
+def quantize(x, decimals) -> np.ndarray:
+    # adding 0.0 turns -0.0 to 0.0 (they differ as bytes)
+    return np.round(np.asarray(x, dtype=np.float64), decimals) + 0.0
+
+
+def compactDataset(x, y, decimals=4) -> CompactedDataset:
+    """Merges the rows with the same features (rounded to `decimals`)."""
+    x = quantize(x, decimals)
+    y = np.asarray(y, dtype=np.float64)
+    targets = y.reshape(len(y), -1)
+
+    keys, inverse, counts = np.unique(x, axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    sums = np.zeros((len(keys), targets.shape[1]))
+    squares = np.zeros((len(keys), targets.shape[1]))
+    np.add.at(sums, inverse, targets)
+    np.add.at(squares, inverse, targets ** 2)
+    means = sums / counts[:, np.newaxis]
+    variance = np.maximum(squares / counts[:, np.newaxis] - means ** 2, 0)
+
+    weights = counts / counts.mean()
+    return CompactedDataset(keys, means.reshape((len(keys),) + y.shape[1:]), weights, variance, len(x), decimals)
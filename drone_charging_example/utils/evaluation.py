@@ -0,0 +1,169 @@
+"""
+Deferred evaluation of the estimators.
+
+With the charts on (`-c`), the estimators evaluate their model on the training and the testing data before and after
+each training (the passes `Before-Train`, `Before-Test`, `Train` and `Test`), and each evaluation is saved as a CSV file
+and a plot while the simulations wait for the training. The `DeferredEvaluation` replaces the `evaluate` method of the
+estimators: the predictions and the targets of each pass are appended to one compressed archive
+(`<WORLD>_evaluation.npz`) and only the error metrics are computed (logged to `evaluation.csv` and printed with `-v 2`).
+The CSV files and the plots are created later by the report command, on a process pool:
+
+    py -m utils.evaluation results/output/12drones_evaluation.npz --processes 8
+"""
+import argparse
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from ml_deeco.utils import verbosePrint, Log
+
+from utils.charger_log import appendArrays
+from utils.workqueue import estimatorSlug
+
+METRICS_HEADER = ["estimator", "training", "pass", "samples", "mse", "mae", "r2"]
+
+
+def errorMetrics(targets: np.ndarray, predictions: np.ndarray) -> Dict[str, float]:
+    """Mean squared error, mean absolute error and the coefficient of determination of the predictions."""
+    if len(targets) == 0:
+        return {"mse": np.nan, "mae": np.nan, "r2": np.nan}
+    errors = predictions.astype(np.float64) - targets
+    variance = np.sum((targets - targets.mean(axis=0)) ** 2)
+    return {
+        "mse": float(np.mean(errors ** 2)),
+        "mae": float(np.mean(np.abs(errors))),
+        "r2": float(1 - np.sum(errors ** 2) / variance) if variance > 0 else np.nan,
+    }
+
+
+class DeferredEvaluation:
+    """
+    Stores the evaluations of the estimators instead of creating their CSV files and plots.
+
+    Attributes
+    ----------
+    filename : str
+        The archive of the predictions and targets (created by the constructor, replacing an older one).
+    metricsLog : Log
+        The error metrics of each evaluation pass.
+    writer : ArtifactWriter, optional
+        Writes the archive (in the background if asynchronous).
+    """
+
+    def __init__(self, estimators, filename: str, writer=None):
+        self.filename = filename
+        self.writer = writer
+        self.metricsLog = Log(METRICS_HEADER)
+        self._trainings = {}  # estimator -> number of the trainings started
+        if os.path.exists(filename):
+            os.remove(filename)
+        appendArrays(filename, {})
+        for estimator in estimators:
+            self._instrument(estimator)
+
+    def _instrument(self, estimator):
+        originalTrain = estimator.train
+        self._trainings[estimator.name] = 0
+
+        def train(*args, **kwargs):
+            self._trainings[estimator.name] += 1
+            return originalTrain(*args, **kwargs)
+
+        estimator.train = train
+        estimator.evaluate = self._evaluation(estimator)
+
+    def _evaluation(self, estimator):
+        """The `evaluate` of the estimator (or of its copy trained in the background, see `BackgroundTraining`)."""
+
+        def evaluate(x, y, label, *args, **kwargs):
+            # the arguments following the label only configure the outputs of the original evaluation
+            # the `predictBatch` of the class: the outputs of the model, not cached, counted or timed by the instrumentations
+            predictions = np.asarray(type(estimator).predictBatch(estimator, x), dtype=np.float32).reshape(len(x), -1)
+            targets = np.asarray(y, dtype=np.float32).reshape(len(predictions), -1)
+            # the passes `Before-*` evaluate the model before the next training
+            training = self._trainings[estimator.name] + (1 if label.startswith("Before") else 0)
+            metrics = errorMetrics(targets, predictions)
+            self.metricsLog.register([estimator.name, training, label, len(targets), metrics["mse"], metrics["mae"], metrics["r2"]])
+            verbosePrint(f"{estimator.name} {label} {training}: MSE {metrics['mse']:.4g}, MAE {metrics['mae']:.4g}, R2 {metrics['r2']:.4g}.", 2)
+
+            prefix = f"{estimatorSlug(estimator)}.{training}.{label}"
+            arrays = {f"{prefix}.targets": targets, f"{prefix}.predictions": predictions}
+            if self.writer is not None:
+                self.writer.submit([self.filename], appendArrays, self.filename, arrays)
+            else:
+                appendArrays(self.filename, arrays)
+
+        evaluate.rebind = self._evaluation
+        return evaluate
+
+
+# region reports
+
+def load(filename) -> Dict[Tuple[str, int, str], Tuple[np.ndarray, np.ndarray]]:
+    """Loads the evaluations, returns {(estimator, training, pass): (targets, predictions)}."""
+    evaluations = {}
+    with np.load(filename) as archive:
+        for name in archive.files:
+            if not name.endswith(".targets"):
+                continue
+            estimator, training, label, _ = name.split(".")
+            prefix = name[:-len(".targets")]
+            evaluations[(estimator, int(training), label)] = (archive[name], archive[f"{prefix}.predictions"])
+    return evaluations
+
+
+def writeReport(estimator, training, label, targets, predictions, folder):
+    """Creates the CSV file of the predictions and the plot of one evaluation pass (`<FOLDER>/<ESTIMATOR>/<PASS>-<TRAINING>`)."""
+    from utils import plots
+
+    folder = Path(folder) / estimator
+    folder.mkdir(parents=True, exist_ok=True)
+    filename = str(folder / f"{label}-{training}")
+    outputs = targets.shape[1]
+    with open(filename + ".csv", "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow([f"target_{i + 1}" for i in range(outputs)] + [f"prediction_{i + 1}" for i in range(outputs)])
+        writer.writerows(np.hstack([targets, predictions]).tolist())
+    if len(targets) > 0:
+        metrics = errorMetrics(targets, predictions)
+        plots.createEvaluationPlot(targets, predictions, filename,
+                                   f"{estimator}: {label} (training {training})\nMSE {metrics['mse']:.4g}, MAE {metrics['mae']:.4g}")
+
+
+def createReports(filename, folder: Optional[str] = None, processes: Optional[int] = None) -> int:
+    """Creates the reports of all evaluations in the archive (in `<ARCHIVE>/` next to it by default) and their metrics (`metrics.csv`)."""
+    folder = Path(folder) if folder else Path(filename).with_suffix("")
+    folder.mkdir(parents=True, exist_ok=True)
+    evaluations = load(filename)
+    with open(folder / "metrics.csv", "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(METRICS_HEADER)
+        for (estimator, training, label), (targets, predictions) in sorted(evaluations.items()):
+            metrics = errorMetrics(targets, predictions)
+            writer.writerow([estimator, training, label, len(targets), metrics["mse"], metrics["mae"], metrics["r2"]])
+
+    with ProcessPoolExecutor(processes) as pool:
+        futures = [pool.submit(writeReport, estimator, training, label, targets, predictions, folder)
+                   for (estimator, training, label), (targets, predictions) in evaluations.items()]
+        for future in futures:
+            future.result()
+    return len(futures)
+
+# endregion
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Creates the CSV files and the plots of the deferred evaluations of the estimators.')
+    parser.add_argument('input', type=str, help='The evaluations (<WORLD>_evaluation.npz) file.')
+    parser.add_argument('-o', '--output', type=str, default=None, help='The output folder (next to the input file by default).')
+    parser.add_argument('-p', '--processes', type=int, default=None, help='Number of processes creating the reports (the number of CPUs by default).')
+    args = parser.parse_args()
+    print(f"{createReports(args.input, args.output, args.processes)} evaluations reported.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Live metrics of a running experiment.
+
+The `LiveMetrics` keeps a few counters updated in the simulation loop (the number of steps and their rate over a fixed
+window, the current iteration and simulation, sampled latencies of the estimator inference and the state of the training).
+The counters are plain attributes written only by the simulation thread, so no locks are needed; the requests only read
+them, and the percentiles, the drones, the damage and the charger queues of the current world are computed when the metrics
+are requested. The monotonic `steps_total` counter lets Prometheus compute the rate over any window (`rate(drones_steps_total[1m])`).
+
+The `MetricsServer` publishes the metrics over HTTP on localhost (`--metrics 9100`) or on a Unix socket
+(`--metrics /tmp/drones.sock`), in the Prometheus text format at `/metrics` and as JSON at `/metrics.json`:
+
+    curl http://localhost:9100/metrics
+    curl --unix-socket /tmp/drones.sock http://localhost/metrics.json
+"""
+import json
+import os
+import socketserver
+import stat
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from components.drone_state import DroneState
+from utils.charger_log import QUEUES, queueLengths
+from utils.workqueue import estimatorSlug
+
+QUANTILES = [0.5, 0.9, 0.99]
+
+
+class _EstimatorMetrics:
+    """The counters of one estimator."""
+
+    def __init__(self, samples: int):
+        self.calls = 0
+        self.latencies: List[float] = [0.0] * samples  # ring buffer of the sampled latencies (seconds per row)
+        self.sampled = 0
+        self.trainings = 0
+        self.training = False
+        self.trainingSeconds = 0.0
+        self.background = None  # the last `BackgroundTraining` of the estimator (pipelined training)
+
+
+class LiveMetrics:
+    """
+    Counters of the running experiment.
+
+    Attributes
+    ----------
+    steps : int
+        Number of the simulation steps done.
+    stepsPerSecond : float
+        Steps per second over the last finished window of `rateWindow` seconds.
+    iteration, simulation : int
+        The current iteration and simulation (1-based).
+    world : World, optional
+        The world of the current simulation (read when the metrics are requested).
+    sampleEvery : int
+        Every `sampleEvery`-th prediction of an estimator is timed.
+    trainingController : TrainingController, optional
+        With the pipelined training, the state of the training is taken from the background trainings of the controller.
+    """
+
+    def __init__(self, estimators, sampleEvery: int = 16, samples: int = 1024, rateWindow: float = 10.0, trainingController=None):
+        self.startTime = time.perf_counter()
+        self.steps = 0
+        self.stepsPerSecond = 0.0
+        self.rateWindow = rateWindow
+        self.iteration = 0
+        self.simulation = 0
+        self.world = None
+        self.sampleEvery = sampleEvery
+        self.trainingController = trainingController
+        self.estimators: Dict[str, _EstimatorMetrics] = {}
+        self._window = (self.startTime, 0)  # (time, steps) at the start of the current rate window
+        for estimator in estimators:
+            self._instrument(estimator, samples)
+
+    def _instrument(self, estimator, samples: int):
+        metrics = self.estimators[estimatorSlug(estimator)] = _EstimatorMetrics(samples)
+        originalPredict, originalPredictBatch, originalTrain = estimator.predict, estimator.predictBatch, estimator.train
+        sampleEvery = self.sampleEvery
+
+        def timed(original, x, rows):
+            start = time.perf_counter()
+            result = original(x)
+            metrics.latencies[metrics.sampled % samples] = (time.perf_counter() - start) / max(1, rows)
+            metrics.sampled += 1
+            return result
+
+        def predict(x):
+            metrics.calls += 1
+            if metrics.calls % sampleEvery:
+                return originalPredict(x)
+            return timed(originalPredict, x, 1)
+
+        def predictBatch(x):
+            metrics.calls += len(x)
+            if metrics.calls % sampleEvery >= len(x):
+                return originalPredictBatch(x)
+            return timed(originalPredictBatch, x, len(x))
+
+        def train(*args, **kwargs):
+            metrics.training = True
+            start = time.perf_counter()
+            try:
+                return originalTrain(*args, **kwargs)
+            finally:
+                background = self.trainingController.trainings.get(estimator) if self.trainingController is not None else None
+                if metrics.background is not None and metrics.background is not background:
+                    # the previous background training was swapped in (the controller waits for it before starting the next one)
+                    metrics.trainingSeconds = metrics.background.seconds
+                    metrics.trainings += 1
+                metrics.background = background
+                if background is None:
+                    metrics.trainingSeconds = time.perf_counter() - start
+                    metrics.trainings += 1
+                metrics.training = False
+
+        estimator.predict = predict
+        estimator.predictBatch = predictBatch
+        estimator.train = train
+
+    def stepDone(self):
+        self.steps += 1
+        now = time.perf_counter()
+        start, steps = self._window
+        if now - start >= self.rateWindow:
+            self.stepsPerSecond = (self.steps - steps) / (now - start)
+            self._window = (now, self.steps)
+
+    def simulationStarted(self, iteration: int, simulation: int, world):
+        self.iteration = iteration + 1
+        self.simulation = simulation + 1
+        self.world = world
+
+    # region snapshot
+
+    def snapshot(self) -> dict:
+        """The current values of the metrics (called from the server thread)."""
+        now = time.perf_counter()
+        steps = self.steps
+        start, windowSteps = self._window
+        stepsPerSecond = self.stepsPerSecond
+        if not stepsPerSecond or now - start >= 2 * self.rateWindow:
+            # the first window or no step finished the window (e.g. during the training): the rate of the unfinished window
+            stepsPerSecond = (steps - windowSteps) / (now - start)
+        values = {
+            "uptime_seconds": now - self.startTime,
+            "steps_total": steps,
+            "steps_per_second": stepsPerSecond,
+            "steps_per_second_average": steps / (now - self.startTime) if now > self.startTime else 0.0,
+            "iteration": self.iteration,
+            "simulation": self.simulation,
+        }
+        values.update(self._worldValues())
+        values["estimators"] = {name: self._estimatorValues(metrics) for name, metrics in self.estimators.items()}
+        return values
+
+    def _worldValues(self) -> dict:
+        world = self.world
+        if world is None or not hasattr(world, "drones"):
+            return {}
+        # the lists are only read here, the simulation can change them meanwhile (the values are approximate)
+        drones = list(world.drones)
+        fields = list(world.fields)
+        allCrops = sum(field.allCrops for field in fields)
+        return {
+            "alive_drones": sum(1 for drone in drones if drone.state != DroneState.TERMINATED),
+            "damage_rate": sum(field.damage for field in fields) / allCrops if allCrops else 0.0,
+            "charger_queues": [dict(zip(QUEUES, queueLengths(charger))) for charger in list(world.chargers)],
+        }
+
+    @staticmethod
+    def _estimatorValues(metrics: _EstimatorMetrics) -> dict:
+        latencies = np.array(metrics.latencies[:min(metrics.sampled, len(metrics.latencies))])
+        trainings, training, trainingSeconds = metrics.trainings, metrics.training, metrics.trainingSeconds
+        background = metrics.background
+        if background is not None:
+            if background.done():
+                trainings, trainingSeconds = trainings + 1, background.seconds
+            else:
+                training = True
+        return {
+            "predictions_total": metrics.calls,
+            "latency_seconds": {str(q): float(np.quantile(latencies, q)) if len(latencies) else 0.0 for q in QUANTILES},
+            "trainings_total": trainings,
+            "training": int(training),
+            "last_training_seconds": trainingSeconds,
+        }
+
+    # endregion
+
+
+def prometheusText(values: dict, prefix: str = "drones_") -> str:
+    """Formats the snapshot in the Prometheus text format."""
+    lines = []
+    for name, value in values.items():
+        if isinstance(value, (int, float)):
+            lines.append(f"{prefix}{name} {value}")
+    for charger, queues in enumerate(values.get("charger_queues", [])):
+        for queue, length in queues.items():
+            lines.append(f'{prefix}charger_queue{{charger="{charger + 1}",queue="{queue}"}} {length}')
+    for estimator, estimatorValues in values.get("estimators", {}).items():
+        for name, value in estimatorValues.items():
+            if isinstance(value, dict):
+                for quantile, latency in value.items():
+                    lines.append(f'{prefix}inference_{name}{{estimator="{estimator}",quantile="{quantile}"}} {latency}')
+            else:
+                lines.append(f'{prefix}estimator_{name}{{estimator="{estimator}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        values = self.server.metrics.snapshot()
+        if self.path.startswith("/metrics.json"):
+            body, contentType = json.dumps(values).encode(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, contentType = prometheusText(values).encode(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # no output between the progress of the experiment
+
+
+if hasattr(socketserver, "UnixStreamServer"):
+    class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def get_request(self):
+            request, _ = super().get_request()
+            return request, ("local", 0)  # the handler expects a host and a port
+else:
+    _UnixHTTPServer = None
+
+
+def _isSocket(path: str) -> bool:
+    try:
+        return stat.S_ISSOCK(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+
+class MetricsServer:
+    """
+    Serves the metrics in a background thread, `address` is a port (on localhost) or the path of a Unix socket.
+    A socket left at the path (e.g. by a crashed run) is replaced, other files are not.
+    """
+
+    def __init__(self, metrics: LiveMetrics, address: str):
+        self.address = address
+        if address.isdigit():
+            self.server = ThreadingHTTPServer(("127.0.0.1", int(address)), _Handler)
+        else:
+            if _UnixHTTPServer is None:
+                raise ValueError("Unix sockets are not supported on this platform, use a port.")
+            if _isSocket(address):
+                os.remove(address)
+            elif os.path.lexists(address):
+                raise FileExistsError(f"The path of the metrics socket exists and it is not a socket: {address}")
+            self.server = _UnixHTTPServer(address, _Handler)
+        self.server.metrics = metrics
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if not self.address.isdigit() and _isSocket(self.address):
+            os.remove(self.address)
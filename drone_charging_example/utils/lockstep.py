@@ -0,0 +1,196 @@
+"""
+Lockstep execution of several independent simulations (replicas) of the same world in one process.
+
+Each replica runs the ML-DEECo simulation loop in its own thread, but only one replica runs at a time (the threads only keep
+the call stacks of the replicas). Each replica has its own world and environment (a `SimulationContext` forked from the current
+one, active in the thread of the replica), the state of the `random` module and the current time step of the simulation are
+swapped whenever another replica is resumed.
+
+A replica is suspended when it asks an estimator for a prediction and at the end of each step. When all replicas are suspended,
+the pending predictions of all replicas are evaluated in one batch per estimator and the replicas continue. The replicas
+only proceed to the next step once all of them have finished the current one. The estimator calls (and the interpreter overhead
+of the framework) are thus shared by all replicas.
+"""
+import random
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from world import SimulationContext, currentContext
+from ml_deeco.simulation import SIMULATION_GLOBALS, run_simulation
+
+
+class Replica:
+    """State of one simulation run in lockstep."""
+
+    def __init__(self, index: int, seed: int, context: SimulationContext):
+        self.index = index
+        self.context = context
+        self.randomState = random.Random(seed).getstate()
+        self.timeStep = SIMULATION_GLOBALS.currentTimeStep
+        self.components = []
+        self.ensembles = []
+        self.thread: Optional[threading.Thread] = None
+        self.resume = threading.Event()
+        self.pending = None  # (estimator, x) of the prediction the replica waits for
+        self.result = None
+        self.finished = False
+        self.atStepEnd = False  # the replica finished the current step and waits for the others
+        self.error: Optional[BaseException] = None
+
+
+class LockstepSimulations:
+    """
+    Runs batches of replicas of the simulation in lockstep.
+
+    The estimators are instrumented once (their `predict` method is replaced), outside the lockstep run the predictions are passed through unchanged.
+    """
+
+    def __init__(self, estimators):
+        self._current: Optional[Replica] = None
+        self._yielded = threading.Event()
+        self.batches = 0
+        self.batchedPredictions = 0
+        for estimator in estimators:
+            self._instrument(estimator)
+
+    def _instrument(self, estimator):
+        original = estimator.predict
+
+        def predict(x):
+            replica = self._current
+            if replica is None or replica.thread is not threading.current_thread():
+                return original(x)
+            replica.pending = (estimator, x)
+            self._suspend(replica)
+            result = replica.result
+            replica.pending = replica.result = None
+            return result
+
+        estimator.predict = predict
+
+    # region switching of replicas
+
+    def _activate(self, replica: Replica):
+        random.setstate(replica.randomState)
+        SIMULATION_GLOBALS.currentTimeStep = replica.timeStep
+        self._current = replica
+
+    def _deactivate(self, replica: Replica):
+        replica.randomState = random.getstate()
+        replica.timeStep = SIMULATION_GLOBALS.currentTimeStep
+        self._current = None
+
+    def _suspend(self, replica: Replica):
+        """Called from the replica thread, gives the control back to the coordinator and waits until resumed."""
+        self._yielded.set()
+        replica.resume.wait()
+        replica.resume.clear()
+
+    def _resume(self, replica: Replica):
+        """Called from the coordinator, runs the replica until it is suspended again."""
+        self._activate(replica)
+        self._yielded.clear()
+        replica.resume.set()
+        self._yielded.wait()
+        self._deactivate(replica)
+        if replica.error is not None:
+            raise replica.error
+
+    # endregion
+
+    def run(self, count: int, steps: int,
+            prepareReplica: Callable[[int], tuple],
+            stepCallback: Optional[Callable] = None,
+            simulationCallback: Optional[Callable] = None):
+        """
+        Runs `count` replicas of the simulation in lockstep.
+
+        Parameters
+        ----------
+        count : int
+            Number of replicas.
+        steps : int
+            Number of steps of each simulation.
+        prepareReplica : function (replica index) -> (components, ensembles)
+            Prepares the world of the replica (called with the context of the replica active, e.g. calls `WORLD.reset`).
+        stepCallback : function (components, materializedEnsembles, step), optional
+            Called after each step of each replica (with the context of the replica active).
+        simulationCallback : function (components, ensembles, replica index), optional
+            Called after all replicas finished (for each replica, with its context active), e.g. to collect the logs of the replica.
+        """
+        # each replica gets its own random stream derived from the current one
+        seeds = [random.getrandbits(64) for _ in range(count)]
+        originalRandom = random.getstate()
+        originalTimeStep = SIMULATION_GLOBALS.currentTimeStep
+        context = currentContext()
+        replicas = [Replica(i, seed, context.fork()) for i, seed in enumerate(seeds)]
+
+        try:
+            for replica in replicas:
+                with replica.context.active():
+                    self._activate(replica)
+                    replica.components, replica.ensembles = prepareReplica(replica.index)
+                    self._deactivate(replica)
+
+            for replica in replicas:
+                replica.thread = threading.Thread(target=self._replicaMain, args=(replica, steps, stepCallback),
+                                                  name=f"replica-{replica.index}", daemon=True)
+                replica.thread.start()
+
+            while not all(replica.finished for replica in replicas):
+                running = [replica for replica in replicas if not replica.finished and not replica.atStepEnd]
+                if not running:
+                    # all replicas finished the step, they continue with the next one
+                    for replica in replicas:
+                        replica.atStepEnd = False
+                    continue
+                for replica in running:
+                    self._resume(replica)
+                    # the replica is now either finished, waiting for a prediction or at the end of the step
+                self._predictPending(replicas)
+
+            if simulationCallback:
+                for replica in replicas:
+                    with replica.context.active():
+                        self._activate(replica)
+                        simulationCallback(replica.components, replica.ensembles, replica.index)
+                        self._deactivate(replica)
+        finally:
+            random.setstate(originalRandom)
+            SIMULATION_GLOBALS.currentTimeStep = originalTimeStep
+            self._current = None
+
+    def _replicaMain(self, replica: Replica, steps: int, stepCallback):
+        replica.resume.wait()
+        replica.resume.clear()
+
+        def lockstepCallback(components, materializedEnsembles, step):
+            if stepCallback:
+                stepCallback(components, materializedEnsembles, step)
+            replica.atStepEnd = True
+            self._suspend(replica)  # wait for the other replicas to finish the step
+
+        try:
+            replica.context.run(run_simulation, replica.components, replica.ensembles, steps, lockstepCallback)
+        except BaseException as e:
+            replica.error = e
+        replica.finished = True
+        self._yielded.set()
+
+    def _predictPending(self, replicas: List[Replica]):
+        """Evaluates the pending predictions of all replicas, one batch per estimator."""
+        byEstimator: Dict[int, List[Replica]] = {}
+        for replica in replicas:
+            if replica.pending is not None:
+                byEstimator.setdefault(id(replica.pending[0]), []).append(replica)
+
+        for waiting in byEstimator.values():
+            estimator = waiting[0].pending[0]
+            batch = np.array([replica.pending[1] for replica in waiting])
+            results = estimator.predictBatch(batch)
+            for replica, result in zip(waiting, results):
+                replica.result = result
+            self.batches += 1
+            self.batchedPredictions += len(waiting)
@@ -0,0 +1,132 @@
+"""
+Memoization of the predictions of the estimators.
+
+Many drones present identical inputs to an estimator in the same step (e.g. all idle drones with a full battery pre-assigned
+to the same charger), so most of the model evaluations are redundant. The `PredictionCache` wraps the `predict` and `predictBatch`
+methods of the estimators and remembers the predictions keyed by the feature vector (optionally rounded to `decimals`, then
+the inputs closer than the resolution share the prediction). The cache is either cleared at each step (`step` scope) or
+keeps the most recently used predictions across the steps (`lru` scope). The predictions depend only on the model,
+so the cache of an estimator is cleared whenever it is trained or its model is replaced.
+"""
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from ml_deeco.simulation import SIMULATION_GLOBALS
+
+from utils.dataset import quantize
+
+STEP = "step"
+LRU = "lru"
+SCOPES = [STEP, LRU]
+
+
+class _EstimatorCache:
+    """The cached predictions of one estimator."""
+
+    def __init__(self):
+        self.predictions = OrderedDict()
+        self.model = None
+        self.step = None
+        self.hits = 0
+        self.misses = 0
+
+
+class PredictionCache:
+    """
+    Memoizes the predictions of the estimators.
+
+    Attributes
+    ----------
+    scope : str
+        `step` (the cache is cleared at each step) or `lru` (the least recently used predictions are evicted when the cache is full).
+    decimals : int, optional
+        The inputs are rounded to this number of decimals before the lookup, None means exact matching.
+    capacity : int
+        Maximal number of cached predictions of each estimator (in the `lru` scope).
+    """
+
+    DEFAULT_CAPACITY = 2 ** 16
+
+    def __init__(self, estimators, scope: str = STEP, decimals: Optional[int] = None, capacity: int = DEFAULT_CAPACITY):
+        if scope not in SCOPES:
+            raise ValueError(f"Unknown scope '{scope}', use one of {SCOPES}.")
+        self.scope = scope
+        self.decimals = decimals
+        self.capacity = capacity
+        self.caches = {}
+        for estimator in estimators:
+            self._instrument(estimator)
+
+    def _instrument(self, estimator):
+        cache = self.caches[estimator.name] = _EstimatorCache()
+        originalPredict, originalPredictBatch, originalTrain = estimator.predict, estimator.predictBatch, estimator.train
+
+        def predict(x):
+            key = self._key(estimator, cache, x)
+            prediction = cache.predictions.get(key)
+            if prediction is not None:
+                self._hit(cache, key)
+                return prediction
+            cache.misses += 1
+            prediction = originalPredict(x)
+            self._store(cache, key, prediction)
+            return prediction
+
+        def predictBatch(x):
+            keys = [self._key(estimator, cache, row) for row in x]
+            found = {}
+            missing = {}  # key -> index of the first row with the key (the duplicates in the batch are evaluated once)
+            for i, key in enumerate(keys):
+                if key in found or key in missing:
+                    cache.hits += 1
+                elif key in cache.predictions:
+                    self._hit(cache, key)
+                    found[key] = cache.predictions[key]
+                else:
+                    missing[key] = i
+            cache.misses += len(missing)
+            if missing:
+                predictions = originalPredictBatch(np.asarray(x)[list(missing.values())])
+                for key, prediction in zip(missing, predictions):
+                    self._store(cache, key, prediction)
+                    found[key] = prediction
+            return np.array([found[key] for key in keys])
+
+        def train(*args, **kwargs):
+            cache.predictions.clear()
+            return originalTrain(*args, **kwargs)
+
+        estimator.predict = predict
+        estimator.predictBatch = predictBatch
+        estimator.train = train
+
+    def _key(self, estimator, cache: _EstimatorCache, x) -> bytes:
+        # the validity of the cache is checked here, so that all predictions go through the same checks
+        model = getattr(estimator, "_model", None)
+        if model is not cache.model:
+            cache.predictions.clear()
+            cache.model = model
+        if self.scope == STEP and SIMULATION_GLOBALS.currentTimeStep != cache.step:
+            cache.predictions.clear()
+            cache.step = SIMULATION_GLOBALS.currentTimeStep
+        if self.decimals is None:
+            return np.asarray(x, dtype=np.float64).tobytes()
+        return quantize(x, self.decimals).tobytes()
+
+    def _hit(self, cache: _EstimatorCache, key: bytes):
+        cache.hits += 1
+        if self.scope == LRU:
+            cache.predictions.move_to_end(key)
+
+    def _store(self, cache: _EstimatorCache, key: bytes, prediction):
+        cache.predictions[key] = prediction
+        if self.scope == LRU and len(cache.predictions) > self.capacity:
+            cache.predictions.popitem(last=False)
+
+    def stats(self):
+        """Yields (estimator name, hits, misses, hit rate) of each estimator."""
+        for name, cache in self.caches.items():
+            total = cache.hits + cache.misses
+            yield name, cache.hits, cache.misses, cache.hits / total if total else 0.0
@@ -0,0 +1,144 @@
+"""
+Inference of the trained neural networks with NumPy.
+
+The `NumpyModel` evaluates a trained Keras network (a stack of `Dense` layers) with NumPy in float32, with the same weights
+as the Keras model. It replaces the model of the estimator for the inference (`__call__` and `predict`), everything else
+(e.g. the training and the saving) is delegated to the original Keras model.
+
+The outputs are the same as those of the Keras model up to the rounding of the float32 computation. The evaluation is
+faster for the small batches of the simulation (a prediction of one drone is a single row) because the NumPy calls have
+a much lower overhead than a call of the Keras model; `inferenceReport` measures the differences of the outputs and the times
+of both models. The model uses a copy of the weights (`weightBytes`) in addition to the Keras model, which is kept for the next training.
+"""
+import time
+
+import numpy as np
+
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "sigmoid": lambda x: 1 / (1 + np.exp(-x)),
+    "tanh": np.tanh,
+    "softplus": lambda x: np.logaddexp(0, x),
+    "exponential": np.exp,
+    "softmax": _softmax,
+}
+
+
+class _Output(np.ndarray):
+    """Output of the NumPy model, it also provides the `numpy` method of the TensorFlow tensors."""
+
+    def numpy(self):
+        return np.asarray(self)
+
+
+def _activationName(layer):
+    activation = layer.get_config().get("activation", "linear")
+    if activation not in ACTIVATIONS:
+        raise ValueError(f"Activation '{activation}' of layer '{layer.name}' is not supported.")
+    return activation
+
+
+class NumpyModel:
+    """
+    Keras model evaluated with NumPy (float32).
+
+    Attributes
+    ----------
+    keras : tf.keras.Model
+        The original model (all attributes not defined here are delegated to it).
+    layers : list
+        (weights, bias, activation) of each dense layer.
+    weightBytes : int
+        Size of the weights used by the computation (besides the Keras model).
+    """
+
+    def __init__(self, keras):
+        self.keras = keras
+        self.layers = []
+        self.weightBytes = 0
+
+        dense = []
+        for layer in keras.layers:
+            kind = type(layer).__name__
+            if kind == "Dense":
+                kernel, bias = layer.get_weights() if layer.use_bias else (layer.get_weights()[0], None)
+                if bias is None:
+                    bias = np.zeros(kernel.shape[1], dtype=np.float32)
+                dense.append((kernel, bias, _activationName(layer)))
+            elif kind == "Activation" and dense:
+                kernel, bias, activation = dense[-1]
+                if activation != "linear":
+                    raise ValueError(f"Layer '{layer.name}' follows a non-linear activation.")
+                dense[-1] = (kernel, bias, _activationName(layer))
+            elif kind not in ("InputLayer", "Dropout"):
+                raise ValueError(f"Layer '{layer.name}' of type {kind} is not supported.")
+
+        for kernel, bias, activation in dense:
+            weights, bias = kernel.astype(np.float32), bias.astype(np.float32)
+            self.layers.append((weights, bias, ACTIVATIONS[activation]))
+            self.weightBytes += weights.nbytes + bias.nbytes
+
+    def compute(self, x) -> np.ndarray:
+        """Outputs of the network for the batch `x`."""
+        h = np.asarray(x, dtype=np.float32)
+        for weights, bias, activation in self.layers:
+            h = activation(h @ weights + bias)
+        return h
+
+    def __call__(self, x, *args, **kwargs):
+        return self.compute(x).view(_Output)
+
+    def predict(self, x, *args, **kwargs):
+        return self.compute(x)
+
+    def __getattr__(self, name):
+        # called only for the attributes not found on the NumPy model
+        keras = self.__dict__.get("keras")
+        if keras is None:
+            raise AttributeError(name)
+        return getattr(keras, name)
+
+    def save(self, *args, **kwargs):
+        return self.keras.save(*args, **kwargs)
+
+
+def _seconds(function, x, repeats: int = 3) -> float:
+    """The shortest time of `function(x)` of a few repeats (after a warm-up call)."""
+    function(x)
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(x)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def inferenceReport(model: NumpyModel, x) -> dict:
+    """
+    Compares the outputs of the NumPy model with the Keras model on the batch `x`.
+
+    The report also contains the time of the inference of the batch (all rows at once and one row) by both models.
+    """
+    x = np.asarray(x, dtype=np.float32)
+    original = np.asarray(model.keras.predict(x, batch_size=4096, verbose=0))
+    difference = model.compute(x) - original
+    report = {
+        "samples": len(x),
+        "rmse_to_keras": float(np.sqrt(np.mean(difference ** 2))) if len(x) else 0.0,
+        "max_error_to_keras": float(np.abs(difference).max()) if len(x) else 0.0,
+        "weight_bytes": model.weightBytes,
+    }
+    if len(x):
+        keras = lambda batch: model.keras(batch, training=False)
+        report["batch_seconds_keras"] = _seconds(keras, x)
+        report["batch_seconds_numpy"] = _seconds(model.compute, x)
+        report["row_seconds_keras"] = _seconds(keras, x[:1], 10)
+        report["row_seconds_numpy"] = _seconds(model.compute, x[:1], 10)
+    return report
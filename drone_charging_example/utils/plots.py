@@ -1,9 +1,8 @@
-import csv
-
 import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 from matplotlib.lines import Line2D
@@ -129,39 +128,64 @@ def createChargerPlot(logs, filename, title):
     plt.close(fig)
 
 
+def createEvaluationPlot(targets, predictions, filename, title):
+    outputs = targets.shape[1]
+    fig, axs = plt.subplots(1, outputs, figsize=(6 * outputs, 6), squeeze=False)
+    for i, ax in enumerate(axs[0]):
+        ax.scatter(targets[:, i], predictions[:, i], s=4, alpha=0.5, color='tab:blue')
+        low = min(targets[:, i].min(), predictions[:, i].min())
+        high = max(targets[:, i].max(), predictions[:, i].max())
+        ax.plot([low, high], [low, high], color='black', linestyle='dotted')
+        ax.set_xlabel("Target")
+        ax.set_ylabel("Prediction")
+    fig.suptitle(title, fontsize=12)
+    fig.tight_layout()
+    plt.savefig(filename + ".png")
+    plt.close(fig)
+
+
+def plotFolder(folder: Path, baseline=False, show=False, processes=None):
+    """Creates the plot of each log of the simulation runs in the folder (`<WORLD>_plot.png`)."""
+    from utils.results import isRunLog, readRunLog
+
+    def runLogs(logFolder):
+        return sorted(file for file in logFolder.glob("*.csv") if not file.name.endswith("_average.csv") and isRunLog(file))
+
+    def readWithAverage(file):
+        averageFile = file.with_name(f"{file.stem}_average.csv")
+        return readRunLog(file), readRunLog(averageFile)
+
+    baselineLogs = {}
+    if baseline:
+        baselineLogs = {file.name.split("_")[0]: file for file in runLogs(folder.parent / "baseline_100")}
+
+    arguments = []
+    for file in runLogs(folder):
+        if not file.with_name(f"{file.stem}_average.csv").exists():
+            continue
+        log, average = readWithAverage(file)
+        world = file.name.split("_")[0]
+        baselineLog = readWithAverage(baselineLogs[world]) if world in baselineLogs else None
+        size = (int(log[:, -1].max()), int(log[:, -2].max()))
+        arguments.append((log, average, folder / f"{file.stem}_plot", f"World: {world}\nEstimator: Neural network [256, 256]", size,
+                          show, baselineLog, (12, 9)))
+
+    if show or len(arguments) <= 1:
+        for plotArguments in arguments:
+            createLogPlot(*plotArguments)
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            for future in [pool.submit(createLogPlot, *plotArguments) for plotArguments in arguments]:
+                future.result()
+    return len(arguments)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('folder', type=str)
     parser.add_argument('--baseline', '-b', action='store_true', default=False)
     parser.add_argument('--show', '-s', action='store_true', default=False)
+    parser.add_argument('--processes', '-p', type=int, default=None)
     args = parser.parse_args()
 
-    folder = Path(args.folder)
-    for file in folder.glob("*.csv"):
-        with open(file, newline="") as csvfile:
-            reader = csv.reader(csvfile)
-            if "average" in file.name:
-                average = list(reader)
-            else:
-                log = list(reader)
-                world = file.name.split("_")[0]
-
-    if args.baseline:
-        baselineFolder = folder.parent / "baseline_100"
-        for file in baselineFolder.glob("*.csv"):
-            with open(file, newline="") as csvfile:
-                reader = csv.reader(csvfile)
-                if "average" in file.name:
-                    baselineAverage = list(reader)
-                else:
-                    baselineLog = list(reader)
-        baselineLog = np.array(baselineLog[1:], dtype=np.float32)
-        baselineAverage = np.array(baselineAverage[1:], dtype=np.float32)
-        baseline = (baselineLog, baselineAverage)
-    else:
-        baseline = None
-
-    log = np.array(log[1:], dtype=np.float32)
-    average = np.array(average[1:], dtype=np.float32)
-    size = (int(log[:, -1].max()), int(log[:, -2].max()))
-    createLogPlot(log, average, folder / "plot", f"World: {world}\nEstimator: Neural network [256, 256]", size, args.show, baseline, figsize=(12, 9))
+    plotFolder(Path(args.folder), args.baseline, args.show, args.processes)
@@ -0,0 +1,157 @@
+"""
+Per-phase wall-time profiler of the simulation.
+
+The profiler wraps the methods of the components, ensembles and estimators of one simulation and accumulates
+the wall time and the number of calls per phase. Each record is keyed by a phase and a name (the class name of
+the component / ensemble or the name of the estimator), so e.g. the `actuate` of all birds is summed up in one
+record. The phases are inclusive -- the estimator inference is also accounted in the ensemble materialization
+which triggered it.
+"""
+import json
+import time
+from typing import Dict, List, Tuple
+
+MATERIALIZATION = "materialization"
+PRIORITY = "priority"
+SITUATION = "situation"
+ENSEMBLE_ACTUATE = "ensemble actuate"
+COMPONENT_ACTUATE = "component actuate"
+DATA_COLLECTION = "data collection"
+INFERENCE = "inference"
+TRAINING = "training"
+STEP_CALLBACK = "step callback"
+STEP = "step"
+
+# methods which are instrumented if the object provides them: (method name, phase)
+ENSEMBLE_METHODS = [
+    ("materialize", MATERIALIZATION),
+    ("priority", PRIORITY),
+    ("situation", SITUATION),
+    ("actuate", ENSEMBLE_ACTUATE),
+    ("collectEstimatesData", DATA_COLLECTION),
+]
+COMPONENT_METHODS = [
+    ("actuate", COMPONENT_ACTUATE),
+    ("collectEstimatesData", DATA_COLLECTION),
+]
+ESTIMATOR_METHODS = [
+    ("predict", INFERENCE),
+    ("predictBatch", INFERENCE),
+    ("train", TRAINING),
+]
+
+
+class Profiler:
+    """
+    Accumulates wall time and call counts per (phase, name).
+
+    Attributes
+    ----------
+    records : dict ((phase, name) -> [seconds, calls])
+        The accumulated measurements.
+    """
+
+    def __init__(self):
+        self.records: Dict[Tuple[str, str], List[float]] = {}
+        self._lastStep = time.perf_counter()
+
+    def add(self, phase, name, seconds, calls=1):
+        record = self.records.get((phase, name))
+        if record is None:
+            self.records[(phase, name)] = [seconds, calls]
+        else:
+            record[0] += seconds
+            record[1] += calls
+
+    def wrap(self, obj, methodName, phase, name):
+        """
+        Replaces the method of the given object (instance only, the class is not changed) by a measured one.
+        Nothing happens if the object does not have such a method.
+        """
+        method = getattr(obj, methodName, None)
+        if method is None or not callable(method):
+            return
+        records = self.records
+        key = (phase, name)
+        clock = time.perf_counter
+
+        def measured(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                record = records.get(key)
+                if record is None:
+                    records[key] = [clock() - start, 1]
+                else:
+                    record[0] += clock() - start
+                    record[1] += 1
+
+        setattr(obj, methodName, measured)
+
+    def wrapFunction(self, function, phase, name):
+        """Returns a measured version of a plain function (e.g. a callback)."""
+        profiler = self
+
+        def measured(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.add(phase, name, time.perf_counter() - start)
+
+        return measured
+
+    def instrumentSimulation(self, components, ensembles):
+        """Instruments the freshly created components and ensembles of a simulation."""
+        for ensemble in ensembles:
+            name = type(ensemble).__name__
+            for methodName, phase in ENSEMBLE_METHODS:
+                self.wrap(ensemble, methodName, phase, name)
+        for component in components:
+            name = type(component).__name__
+            for methodName, phase in COMPONENT_METHODS:
+                self.wrap(component, methodName, phase, name)
+        self._lastStep = time.perf_counter()
+
+    def instrumentEstimators(self, estimators):
+        """Instruments the estimators (they live for the whole experiment, so this is called only once)."""
+        for estimator in estimators:
+            name = getattr(estimator, "name", type(estimator).__name__)
+            for methodName, phase in ESTIMATOR_METHODS:
+                self.wrap(estimator, methodName, phase, name)
+
+    def stepDone(self):
+        """Records the wall time of the whole step (measured from the end of the previous one)."""
+        now = time.perf_counter()
+        self.add(STEP, "total", now - self._lastStep)
+        self._lastStep = now
+
+    def reset(self):
+        self.records.clear()
+        self._lastStep = time.perf_counter()
+
+    def rows(self):
+        """Records sorted by the total time (descending) as (phase, name, seconds, calls, microseconds per call)."""
+        rows = []
+        for (phase, name), (seconds, calls) in self.records.items():
+            rows.append((phase, name, seconds, int(calls), seconds / calls * 1e6 if calls else 0))
+        rows.sort(key=lambda row: -row[2])
+        return rows
+
+    def table(self, title=""):
+        lines = [title] if title else []
+        lines.append(f"{'phase':<20} {'name':<28} {'total [s]':>10} {'calls':>10} {'per call [us]':>14}")
+        for phase, name, seconds, calls, perCall in self.rows():
+            lines.append(f"{phase:<20} {name:<28} {seconds:>10.4f} {calls:>10} {perCall:>14.2f}")
+        return "\n".join(lines)
+
+    def export(self, filename, **metadata):
+        """Saves the records to a JSON file, the `metadata` (e.g. iteration and simulation) are stored alongside."""
+        data = dict(metadata)
+        data["records"] = [
+            {"phase": phase, "name": name, "seconds": seconds, "calls": calls}
+            for phase, name, seconds, calls, _ in self.rows()
+        ]
+        with open(filename, "w") as file:
+            json.dump(data, file, indent=2)
@@ -0,0 +1,255 @@
+"""
+Index of the results of the experiments.
+
+The results of each experiment (`results/<OUTPUT>`) contain a log of the simulation runs (`<WORLD>.csv`, one row per run)
+and the derived averages. The `ResultsStore` ingests the run logs of all experiments under a folder into one columnar
+NumPy archive (one array per column, one row per run), so the statistics of whole sweeps are computed without reading
+thousands of CSV files. The store remembers the size and modification time of each ingested file, an update reads only
+the new and changed files.
+
+    py -m utils.results results --store results/index.npz --summary summary.csv --plot --processes 8
+"""
+import argparse
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+RUN_LOG_HEADER = ['Active Drones', 'Total Damage', 'Alive Drone Rate', 'Damage Rate', 'Charger Capacity', 'Train', 'Run']
+
+KEY_COLUMNS = ["experiment", "world", "seed", "iteration", "run"]
+METRIC_COLUMNS = ["active_drones", "total_damage", "alive_drone_rate", "damage_rate", "charger_capacity"]
+COLUMNS = KEY_COLUMNS + METRIC_COLUMNS + ["log_file"]
+
+NO_SEED = -1
+
+
+def isRunLog(filename) -> bool:
+    """Whether the CSV file is a log of the simulation runs (as exported by `run.py`)."""
+    with open(filename, newline="") as file:
+        return next(csv.reader(file), None) == RUN_LOG_HEADER
+
+
+def readRunLog(filename) -> np.ndarray:
+    """The records of a log of the simulation runs (or of the averages) as a 2D array."""
+    return np.loadtxt(filename, delimiter=",", skiprows=1, ndmin=2, dtype=np.float64)
+
+
+def readSeed(folder, world) -> int:
+    """The seed of the experiment from the arguments saved by `run.py` (`<WORLD>_args.json`)."""
+    argsFile = Path(folder) / f"{world}_args.json"
+    if not argsFile.exists():
+        return NO_SEED
+    with open(argsFile) as file:
+        return int(json.load(file).get("seed", NO_SEED))
+
+
+class ResultsStore:
+    """
+    Columnar store of the simulation runs of many experiments.
+
+    Attributes
+    ----------
+    columns : dict of np.ndarray
+        The columns (see `COLUMNS`), `experiment` and `world` are strings, `log_file` is the index to `files`.
+    files : list of str
+        The ingested files (relative to the root folder).
+    fileStamps : dict
+        (size, modification time) of each ingested file.
+    """
+
+    def __init__(self, filename: Optional[str] = None):
+        self.filename = filename
+        self.columns: Dict[str, np.ndarray] = self._emptyColumns()
+        self.files: List[str] = []
+        self.fileStamps: Dict[str, tuple] = {}
+        if filename is not None and os.path.exists(filename):
+            self.load(filename)
+
+    @staticmethod
+    def _emptyColumns():
+        columns = {name: np.zeros(0, dtype=np.float64) for name in METRIC_COLUMNS}
+        columns.update({"experiment": np.zeros(0, dtype=str), "world": np.zeros(0, dtype=str)})
+        columns.update({name: np.zeros(0, dtype=np.int64) for name in ["seed", "iteration", "run", "log_file"]})
+        return columns
+
+    def __len__(self):
+        return len(self.columns["run"])
+
+    # region ingestion
+
+    def update(self, root) -> int:
+        """Ingests the new and changed run logs under the `root` folder, drops the deleted ones. Returns the number of files read."""
+        root = Path(root)
+        found = {}
+        for filename in root.rglob("*.csv"):
+            if filename.name.endswith("_average.csv") or "charger_logs" in filename.parts:
+                continue
+            stat = filename.stat()
+            found[filename.relative_to(root).as_posix()] = (stat.st_size, stat.st_mtime_ns)
+
+        changed = [name for name, stamp in found.items() if self.fileStamps.get(name) != stamp]
+        removed = [name for name in self.fileStamps if name not in found]
+        self._drop(changed + removed)
+
+        parts = []
+        for name in sorted(changed):
+            self.fileStamps[name] = found[name]
+            if not isRunLog(root / name):
+                continue  # other CSV files are remembered, so they are not opened again
+            parts.append(self._ingest(root, name))
+        if parts:
+            self.columns = {column: np.concatenate([self.columns[column]] + [part[column] for part in parts])
+                            for column in COLUMNS}
+        return len(changed)
+
+    def _ingest(self, root: Path, name: str):
+        records = readRunLog(root / name)
+        path = Path(name)
+        experiment = path.parent.as_posix()
+        world = path.stem
+        if name in self.files:
+            fileIndex = self.files.index(name)
+        else:
+            fileIndex = len(self.files)
+            self.files.append(name)
+
+        rows = len(records)
+        part = {
+            "experiment": np.full(rows, experiment),
+            "world": np.full(rows, world),
+            "seed": np.full(rows, readSeed(root / path.parent, world), dtype=np.int64),
+            "iteration": records[:, 5].astype(np.int64),
+            "run": records[:, 6].astype(np.int64),
+            "log_file": np.full(rows, fileIndex, dtype=np.int64),
+        }
+        for i, column in enumerate(METRIC_COLUMNS):
+            part[column] = records[:, i]
+        return part
+
+    def _drop(self, names: Sequence[str]):
+        indices = [self.files.index(name) for name in names if name in self.files]
+        for name in names:
+            self.fileStamps.pop(name, None)
+        if indices:
+            keep = ~np.isin(self.columns["log_file"], indices)
+            self.columns = {column: values[keep] for column, values in self.columns.items()}
+
+    # endregion
+
+    # region persistence
+
+    def save(self, filename: Optional[str] = None):
+        filename = filename or self.filename
+        stamps = np.array([self.fileStamps[name] for name in self.fileStamps], dtype=np.int64).reshape(-1, 2)
+        np.savez_compressed(filename, files=np.array(self.files, dtype=str), stampedFiles=np.array(list(self.fileStamps), dtype=str),
+                            stamps=stamps, **self.columns)
+
+    def load(self, filename):
+        with np.load(filename) as store:
+            self.columns = {column: store[column] for column in COLUMNS}
+            self.files = store["files"].tolist()
+            self.fileStamps = {name: tuple(stamp) for name, stamp in zip(store["stampedFiles"].tolist(), store["stamps"].tolist())}
+
+    # endregion
+
+    # region queries
+
+    def groups(self, by: Sequence[str]):
+        """Returns the unique keys (dict of columns) and the group index of each row."""
+        if len(self) == 0:
+            return {column: self.columns[column] for column in by}, np.zeros(0, dtype=np.int64)
+        keys = np.rec.fromarrays([self.columns[column] for column in by], names=list(by))
+        unique, inverse = np.unique(keys, return_inverse=True)
+        return {column: unique[column] for column in by}, inverse.reshape(-1)
+
+    def summary(self, by: Sequence[str] = ("experiment", "world", "iteration")):
+        """The number of runs and the mean and standard deviation of the metrics in each group."""
+        keys, inverse = self.groups(by)
+        count = np.bincount(inverse, minlength=len(keys[by[0]]))
+        result = dict(keys)
+        result["runs"] = count
+        for column in METRIC_COLUMNS:
+            values = self.columns[column]
+            mean = np.bincount(inverse, weights=values, minlength=len(count)) / np.maximum(count, 1)
+            squares = np.bincount(inverse, weights=values ** 2, minlength=len(count)) / np.maximum(count, 1)
+            result[f"{column}_mean"] = mean
+            result[f"{column}_std"] = np.sqrt(np.maximum(squares - mean ** 2, 0))
+        return result
+
+    def select(self, **conditions) -> np.ndarray:
+        """Mask of the rows with the given values of the columns."""
+        mask = np.ones(len(self), dtype=bool)
+        for column, value in conditions.items():
+            mask &= self.columns[column] == value
+        return mask
+
+    def runRecords(self, mask) -> np.ndarray:
+        """The selected rows in the format of the run log (ordered by the iteration and the run)."""
+        records = np.column_stack([self.columns[column][mask] for column in METRIC_COLUMNS] +
+                                  [self.columns["iteration"][mask], self.columns["run"][mask]])
+        return records[np.lexsort((records[:, 6], records[:, 5]))]
+
+    # endregion
+
+
+def exportSummary(summary, filename):
+    columns = list(summary)
+    with open(filename, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        writer.writerows(zip(*[summary[column].tolist() for column in columns]))
+
+
+def averageRecords(records: np.ndarray) -> np.ndarray:
+    """The averages of the runs of each iteration (in the format of the average log)."""
+    iterations, inverse = np.unique(records[:, 5], return_inverse=True)
+    count = np.bincount(inverse)
+    averages = np.column_stack([np.bincount(inverse, weights=records[:, i]) / count for i in range(records.shape[1])])
+    averages[:, 5] = iterations
+    return averages
+
+
+def plotExperiments(store: ResultsStore, root, processes: Optional[int] = None):
+    """Creates the plot of each experiment and world (`<WORLD>_plot.png` in the experiment folder) on a process pool."""
+    from utils import plots
+
+    keys, _ = store.groups(["experiment", "world"])
+    with ProcessPoolExecutor(processes) as pool:
+        futures = []
+        for experiment, world in zip(keys["experiment"].tolist(), keys["world"].tolist()):
+            records = store.runRecords(store.select(experiment=experiment, world=world))
+            size = (int(records[:, 6].max()), int(records[:, 5].max()))
+            filename = str(Path(root) / experiment / f"{world}_plot")
+            futures.append(pool.submit(plots.createLogPlot, records, averageRecords(records), filename, f"World: {world}", size))
+        for future in futures:
+            future.result()
+    return len(futures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Indexes the results of the experiments into one columnar store.')
+    parser.add_argument('root', type=str, help='The folder with the results (searched recursively).')
+    parser.add_argument('--store', type=str, default=None, help='The store file (updated incrementally), "<ROOT>/index.npz" by default.')
+    parser.add_argument('--summary', type=str, default=None, help='Export the statistics of each experiment, world and iteration to the CSV file.')
+    parser.add_argument('--plot', action='store_true', default=False, help='Create the plot of each experiment and world.')
+    parser.add_argument('--processes', type=int, default=None, help='Number of processes creating the plots (the number of CPUs by default).')
+    args = parser.parse_args()
+
+    store = ResultsStore(args.store or os.path.join(args.root, "index.npz"))
+    read = store.update(args.root)
+    store.save()
+    print(f"{read} files read, {len(store)} runs of {len(store.files)} logs in the store.")
+
+    if args.summary:
+        exportSummary(store.summary(), args.summary)
+    if args.plot:
+        print(f"{plotExperiments(store, args.root, args.processes)} plots created.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Structured tracing of the simulation.
+
+The hot paths (e.g. the `actuate` of the ensembles) record typed events instead of formatting messages. An event is a fixed-size
+record (time step, event type, subject, target, value) written to a preallocated ring buffer, the subjects and targets
+(component ids) are interned to integers. The callers keep the tracer of their world in an attribute (set when they are
+created) only if it records their events, and check it before computing the arguments:
+
+    self.tracer = WORLD.tracer if WORLD.tracer.records(PRE_ASSIGNMENT) else None
+    ...
+    if self.tracer is not None:
+        self.tracer.record(PRE_ASSIGNMENT, None, self.charger.id, len(self.drones))
+
+so disabled tracing costs one comparison (and no lookup of the world). The trace is saved to a NumPy archive and decoded offline to text or CSV:
+
+    py -m utils.tracing results/output/traces/12drones_1_1.npz --csv trace.csv
+"""
+import argparse
+import csv
+import sys
+from typing import Optional
+
+import numpy as np
+
+from ml_deeco.simulation import SIMULATION_GLOBALS
+
+# event types
+PRE_ASSIGNMENT = 1
+ASSIGNMENT = 2
+ACCEPTED_ASSIGNMENT = 3
+FIELD_PROTECTION = 4
+SAVING_ANIMATION = 5
+SAVING_CHARGER_PLOT = 6
+
+EVENT_NAMES = {
+    PRE_ASSIGNMENT: "pre_assignment",
+    ASSIGNMENT: "assignment",
+    ACCEPTED_ASSIGNMENT: "accepted_assignment",
+    FIELD_PROTECTION: "field_protection",
+    SAVING_ANIMATION: "saving_animation",
+    SAVING_CHARGER_PLOT: "saving_charger_plot",
+}
+
+EVENT_FORMATS = {
+    PRE_ASSIGNMENT: "DroneChargingPreassignment: assigned {value} to {target}",
+    ASSIGNMENT: "DroneChargingAssignment: assigned {value} to {target}",
+    ACCEPTED_ASSIGNMENT: "AcceptedDronesAssignment: assigned {value} to {target}",
+    FIELD_PROTECTION: "Protecting Ensemble: assigning {subject} to {target}",
+    SAVING_ANIMATION: "Saving animation {target}...",
+    SAVING_CHARGER_PLOT: "Saving charger plot {target}...",
+}
+
+# the verbosity levels of the events
+EVENT_LEVELS = {
+    PRE_ASSIGNMENT: 4,
+    ASSIGNMENT: 4,
+    ACCEPTED_ASSIGNMENT: 4,
+    FIELD_PROTECTION: 4,
+    SAVING_ANIMATION: 3,
+    SAVING_CHARGER_PLOT: 3,
+}
+
+EVENT_DTYPE = np.dtype([
+    ("step", np.int32),
+    ("event", np.uint8),
+    ("subject", np.int32),
+    ("target", np.int32),
+    ("value", np.int32),
+])
+
+DEFAULT_CAPACITY = 2 ** 18
+NO_NAME = -1
+
+
+class Tracer:
+    """
+    Ring buffer of the trace events of one simulation.
+
+    Attributes
+    ----------
+    level : int
+        The events are recorded only if the level is at least the level of the event (same as the verbosity levels, the ensemble events have level 4).
+    echo : int
+        The recorded events up to this level are printed immediately (as the `verbosePrint` did), 0 to print none.
+    count : int
+        Number of events recorded (including those overwritten in the ring buffer).
+    """
+
+    def __init__(self, level=0, capacity=DEFAULT_CAPACITY, echo=0):
+        self.level = level
+        self.echo = echo
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity if level > 0 else 0, dtype=EVENT_DTYPE)
+        self.count = 0
+        self.names = []
+        self._nameIndices = {}
+
+    def _intern(self, name: Optional[str]) -> int:
+        if name is None:
+            return NO_NAME
+        index = self._nameIndices.get(name)
+        if index is None:
+            index = self._nameIndices[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def records(self, event: int) -> bool:
+        return self.level >= EVENT_LEVELS[event]
+
+    def record(self, event: int, subject: Optional[str], target: Optional[str], value: int = 0):
+        """Records the event in the current time step. The `subject` and `target` are names (ids) of the components."""
+        self.buffer[self.count % self.capacity] = (SIMULATION_GLOBALS.currentTimeStep, event, self._intern(subject), self._intern(target), value)
+        self.count += 1
+        if EVENT_LEVELS[event] <= self.echo:
+            print(EVENT_FORMATS[event].format(subject=subject, target=target, value=value))
+
+    def events(self) -> np.ndarray:
+        """The recorded events (the oldest are missing if more than `capacity` were recorded) in the order of recording."""
+        if self.count <= self.capacity:
+            return self.buffer[:self.count]
+        start = self.count % self.capacity
+        return np.concatenate([self.buffer[start:], self.buffer[:start]])
+
+    def save(self, filename):
+        np.savez_compressed(filename, events=self.events(), names=np.array(self.names, dtype=str),
+                            dropped=max(0, self.count - self.capacity))
+
+
+# region decoding
+
+def load(filename):
+    """Loads a saved trace, returns the events, the names and the number of events dropped from the ring buffer."""
+    with np.load(filename) as trace:
+        return trace["events"], list(trace["names"]), int(trace["dropped"])
+
+
+def decodeEvents(events, names):
+    """Yields the events as tuples (step, event name, subject, target, value) with the names resolved."""
+    def name(index):
+        return names[index] if index != NO_NAME else ""
+
+    for step, event, subject, target, value in events.tolist():
+        yield step, EVENT_NAMES[event], name(subject), name(target), value
+
+
+def toText(filename, output=sys.stdout):
+    events, names, dropped = load(filename)
+    if dropped:
+        print(f"({dropped} oldest events were dropped from the ring buffer)", file=output)
+    for step, event, subject, target, value in events.tolist():
+        subject = names[subject] if subject != NO_NAME else ""
+        target = names[target] if target != NO_NAME else ""
+        print(f"{step}: " + EVENT_FORMATS[event].format(subject=subject, target=target, value=value), file=output)
+
+
+def toCsv(filename, csvFilename):
+    events, names, _ = load(filename)
+    with open(csvFilename, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["step", "event", "subject", "target", "value"])
+        writer.writerows(decodeEvents(events, names))
+
+# endregion
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Decodes a trace of the simulation to text or CSV.')
+    parser.add_argument('input', type=str, help='The trace (.npz) file.')
+    parser.add_argument('--csv', type=str, default=None, help='Write the events to the CSV file instead of printing them.')
+    args = parser.parse_args()
+
+    if args.csv:
+        toCsv(args.input, args.csv)
+    else:
+        toText(args.input)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+"""
+Customized training of the estimators.
+
+The `TrainingController` replaces the `train` method of the estimators. The data passed to the training can be compacted
+(see `utils/dataset.py`) and the training can be pipelined: normally, the training at the end of an iteration blocks
+the simulations of the next iteration. With a pipelining policy, the training runs in a background thread (TensorFlow
+releases the GIL while fitting) on a copy of the estimator with a clone of its model, while the simulations of the next
+iteration continue with the previous model. The trained model is swapped in at the start of a simulation -- as soon as
+it is ready (policy `previous`) or the simulation waits for it (policy `wait`).
+
+The fitting can be further customized (early stopping, time budget, schedules) and the trained models can be evaluated
+with NumPy for the inference (see `utils/numpy_inference.py`).
+"""
+import copy
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+import tensorflow as tf
+
+from utils.dataset import compactDataset
+from utils.numpy_inference import NumpyModel, inferenceReport
+from ml_deeco.utils import verbosePrint, Log
+
+PREVIOUS = "previous"  # simulate with the previous model until the training finishes
+WAIT = "wait"  # wait for the training at the start of the next simulation
+POLICIES = [PREVIOUS, WAIT]
+
+_MISSING = object()
+
+
+def cloneModel(model):
+    """Copy of the compiled Keras model with the same weights (the optimizer of the copy starts with a fresh state)."""
+    clone = tf.keras.models.clone_model(model)
+    clone.set_weights(model.get_weights())
+    if hasattr(model, "get_compile_config"):  # Keras >= 2.13
+        clone.compile_from_config(model.get_compile_config())
+    else:
+        clone.compile(optimizer=type(model.optimizer).from_config(model.optimizer.get_config()), loss=model.loss,
+                      metrics=model.compiled_metrics._user_metrics)
+    return clone
+
+
+class BackgroundTraining:
+    """
+    Training of one estimator running in a background thread.
+
+    The training runs on a shallow copy of the estimator with its own model, so the estimator can be used for predictions meanwhile.
+    The attributes rebound by the training (e.g. the model) are applied to the estimator by `updates`.
+
+    The instrumentations (e.g. `PredictionCache`, `LiveMetrics`) replace the methods of the estimator by closures over the estimator,
+    the copy uses the methods of the class instead. A wrapper with a `rebind` attribute (function (copy) -> wrapper) is replaced
+    by the wrapper of the copy.
+
+    Attributes
+    ----------
+    seconds : float, optional
+        Duration of the training, None while it runs.
+    """
+
+    def __init__(self, estimator, train):
+        self.trainer = copy.copy(estimator)
+        for name, wrapper in list(vars(estimator).items()):
+            if callable(wrapper) and callable(getattr(type(estimator), name, None)):
+                rebind = getattr(wrapper, "rebind", None)
+                if rebind is not None:
+                    setattr(self.trainer, name, rebind(self.trainer))
+                else:
+                    delattr(self.trainer, name)
+        # taken before the model is cloned: the clone is fitted in place, so it must be reported by `updates` as changed
+        self._initial = dict(self.trainer.__dict__)
+        model = getattr(estimator, "_model", None)
+        if isinstance(model, NumpyModel):
+            model = model.keras  # the training continues from the Keras model
+        if model is not None:
+            self.trainer._model = cloneModel(model)
+        self.error = None
+        self.seconds: Optional[float] = None
+        self.thread = threading.Thread(target=self._train, args=(train,), name=f"training-{estimator.name}", daemon=True)
+        self.thread.start()
+
+    def _train(self, train):
+        start = time.perf_counter()
+        try:
+            train(self.trainer)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.seconds = time.perf_counter() - start
+
+    def done(self):
+        return not self.thread.is_alive()
+
+    def updates(self):
+        """Waits for the training and returns the attributes of the estimator changed by it."""
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        return {name: value for name, value in self.trainer.__dict__.items() if self._initial.get(name, _MISSING) is not value}
+
+
+class TimeBudget(tf.keras.callbacks.Callback):
+    """Stops the training at the deadline (a `time.perf_counter` value, checked after each batch)."""
+
+    def __init__(self, deadline: float):
+        super().__init__()
+        self.deadline = deadline
+        self.exceeded = False
+
+    def on_train_batch_end(self, batch, logs=None):
+        if time.perf_counter() > self.deadline:
+            self.exceeded = True
+            self.model.stop_training = True
+
+
+def _fitArgument(args, kwargs, name, index, default=None):
+    """Value of the argument of `Model.fit` given either as positional (at `index`) or keyword argument."""
+    if len(args) > index:
+        return args[index]
+    return kwargs.get(name, default)
+
+
+def _setFitArgument(args, kwargs, name, index, value):
+    if len(args) > index:
+        args[index] = value
+    else:
+        kwargs[name] = value
+
+
+class TrainingController:
+    """
+    Runs the training of the estimators with the customizations.
+
+    The `train` and `saveModel` methods of the estimators are replaced. With a pipelining `policy`, `train` starts
+    the background training (after the previous one of the estimator is finished) and `saveModel` is deferred until
+    the trained model is swapped in. Call `simulationBoundary` before each simulation and `finish` after the experiment.
+
+    The customizations of the fitting (sample weights, callbacks, batch size) are applied by wrapping the `fit` method
+    of the Keras model of the estimator (`_model`) for the duration of the training.
+
+    Attributes
+    ----------
+    trainingLog : Log
+        One record per training of an estimator.
+    """
+
+    MAX_STEPS_PER_EPOCH = 200  # the batch size schedule doubles the batch size until the epoch has at most this number of steps
+    MAX_BATCH_SIZE = 4096
+    EVALUATION_SAMPLES = 5000
+
+    def __init__(self, estimators, policy: Optional[str] = None, compactionDecimals: Optional[int] = None,
+                 earlyStoppingPatience: Optional[int] = None, timeBudget: Optional[float] = None, schedule=False,
+                 numpyInference=False, validationSplit: Optional[float] = None):
+        """
+        Parameters
+        ----------
+        estimators : list
+            The estimators to be controlled.
+        policy : str, optional
+            The pipelining policy (`previous` or `wait`), None to train synchronously.
+        compactionDecimals : int, optional
+            Merge the training samples with features equal when rounded to this number of decimals (see `utils/dataset.py`).
+        earlyStoppingPatience : int, optional
+            Stop the training if the validation loss does not improve for this number of epochs.
+        timeBudget : float, optional
+            Maximal time (in seconds) of the training of all estimators in one iteration. The deadline is shared: it starts with
+            the first training of the iteration (a new iteration starts when an estimator is trained again).
+        schedule : bool
+            Halve the learning rate when the loss stops improving and grow the batch size with the size of the dataset.
+        numpyInference : bool
+            Evaluate the trained models with NumPy for the predictions (see `utils/numpy_inference.py`).
+        validationSplit : float, optional
+            Fraction of the training data held out for the validation loss monitored by the early stopping and the schedule
+            (Keras validates on the last rows), used when the estimator does not validate itself.
+        """
+        if policy is not None and policy not in POLICIES:
+            raise ValueError(f"Unknown policy '{policy}', use one of {POLICIES}.")
+        self.policy = policy
+        self.compactionDecimals = compactionDecimals
+        self.earlyStoppingPatience = earlyStoppingPatience
+        self.timeBudget = timeBudget
+        self.schedule = schedule
+        self.numpyInference = numpyInference
+        self.validationSplit = validationSplit
+        self.trainings = {}
+        self.waitingSeconds = 0
+        self._deadline: Optional[float] = None
+        self._trainedBeforeDeadline = set()  # the estimators trained since the deadline was set
+        self.trainingLog = Log([
+            "estimator",
+            "training",
+            "samples",
+            "compacted_samples",
+            "compression_ratio",
+            "epochs",
+            "stopped",
+            "batch_size",
+            "learning_rate",
+            "seconds",
+        ])
+        self.inferenceLog = Log([
+            "estimator",
+            "training",
+            "evaluation_data",
+            "samples",
+            "rmse_to_keras",
+            "max_error_to_keras",
+            "weight_bytes",
+            "batch_seconds_keras",
+            "batch_seconds_numpy",
+            "row_seconds_keras",
+            "row_seconds_numpy",
+        ])
+        self._trainingCounts = {}
+        self._deferredSaves = {}
+        self._originalSaves = {}
+        for estimator in estimators:
+            self._instrument(estimator)
+
+    def _instrument(self, estimator):
+        self._originalSaves[estimator] = estimator.saveModel
+
+        def train(x, y):
+            deadline = self._iterationDeadline(estimator)
+            if self.policy is None:
+                self._train(estimator, x, y, deadline)
+                return
+            self._swap(estimator, wait=True)  # at most one training of the estimator at a time
+            # the collected data can be cleared by the estimator after this call
+            x, y = copy.copy(x), copy.copy(y)
+            self.trainings[estimator] = BackgroundTraining(estimator, lambda trainer: self._train(trainer, x, y, deadline))
+
+        def saveModel(*args, **kwargs):
+            if estimator in self.trainings:
+                self._deferredSaves.setdefault(estimator, []).append((args, kwargs))
+            else:
+                self._originalSaves[estimator](*args, **kwargs)
+
+        estimator.train = train
+        estimator.saveModel = saveModel
+
+    def _iterationDeadline(self, estimator) -> Optional[float]:
+        """The deadline of the time budget shared by the trainings of the estimators in the current iteration."""
+        if self.timeBudget is None:
+            return None
+        if self._deadline is None or estimator in self._trainedBeforeDeadline:
+            # the first training of a new iteration
+            self._deadline = time.perf_counter() + self.timeBudget
+            self._trainedBeforeDeadline.clear()
+        self._trainedBeforeDeadline.add(estimator)
+        return self._deadline
+
+    @property
+    def customizesFit(self):
+        return self.compactionDecimals is not None or self.earlyStoppingPatience is not None or self.timeBudget is not None or \
+            self.schedule or self.numpyInference
+
+    def _train(self, estimator, x, y, deadline=None):
+        """Runs the original training of the estimator (the `train` of its class) with the customizations, stopped at the `deadline`."""
+        start = time.perf_counter()
+        if isinstance(getattr(estimator, "_model", None), NumpyModel):
+            estimator._model = estimator._model.keras  # train (and evaluate) the Keras model
+        samples = compacted = len(x)
+        dataset = None
+        if self.compactionDecimals is not None and len(x) > 0:
+            dataset = compactDataset(x, y, self.compactionDecimals)
+            x, y, compacted = dataset.x, dataset.y, len(dataset.x)
+            verbosePrint(f"{estimator.name}: training data compacted from {samples} to {compacted} samples ({dataset.compressionRatio:.1f}x).", 1)
+
+        report = {"epochs": None, "stopped": "", "batch_size": None, "learning_rate": None, "fit_data": None}
+        model = getattr(estimator, "_model", None)
+        fitWrapped = model is not None and self.customizesFit
+        if fitWrapped:
+            originalFit = model.fit
+
+            def fit(*args, **kwargs):
+                args = list(args)
+                callbacks = self._customizeFit(estimator, model, dataset, deadline, args, kwargs, report)
+                history = originalFit(*args, **kwargs)
+                self._reportFit(model, history, callbacks, report)
+                return history
+
+            model.fit = fit
+
+        try:
+            type(estimator).train(estimator, x, y)
+        finally:
+            if fitWrapped:
+                del model.fit
+
+        training = self._trainingCounts[estimator.name] = self._trainingCounts.get(estimator.name, 0) + 1
+        if self.numpyInference and getattr(estimator, "_model", None) is not None:
+            self._useNumpyModel(estimator, training, report["fit_data"])
+        self.trainingLog.register([
+            estimator.name,
+            training,
+            samples,
+            compacted,
+            samples / max(1, compacted),
+            report["epochs"],
+            report["stopped"],
+            report["batch_size"],
+            report["learning_rate"],
+            time.perf_counter() - start,
+        ])
+
+    def _customizeFit(self, estimator, model, dataset, deadline, args, kwargs, report):
+        """Modifies the arguments of `Model.fit` (in place) and returns the added callbacks."""
+        x = _fitArgument(args, kwargs, "x", 0)
+        validated = _fitArgument(args, kwargs, "validation_data", 7) is not None or _fitArgument(args, kwargs, "validation_split", 6, 0) > 0
+        monitored = self.earlyStoppingPatience is not None or self.schedule
+        if monitored and not validated:
+            # without validation, the training loss would be monitored, which keeps improving
+            if self.validationSplit and (isinstance(x, (np.ndarray, list)) or tf.is_tensor(x)):
+                _setFitArgument(args, kwargs, "validation_split", 6, self.validationSplit)
+                validated = True
+            else:
+                raise ValueError(f"{estimator.name}: the early stopping and the schedule need validation data, "
+                                 f"set the validation split (the fitted data are {type(x).__name__}).")
+        report["fit_data"] = (x, _fitArgument(args, kwargs, "y", 1), _fitArgument(args, kwargs, "validation_data", 7),
+                              _fitArgument(args, kwargs, "validation_split", 6, 0))
+
+        if dataset is not None and _fitArgument(args, kwargs, "sample_weight", 10) is None:
+            # the estimator can split the data before fitting, so the weights are found by the features of the rows
+            weights = dataset.weightsFor(x)
+            if weights is not None:
+                _setFitArgument(args, kwargs, "sample_weight", 10, weights)
+            else:
+                verbosePrint(f"{estimator.name}: sample weights not applied, the fitted rows do not match the compacted data.", 1)
+
+        batchSize = _fitArgument(args, kwargs, "batch_size", 2) or 32
+        if self.schedule and x is not None:
+            while len(x) / batchSize > self.MAX_STEPS_PER_EPOCH and batchSize * 2 <= self.MAX_BATCH_SIZE:
+                batchSize *= 2
+            _setFitArgument(args, kwargs, "batch_size", 2, batchSize)
+        report["batch_size"] = batchSize
+
+        monitor = "val_loss" if validated else "loss"
+        callbacks = {}
+        if self.earlyStoppingPatience is not None:
+            callbacks["early_stopping"] = tf.keras.callbacks.EarlyStopping(monitor=monitor, patience=self.earlyStoppingPatience, restore_best_weights=True)
+        if deadline is not None:
+            callbacks["time_budget"] = TimeBudget(deadline)
+        if self.schedule:
+            patience = max(1, (self.earlyStoppingPatience or 4) // 2)
+            callbacks["schedule"] = tf.keras.callbacks.ReduceLROnPlateau(monitor=monitor, factor=0.5, patience=patience, min_lr=1e-5)
+        if callbacks:
+            existing = list(_fitArgument(args, kwargs, "callbacks", 5) or [])
+            _setFitArgument(args, kwargs, "callbacks", 5, existing + list(callbacks.values()))
+        return callbacks
+
+    @staticmethod
+    def _reportFit(model, history, callbacks, report):
+        report["epochs"] = (report["epochs"] or 0) + len(history.epoch)
+        if "time_budget" in callbacks and callbacks["time_budget"].exceeded:
+            report["stopped"] = "time_budget"
+        elif "early_stopping" in callbacks and callbacks["early_stopping"].stopped_epoch > 0:
+            report["stopped"] = "early_stopping"
+        report["learning_rate"] = float(tf.keras.backend.get_value(model.optimizer.learning_rate))
+
+    def _useNumpyModel(self, estimator, training, fitData):
+        """
+        Replaces the model of the estimator by the NumPy model.
+
+        The NumPy model is compared with the Keras model on the validation data of the fitting (held out of the fitting), or on
+        the training data if the fitting was not validated (reported as `training` in the `evaluation_data` column).
+        """
+        evaluationX = None
+        evaluationData = "validation"
+        if fitData is not None:
+            x, y, validationData, validationSplit = fitData
+            x = np.asarray(x)
+            if validationData is not None:
+                evaluationX = validationData[0]
+            elif validationSplit:
+                evaluationX = x[int(len(x) * (1 - validationSplit)):]  # Keras validates on the last part of the data
+            else:
+                evaluationX = x
+                evaluationData = "training"
+            evaluationX = np.asarray(evaluationX)[:self.EVALUATION_SAMPLES]
+
+        try:
+            model = NumpyModel(estimator._model)
+        except ValueError as e:
+            verbosePrint(f"{estimator.name}: the model cannot be evaluated with NumPy ({e}), using the Keras model.", 1)
+            return
+
+        if evaluationX is not None:
+            report = inferenceReport(model, evaluationX)
+            self.inferenceLog.register([
+                estimator.name,
+                training,
+                evaluationData,
+                report["samples"],
+                report["rmse_to_keras"],
+                report["max_error_to_keras"],
+                report["weight_bytes"],
+                report.get("batch_seconds_keras"),
+                report.get("batch_seconds_numpy"),
+                report.get("row_seconds_keras"),
+                report.get("row_seconds_numpy"),
+            ])
+        estimator._model = model
+
+    def _swap(self, estimator, wait):
+        training = self.trainings.get(estimator)
+        if training is None:
+            return
+        if not training.done():
+            if not wait:
+                return
+            start = time.perf_counter()
+            training.thread.join()
+            self.waitingSeconds += time.perf_counter() - start
+
+        del self.trainings[estimator]
+        estimator.__dict__.update(training.updates())
+        verbosePrint(f"{estimator.name}: model trained in the background swapped in.", 2)
+        for args, kwargs in self._deferredSaves.pop(estimator, []):
+            self._originalSaves[estimator](*args, **kwargs)
+
+    def simulationBoundary(self):
+        """Swaps in the models of the finished trainings (or waits for all of them with the `wait` policy)."""
+        for estimator in list(self.trainings):
+            self._swap(estimator, wait=self.policy == WAIT)
+
+    def finish(self):
+        """Waits for all trainings and swaps in their models."""
+        for estimator in list(self.trainings):
+            self._swap(estimator, wait=True)
+        if self.policy is not None:
+            verbosePrint(f"Simulations waited {self.waitingSeconds:.2f} s for the background training.", 1)
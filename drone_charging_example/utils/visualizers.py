@@ -82,7 +82,7 @@ class Visualizer:
         text = f"Step: {SIMULATION_GLOBALS.currentTimeStep + 1}"
         text = f"{text}\nalive drones: {len([drone for drone in self.world.drones if drone.state != DroneState.TERMINATED])} - Damage: {totalDamage}/{totalCorp}"
         text = f"{text}\nchargers: {len(self.world.chargers)} - charger capacity: {ENVIRONMENT.chargerCapacity}"
-        text = f"{text}\nbirds: {len(self.world.birds)}"
+        text = f"{text}\nbirds: {ENVIRONMENT.birdCount}"
         text = f"{text}\nCharging Rate: {sum([len(charger.chargingDrones) for charger in self.world.chargers])} (drones at) {ENVIRONMENT.currentChargingRate:0.3f}"
         text = f"{text}\nMAX Charging Available: {ENVIRONMENT.totalAvailableChargingEnergy:0.3f}"
         text = f"{text}\nCharger Queues:"
@@ -123,8 +123,8 @@ class Visualizer:
 
         array = np.array(self.background, copy=True)
 
-        for bird in self.world.birds:
-            self.grid[bird] = self.drawRectangle(array, bird.location, 'bird')
+        for location in self.world.birdLocations():
+            self.drawRectangle(array, location, 'bird')
 
         for drone in self.world.drones:
             self.grid[drone] = self.drawRectangle(array, drone.location, 'drone')
@@ -0,0 +1,311 @@
+"""
+Execution of the simulations of an experiment by workers on several machines, sharing only a directory (e.g. on a network
+file system).
+
+The coordinator (`run.py --work_queue <DIR>`) writes its arguments and the world config to `<DIR>/args.json` and a job descriptor (the world config, the seed, the iteration,
+the simulation and the version of the models) for each simulation of an iteration to `<DIR>/jobs/pending`.
+The workers (`py -m utils.workqueue <DIR>`) claim the jobs by renaming them to `<DIR>/jobs/claimed` (the rename is atomic,
+so only one worker gets each job), run the simulation and write a result shard (the statistics of the simulation
+and the data collected for the training of the estimators) to `<DIR>/shards`. When the shards of all simulations of the iteration
+are complete, the coordinator merges them, trains the estimators and publishes the models to `<DIR>/models` for the next
+iteration. All files are written to a temporary name and renamed, so the readers never see partial files.
+
+The claimed jobs are touched by the workers during the simulation, the jobs of the workers that stopped
+(not touched for `jobTimeout` seconds) are returned to the pending jobs.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+PENDING = "jobs/pending"
+CLAIMED = "jobs/claimed"
+SHARDS = "shards"
+MODELS = "models"
+ARGS_FILE = "args.json"
+DONE_FILE = "done"
+
+POLL_SECONDS = 0.5
+HEARTBEAT_STEPS = 50
+
+
+def jobName(iteration: int, simulation: int) -> str:
+    return f"{iteration:04d}_{simulation:04d}"
+
+
+def estimatorSlug(estimator) -> str:
+    return estimator.name.lower().replace(" ", "_")
+
+
+def jobSeed(seed: int, iteration: int, simulation: int) -> int:
+    """Seed of one simulation, derived from the seed of the experiment."""
+    return random.Random(f"{seed}_{iteration}_{simulation}").getrandbits(32)
+
+
+def writeAtomically(filename: Path, write: Callable[[str], None], suffix=""):
+    """Writes the file by `write(temporaryName)` and renames it to `filename`."""
+    temporary = filename.with_name(f".{filename.name}.{socket.gethostname()}-{os.getpid()}.tmp{suffix}")
+    write(str(temporary))
+    os.replace(temporary, filename)
+
+
+def writeJson(filename: Path, data):
+    def write(name):
+        with open(name, "w") as file:
+            json.dump(data, file, indent=2)
+    writeAtomically(filename, write)
+
+
+class Coordinator:
+    """
+    Distributes the simulations of the iterations to the workers and trains the estimators from their results.
+
+    Attributes
+    ----------
+    folder : Path
+        The shared directory of the queue.
+    estimators : list
+        The estimators trained by the coordinator.
+    accumulateData : bool or int
+        False = train on the data of the last iteration, True = on all data, <number> = on the data of the last <number> iterations.
+    jobTimeout : float
+        Seconds after which a claimed job not touched by its worker is returned to the pending jobs.
+    """
+
+    def __init__(self, folder, args, config, estimators, accumulateData=False, jobTimeout=600.0):
+        self.folder = Path(folder)
+        self.args = args
+        self.config = config
+        self.estimators = estimators
+        self.accumulateData = accumulateData
+        self.jobTimeout = jobTimeout
+        self.history: List[Dict[str, tuple]] = []  # the training data of each iteration
+        self.localWorkers: List[subprocess.Popen] = []
+
+        for subfolder in (PENDING, CLAIMED, SHARDS, MODELS):
+            shutil.rmtree(self.folder / subfolder, ignore_errors=True)
+            (self.folder / subfolder).mkdir(parents=True)
+        if (self.folder / DONE_FILE).exists():
+            os.remove(self.folder / DONE_FILE)
+        # the workers configure the environment before they create the estimators (the features depend on the config)
+        writeJson(self.folder / ARGS_FILE, {"args": vars(args), "config": config})
+
+    def startLocalWorkers(self, count: int):
+        """Starts the workers as processes on this machine."""
+        projectFolder = Path(__file__).resolve().parent.parent
+        for _ in range(count):
+            self.localWorkers.append(subprocess.Popen([sys.executable, "-m", "utils.workqueue", str(self.folder.resolve())], cwd=projectFolder))
+
+    def run(self, iterations: int, simulations: int,
+            simulationCallback: Callable[[list, int, int], None],
+            iterationCallback: Callable[[int], None]):
+        """
+        Runs the experiment.
+
+        Parameters
+        ----------
+        iterations, simulations : int
+            As in `run_experiment`.
+        simulationCallback : function (statistics, iteration, simulation)
+            Called with the statistics of each simulation (in the order of the simulations).
+        iterationCallback : function (iteration)
+            Called after the estimators were trained at the end of the iteration.
+        """
+        try:
+            for iteration in range(iterations):
+                for simulation in range(simulations):
+                    writeJson(self.folder / PENDING / f"{jobName(iteration, simulation)}.json", {
+                        "iteration": iteration,
+                        "simulation": simulation,
+                        "seed": jobSeed(self.args.seed, iteration, simulation),
+                        "modelVersion": iteration,
+                        "config": self.config,
+                    })
+                shards = self._waitForShards(iteration, simulations)
+                self._merge(iteration, shards, simulationCallback)
+                iterationCallback(iteration)
+        finally:
+            (self.folder / DONE_FILE).touch()
+            for worker in self.localWorkers:
+                worker.wait()
+
+    def _waitForShards(self, iteration: int, simulations: int) -> List[Path]:
+        shards = [self.folder / SHARDS / f"{jobName(iteration, simulation)}.npz" for simulation in range(simulations)]
+        while not all(shard.exists() for shard in shards):
+            self._requeueStaleJobs()
+            if self.localWorkers and all(worker.poll() is not None for worker in self.localWorkers):
+                raise RuntimeError("All local workers stopped before the iteration was finished.")
+            time.sleep(POLL_SECONDS)
+        return shards
+
+    def _requeueStaleJobs(self):
+        now = time.time()
+        for claimed in (self.folder / CLAIMED).glob("*.json"):
+            try:
+                if now - claimed.stat().st_mtime > self.jobTimeout:
+                    os.rename(claimed, self.folder / PENDING / f"{claimed.name.split('.')[0]}.json")
+            except FileNotFoundError:
+                pass  # finished (or requeued) meanwhile
+
+    def _merge(self, iteration: int, shards: List[Path], simulationCallback):
+        data = {}
+        for simulation, shard in enumerate(shards):
+            with np.load(shard) as results:
+                simulationCallback(results["statistics"].tolist(), iteration, simulation)
+                for estimator in self.estimators:
+                    slug = estimatorSlug(estimator)
+                    if f"x_{slug}" in results.files:
+                        data.setdefault(slug, []).append((results[f"x_{slug}"], results[f"y_{slug}"]))
+        self.history.append({slug: (np.concatenate([x for x, _ in parts]), np.concatenate([y for _, y in parts]))
+                             for slug, parts in data.items()})
+
+        if self.accumulateData is True:
+            history = self.history
+        else:
+            history = self.history[-max(1, int(self.accumulateData)):]
+        for estimator in self.estimators:
+            parts = [iterationData[estimatorSlug(estimator)] for iterationData in history if estimatorSlug(estimator) in iterationData]
+            if not parts or sum(len(x) for x, _ in parts) == 0:
+                continue
+            x = np.concatenate([x for x, _ in parts])
+            y = np.concatenate([y for _, y in parts])
+            estimator.train(x, y)
+            self._publishModel(estimator, iteration + 1)
+
+    def _publishModel(self, estimator, version: int):
+        model = getattr(estimator, "_model", None)
+        if model is not None:
+            writeAtomically(self.folder / MODELS / f"{estimatorSlug(estimator)}_{version}.h5", model.save, suffix=".h5")
+
+
+class Worker:
+    """Claims the jobs from the queue and runs them until the coordinator is done."""
+
+    def __init__(self, folder):
+        self.folder = Path(folder)
+        self.name = f"{socket.gethostname()}-{os.getpid()}"
+        self.models = {}  # estimator slug -> version of the loaded model
+        self.jobsDone = 0
+
+    def run(self):
+        import run as experiment
+        import tensorflow as tf
+        from world import WORLD, ENVIRONMENT
+        from ml_deeco.simulation import run_experiment, SIMULATION_GLOBALS
+
+        while not (self.folder / ARGS_FILE).exists():
+            time.sleep(POLL_SECONDS)
+        with open(self.folder / ARGS_FILE) as file:
+            published = json.load(file)
+        args = argparse.Namespace(**published["args"])
+        # the coordinator accumulates the data, the worker only collects the data of each simulation
+        args.accumulate_data = False
+        args.chart = False
+        experiment.configureEnvironment(published["config"])
+        experiment.createEstimators(args, tempfile.mkdtemp(prefix=f"worker_{self.name}_"))
+        WORLD.initEstimators()
+        experiment.configureWorld(args)
+        estimators = SIMULATION_GLOBALS.estimators
+
+        collected = {}
+
+        def instrument(estimator):
+            # the data collected in the simulation are passed to `train` at the end of the iteration, the coordinator trains on them
+            def train(x, y):
+                collected[estimatorSlug(estimator)] = (np.asarray(x), np.asarray(y))
+            estimator.train = train
+            estimator.saveModel = lambda *_, **__: None
+
+        for estimator in estimators:
+            instrument(estimator)
+
+        while not (self.folder / DONE_FILE).exists():
+            job = self._claim()
+            if job is None:
+                time.sleep(POLL_SECONDS)
+                continue
+            claimed, descriptor = job
+            collected.clear()
+            statistics = []
+
+            # loaded before the seeding (building the model draws random numbers), the simulation depends only on its seed
+            for estimator in estimators:
+                self._loadModel(estimator, descriptor["modelVersion"])
+            random.seed(descriptor["seed"])
+            np.random.seed(descriptor["seed"])
+            tf.random.set_seed(descriptor["seed"])
+            experiment.configureEnvironment(descriptor["config"])
+
+            def prepareSimulation(iteration, simulation):
+                return WORLD.reset()
+
+            def stepCallback(components, materializedEnsembles, step):
+                if step % HEARTBEAT_STEPS == 0 and claimed.exists():
+                    os.utime(claimed)
+
+            def simulationCallback(components, ensembles, iteration, simulation):
+                statistics.extend(experiment.collectStatistics(descriptor["iteration"], descriptor["simulation"]))
+
+            run_experiment(1, 1, ENVIRONMENT.maxSteps, prepareSimulation,
+                           simulationCallback=simulationCallback, stepCallback=stepCallback)
+            self._writeShard(descriptor, statistics, collected)
+            if claimed.exists():
+                os.remove(claimed)
+            self.jobsDone += 1
+
+    def _claim(self):
+        for pending in sorted((self.folder / PENDING).glob("*.json")):
+            claimed = self.folder / CLAIMED / f"{pending.stem}.{self.name}.json"
+            try:
+                os.rename(pending, claimed)  # atomic, fails if another worker claimed the job first
+            except (FileNotFoundError, PermissionError):
+                continue
+            with open(claimed) as file:
+                return claimed, json.load(file)
+        return None
+
+    def _loadModel(self, estimator, version: int):
+        """Loads the model of the given version (published by the coordinator) to the estimator."""
+        if version == 0:
+            return  # the first iteration runs with the untrained estimators (as in `run_experiment`)
+        slug = estimatorSlug(estimator)
+        if self.models.get(slug) == version:
+            return  # loaded for a previous job
+        filename = self.folder / MODELS / f"{slug}_{version}.h5"
+        if not filename.exists():
+            return  # the estimator was not trained (no data)
+        estimator.loadModel(str(filename))
+        self.models[slug] = version
+
+    def _writeShard(self, descriptor, statistics, collected):
+        arrays = {"statistics": np.array(statistics, dtype=np.float64)}
+        for slug, (x, y) in collected.items():
+            arrays[f"x_{slug}"] = x
+            arrays[f"y_{slug}"] = y
+        filename = self.folder / SHARDS / f"{jobName(descriptor['iteration'], descriptor['simulation'])}.npz"
+        writeAtomically(filename, lambda name: np.savez_compressed(name, **arrays), suffix=".npz")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs the simulations of the experiments from the work queue (see run.py --work_queue).')
+    parser.add_argument('queue', type=str, help='The shared directory of the queue.')
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.getcwd())
+    worker = Worker(args.queue)
+    worker.run()
+    print(f"Worker {worker.name}: {worker.jobsDone} jobs done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,11 @@
-from typing import List, TYPE_CHECKING, Optional
+import copy
+import hashlib
+import json
+import os
+import pickle
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, TYPE_CHECKING, Optional, Dict, Tuple
 
 from ml_deeco.simulation import SIMULATION_GLOBALS
 from ml_deeco.utils import Log
@@ -38,10 +45,6 @@ class Environment:
     fieldCount = 2
     fieldPositions = []
 
-    def __init__(self):
-        if 'ENVIRONMENT' in locals():
-            raise RuntimeError("Do not create a new instance of the Environment. Use the ENVIRONMENT global variable instead.")
-
     def loadConfig(self, config: dict):
         for conf, confValue in config.items():
             if conf in Environment.__dict__:
@@ -53,9 +56,76 @@ class Environment:
         self.fieldCount = len(config['fields'])
         self.fieldPositions = config['fields']
         self.currentChargingRate = self.chargingRate
+        self.configHash = hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class Scenario:
+    """
+    The parts of the world which are given by the config and do not change between the simulations.
+    The scenario is compiled once per config (see `Scenario.get`) and `World.reset` only creates the mutable state from it.
+
+    Attributes
+    ----------
+    configHash : str
+        Hash of the config the scenario was compiled from.
+    fieldLayouts : list
+        `FieldLayout` (places and crops) of each field.
+    sortedFieldIndices : list
+        Indices of the fields sorted by the number of places (descending).
+    totalPlaces : int
+        Number of places of all fields.
+    closestChargers : dict ((x, y) -> int)
+        Index of the closest charger to an integer location, filled lazily.
+    """
+
+    _compiled: Dict[str, 'Scenario'] = {}
+
+    def __init__(self, environment: Environment):
+        from components.field import FieldLayout
 
+        self.configHash = environment.configHash
+        self.fieldLayouts = [FieldLayout(points, environment.droneRadius) for points in environment.fieldPositions]
+        self.sortedFieldIndices = sorted(range(len(self.fieldLayouts)), key=lambda i: -len(self.fieldLayouts[i].places))
+        self.totalPlaces = sum([len(layout.places) for layout in self.fieldLayouts])
+        self.closestChargers: Dict[Tuple[int, int], int] = {}
 
-ENVIRONMENT = Environment()
+    @staticmethod
+    def get(environment: Environment, cacheFolder: Optional[str] = None) -> 'Scenario':
+        """
+        Returns the scenario compiled from the current config of the environment.
+        If `cacheFolder` is given, the compiled scenario is also loaded from (or saved to) the folder so that it can be shared across processes.
+        """
+        scenario = Scenario._compiled.get(environment.configHash)
+        if scenario is None:
+            filename = os.path.join(cacheFolder, f"{environment.configHash}.pickle") if cacheFolder else None
+            if filename and os.path.exists(filename):
+                with open(filename, "rb") as file:
+                    scenario = pickle.load(file)
+            else:
+                scenario = Scenario(environment)
+                if filename:
+                    scenario.save(cacheFolder)
+            Scenario._compiled[environment.configHash] = scenario
+        return scenario
+
+    def save(self, cacheFolder: str):
+        if not os.path.exists(cacheFolder):
+            os.makedirs(cacheFolder)
+        with open(os.path.join(cacheFolder, f"{self.configHash}.pickle"), "wb") as file:
+            pickle.dump(self, file)
+
+    def closestChargerIndex(self, location, chargers) -> int:
+        """
+        Index of the charger closest to the location. The results for integer locations (e.g. the places of the fields) are stored in a table shared by all simulations.
+        """
+        x, y = location.x, location.y
+        if x == int(x) and y == int(y):
+            key = (int(x), int(y))
+            index = self.closestChargers.get(key)
+            if index is None:
+                index = self.closestChargers[key] = min(range(len(chargers)), key=lambda i: location.distance(chargers[i].location))
+            return index
+        return min(range(len(chargers)), key=lambda i: location.distance(chargers[i].location))
 
 
 class World:
@@ -63,12 +133,22 @@ class World:
     The simulated world.
     """
 
-    def __init__(self):
-        if 'WORLD' in locals():
-            raise RuntimeError("Do not create a new instance of the World. Use the WORLD global variable instead.")
-        waitingTimeEstimator: 'Estimator'
-        waitingTimeBaseline = 0
-        batteryEstimator: 'Estimator'
+    scenarioCacheFolder: Optional[str] = None
+    vectorizedBirds = False  # simulate the birds with the `BirdFlock` instead of `Bird` components
+    fastForwardBirds = False  # actuate the birds by the `EventScheduler` only when their flight ends
+    traceLevel = 0  # level of the events recorded by the `Tracer` (0 = disabled)
+    traceEcho = 0  # the trace events up to this level are printed immediately
+    batteryChanges = 0  # incremented on every change of a drone battery
+
+    # the attributes configured once for the experiment (copied to the worlds of the forked contexts)
+    OPTIONS = ["scenarioCacheFolder", "vectorizedBirds", "fastForwardBirds", "traceLevel", "traceEcho",
+               "waitingTimeEstimator", "waitingTimeBaseline", "batteryEstimator"]
+
+    def __init__(self, environment: Environment):
+        self.environment = environment
+        self.waitingTimeEstimator: Optional['Estimator'] = None
+        self.waitingTimeBaseline = 0
+        self.batteryEstimator: Optional['Estimator'] = None
 
     @staticmethod
     def initEstimators():
@@ -83,11 +163,16 @@ class World:
 
         SIMULATION_GLOBALS.initEstimators()
 
-    # noinspection PyAttributeOutsideInit
     def reset(self):
         """
-        Call this before the world is used.
+        Call this before the world is used. The components are created with the world active (see `SimulationContext`),
+        the simulation must also run with the world active.
         """
+        with SimulationContext(self.environment, self).active():
+            return self._create()
+
+    # noinspection PyAttributeOutsideInit
+    def _create(self):
         from ml_deeco.simulation import Point2D
         from components.bird import Bird
         from components.field import Field
@@ -95,38 +180,67 @@ class World:
         from components.charger import Charger
         import random
 
+        environment = self.environment
+
         def randomStartingPoint():
-            variant = ENVIRONMENT.droneStartPositionVariance
-            centerX = ENVIRONMENT.mapWidth / 2
-            centerY = ENVIRONMENT.mapHeight / 2
+            variant = environment.droneStartPositionVariance
+            centerX = environment.mapWidth / 2
+            centerY = environment.mapHeight / 2
             randomX = centerX + (random.choice([-1, 1]) * variant * random.random() * centerX)
             randomY = centerY + (random.choice([-1, 1]) * variant * random.random() * centerY)
             return Point2D(int(randomX), int(randomY))
 
-        self.drones: List[Drone] = [Drone(randomStartingPoint()) for _ in range(ENVIRONMENT.droneCount)]
-        self.birds: List[Bird] = [Bird(Point2D.random(0, 0, ENVIRONMENT.mapWidth, ENVIRONMENT.mapHeight)) for _ in range(ENVIRONMENT.birdCount)]
-        self.chargers: List[Charger] = [Charger(Point2D(position)) for position in ENVIRONMENT.chargerPositions]
-        self.fields: List[Field] = [Field(points) for points in ENVIRONMENT.fieldPositions]
+        self.batteryChanges = 0
+        self.drones: List[Drone] = [Drone(randomStartingPoint()) for _ in range(environment.droneCount)]
+        if self.vectorizedBirds:
+            self.birds: List[Bird] = []
+        else:
+            self.birds: List[Bird] = [Bird(Point2D.random(0, 0, environment.mapWidth, environment.mapHeight)) for _ in range(environment.birdCount)]
+        self.chargers: List[Charger] = [Charger(Point2D(position)) for position in environment.chargerPositions]
+
+        self.scenario = Scenario.get(environment, self.scenarioCacheFolder)
+        self.fields: List[Field] = [Field(points, layout) for points, layout in zip(environment.fieldPositions, self.scenario.fieldLayouts)]
 
-        self.totalPlaces = sum([len(f.places) for f in self.fields])
-        self.sortedFields = sorted(self.fields, key=lambda field: -len(field.places))
+        self.totalPlaces = self.scenario.totalPlaces
+        self.sortedFields = [self.fields[i] for i in self.scenario.sortedFieldIndices]
 
         self.emptyPoints = []
         for i in range(MAX_RANDOM_POINTS):
-            p = Point2D.random(0, 0, ENVIRONMENT.mapWidth, ENVIRONMENT.mapHeight)
+            p = Point2D.random(0, 0, environment.mapWidth, environment.mapHeight)
             if self.isPointField(p):
                 i = i - 1
             else:
                 self.emptyPoints.append(p)
 
+        self.birdFlock = None
+        if self.vectorizedBirds:
+            from components.bird_flock import BirdFlock
+            self.birdFlock = BirdFlock(environment.birdCount, self.fields, self.emptyPoints)
+
+        self.birdScheduler = None
+        if self.fastForwardBirds and self.birds:
+            from components.event_scheduler import EventScheduler
+            self.birdScheduler = EventScheduler(self.birds)
+
         self.createLogs()
 
+        from utils.tracing import Tracer
+        self.tracer = Tracer(self.traceLevel, echo=self.traceEcho)
+
+        from ensembles.claimed_members import ClaimedMembers
+        self.claimedMembers = ClaimedMembers()
+
         components = []
-        components.extend(WORLD.birds)
+        if self.birdScheduler is not None:
+            components.append(self.birdScheduler)
+        else:
+            components.extend(self.birds)
+        if self.birdFlock is not None:
+            components.append(self.birdFlock)
 
-        if ENVIRONMENT.droneCount > 0:
-            components.extend(WORLD.drones)
-            components.extend(WORLD.chargers)
+        if environment.droneCount > 0:
+            components.extend(self.drones)
+            components.extend(self.chargers)
             from ensembles.field_protection import getEnsembles as fieldProtectionEnsembles
             from ensembles.drone_charging import getEnsembles as droneChargingEnsembles
             potentialEnsembles = fieldProtectionEnsembles() + droneChargingEnsembles()
@@ -137,21 +251,6 @@ class World:
 
     # noinspection PyAttributeOutsideInit
     def createLogs(self):
-
-        self.chargerLog = Log([
-            "current_time_step",
-            "drone_id",
-            "battery",
-            "estimated_waiting",
-            "energy_to_fly_to_charger",
-            "time_to_done_charging",
-            "charger",
-            "potential_drones_length",
-            "waiting_drones_length",
-            "accepted_queues_length",
-            "charging_drones_length",
-        ])
-
         self.chargerLogs = []
         for _ in self.chargers:
             self.chargerLogs.append(Log([
@@ -179,11 +278,104 @@ class World:
     def exceptDrones(self, droneStates):
         return [drone for drone in self.drones if drone.state not in droneStates]
 
+    def birdLocations(self):
+        """Locations of all birds (either the `Bird` components or the `BirdFlock`)."""
+        if self.birdFlock is not None:
+            return self.birdFlock.locations()
+        if self.birdScheduler is not None:
+            self.birdScheduler.synchronize()
+        return [bird.location for bird in self.birds]
+
     def findBirds(self, birdStates):
+        if self.birdScheduler is not None:
+            self.birdScheduler.synchronize()
         return [bird for bird in self.birds if bird.state in birdStates]
 
     def exceptBirds(self, birdStates):
+        if self.birdScheduler is not None:
+            self.birdScheduler.synchronize()
         return [bird for bird in self.birds if bird.state not in birdStates]
 
 
-WORLD = World()
+class SimulationContext:
+    """
+    The environment and the world of a simulation.
+
+    The components and the ensembles use the `ENVIRONMENT` and `WORLD` globals, which refer to the environment and the world
+    of the active context. A context is activated by `with context.active():` (or `context.run(function)`) for the current
+    thread or asyncio task only, so several worlds (with different configs) can be simulated concurrently in one process.
+    Without an active context, the globals refer to the `DEFAULT_CONTEXT`.
+
+    The module `random` and the estimators (with the bounds of their features, given by the environment active when
+    the estimators were initialized) are shared by all contexts.
+    """
+
+    # the constants of the environment used in the bounds of the features of the estimators (see `ensembles/drone_charging.py`)
+    FEATURE_CONSTANTS = ("mapWidth", "mapHeight", "chargerCapacity", "chargerCount", "droneCount")
+
+    def __init__(self, environment: Optional[Environment] = None, world: Optional[World] = None):
+        self.environment = environment if environment is not None else Environment()
+        self.world = world if world is not None else World(self.environment)
+
+    def fork(self, config: Optional[dict] = None) -> 'SimulationContext':
+        """
+        A new context with a copy of the environment (with the `config` loaded if given) and a world with the same options.
+
+        Raises `ValueError` if the config changes a constant of the bounds of the features (`FEATURE_CONSTANTS`),
+        the features of the shared estimators would not match the forked world.
+        """
+        environment = copy.copy(self.environment)
+        if config is not None:
+            environment.loadConfig(config)
+            changed = [f"{name} ({getattr(self.environment, name)} -> {getattr(environment, name)})"
+                       for name in self.FEATURE_CONSTANTS if getattr(environment, name) != getattr(self.environment, name)]
+            if changed:
+                raise ValueError(f"The config changes the bounds of the features of the estimators: {', '.join(changed)}.")
+        world = World(environment)
+        for option in World.OPTIONS:
+            if option in self.world.__dict__:
+                setattr(world, option, self.world.__dict__[option])
+        return SimulationContext(environment, world)
+
+    @contextmanager
+    def active(self):
+        token = _CURRENT_CONTEXT.set(self)
+        try:
+            yield self
+        finally:
+            _CURRENT_CONTEXT.reset(token)
+
+    def run(self, function, *args, **kwargs):
+        """Calls the function with the context active."""
+        with self.active():
+            return function(*args, **kwargs)
+
+
+DEFAULT_CONTEXT = SimulationContext()
+_CURRENT_CONTEXT: ContextVar[SimulationContext] = ContextVar("simulationContext", default=DEFAULT_CONTEXT)
+
+
+def currentContext() -> SimulationContext:
+    return _CURRENT_CONTEXT.get()
+
+
+class _ContextAttribute:
+    """Forwards the attribute access to the environment or the world of the current context."""
+
+    __slots__ = ("_name",)
+
+    def __init__(self, name: str):
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, attribute):
+        return getattr(getattr(_CURRENT_CONTEXT.get(), self._name), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(getattr(_CURRENT_CONTEXT.get(), self._name), attribute, value)
+
+    def __repr__(self):
+        return f"<{self._name} of the current context>"
+
+
+ENVIRONMENT: Environment = _ContextAttribute("environment")  # type: ignore
+WORLD: World = _ContextAttribute("world")  # type: ignore